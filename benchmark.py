@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the extraction pipeline and the API entry points.
+
+Every case runs in a fresh process, in a scratch directory holding a copy
+of the workbook as e2.xlsx (the scripts expect that name), and reports its
+wall time, the process's peak RSS and a per-phase breakdown. Besides
+e2.xlsx the cases run against synthetic workbooks of a given size:
+
+    1k      1,000 boards, 160 item rows each (like e2.xlsx's sheets)
+    10k     10,000 boards, 160 item rows each (takes a while to generate)
+    rows1k  50 boards with 1,000 item rows each
+
+Results can be saved as a JSON baseline and later runs compared against
+it; a case or phase that got slower than the tolerance is reported as a
+regression and the exit status is 1.
+
+Usage:
+    python3 benchmark.py                          # e2 and 1k, compare with the baseline
+    python3 benchmark.py --workbooks e2,10k,rows1k --cases board_details
+    python3 benchmark.py --save-baseline          # record benchmark_baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+from generate_synthetic_workbook import generate_workbook
+from metrics import PhaseTimer
+
+BASELINE_PATH = 'benchmark_baseline.json'
+# Synthetic workbooks are generated once and kept here
+CACHE_DIR = '.benchmark_cache'
+# Relative slowdown reported as a regression
+DEFAULT_TOLERANCE = 0.25
+# Phases faster than this are too noisy to compare
+MIN_COMPARED_SECONDS = 0.05
+
+# name: (boards, item rows per board); see generate_synthetic_workbook.py
+SYNTHETIC_WORKBOOKS = {
+    '1k': (1000, 160),
+    '10k': (10000, 160),
+    'rows1k': (50, 1000),
+}
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def workbook_path(name):
+    """Path of the workbook for a --workbooks entry, generating synthetic ones on first use."""
+    if name == 'e2':
+        return os.path.join(SOURCE_DIR, 'e2.xlsx')
+    if name not in SYNTHETIC_WORKBOOKS:
+        raise ValueError(f'Unknown workbook "{name}"; use e2 or one of {", ".join(SYNTHETIC_WORKBOOKS)}')
+    boards, rows = SYNTHETIC_WORKBOOKS[name]
+    path = os.path.join(SOURCE_DIR, CACHE_DIR, f'synthetic_{boards}x{rows}.xlsx')
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        print(f"Generating {name} workbook ({boards} boards x {rows} rows)...", flush=True)
+        generate_workbook(path + '.tmp', boards, rows)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Cases: each runs in the scratch directory and fills in a PhaseTimer
+
+def case_load_workbook_data(timer):
+    from board_extraction import load_workbook_data
+    with timer.phase('openpyxl reader'):
+        load_workbook_data('e2.xlsx', 'openpyxl')
+    with timer.phase('xml reader'):
+        load_workbook_data('e2.xlsx', 'xml')
+
+
+def case_extract_dashboard_data(timer):
+    import server
+    from workbook_cache import WorkbookCache
+    from workbook_snapshot import load_workbook_data_snapshot
+    with timer.phase('load + compile snapshot'):
+        entry = server.workbook_cache.get_entry()
+    with timer.phase('payload'):
+        server.extract_dashboard_data(entry)
+    with timer.phase('restart from snapshot'):
+        WorkbookCache('e2.xlsx', loader=load_workbook_data_snapshot).get_entry()
+
+
+def case_board_details(timer):
+    import server
+    with timer.phase('load'):
+        entry = server.workbook_cache.get_entry()
+    names = entry.value.sheet_names()
+    with timer.phase('all boards'):
+        for name in names:
+            server.app.json.dumps(entry.value.board_details(name))
+    client = server.app.test_client()
+    with timer.phase('api (100 requests)'):
+        for name in names[:100]:
+            client.get('/api/board-details', query_string={'name': name})
+    with timer.phase('api cached (100 requests)'):
+        for name in names[:100]:
+            client.get('/api/board-details', query_string={'name': name})
+
+
+def case_generate_all_board_details(timer):
+    import generate_all_board_details
+    with timer.phase('full'):
+        generate_all_board_details.main(force=True)
+    with timer.phase('unchanged rerun'):
+        generate_all_board_details.main()
+
+
+def case_extract_all_boards(timer):
+    import extract_all_boards
+    with timer.phase('full'):
+        extract_all_boards.extract_all_boards(force=True)
+
+
+def case_build(timer):
+    import build
+    with timer.phase('full'):
+        build.build(force=True)
+    with timer.phase('unchanged rerun'):
+        build.build()
+
+
+def case_update_estimates(timer):
+    import update_estimates
+    with timer.phase('read'):
+        update_estimates.read_workbook('e2.xlsx')
+    with timer.phase('update'):
+        update_estimates.update_estimates()
+
+
+CASES = {
+    'load_workbook_data': case_load_workbook_data,
+    'extract_dashboard_data': case_extract_dashboard_data,
+    'board_details': case_board_details,
+    'generate_all_board_details': case_generate_all_board_details,
+    'extract_all_boards': case_extract_all_boards,
+    'update_estimates': case_update_estimates,
+    'build': case_build,
+}
+
+
+def _run_case(case, workbook):
+    """Child process: run one case in a scratch copy of the workbook."""
+    sys.path.insert(0, SOURCE_DIR)
+    workdir = tempfile.mkdtemp(prefix='benchmark-')
+    try:
+        shutil.copy(workbook, os.path.join(workdir, 'e2.xlsx'))
+        os.chdir(workdir)
+        timer = PhaseTimer()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            CASES[case](timer)
+        wall = time.perf_counter() - started
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+        return {'wall': wall, 'peak_rss_mb': peak_mb, 'phases': timer.phases}
+    finally:
+        os.chdir(SOURCE_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_case(case, workbook, repeat=1):
+    """Run a case `repeat` times, each in a fresh process, keeping the fastest run."""
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            runs.append(executor.submit(_run_case, case, workbook).result())
+    return min(runs, key=lambda run: run['wall'])
+
+
+# ---------------------------------------------------------------------------
+# Baselines
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages (results slower than baseline by more than tolerance)."""
+    regressions = []
+    for workbook, cases in results.items():
+        for case, result in cases.items():
+            base = baseline.get(workbook, {}).get(case)
+            if base is None:
+                continue
+            measured = [('wall', result['wall'], base['wall'])]
+            measured += [
+                (f'phase "{phase}"', seconds, base['phases'][phase])
+                for phase, seconds in result['phases'].items() if phase in base['phases']
+            ]
+            for what, now, before in measured:
+                if before >= MIN_COMPARED_SECONDS and now > before * (1 + tolerance):
+                    regressions.append(f'{workbook}/{case} {what}: {before:.3f}s -> {now:.3f}s '
+                                       f'(+{(now / before - 1) * 100:.0f}%)')
+    return regressions
+
+
+def print_result(workbook, case, result):
+    print(f"  {case:<28} {result['wall']:8.3f}s  {result['peak_rss_mb']:7.1f} MB")
+    for phase, seconds in result['phases'].items():
+        print(f"      {phase:<34} {seconds:8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the extraction pipeline and API entry points.')
+    parser.add_argument('--workbooks', default='e2,1k',
+                        help=f'comma-separated: e2, {", ".join(SYNTHETIC_WORKBOOKS)} (default e2,1k)')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help='comma-separated cases (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case; the fastest is kept')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='relative slowdown reported as a regression (default 0.25)')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f'unknown cases: {", ".join(unknown)}')
+
+    results = {}
+    for name in [name.strip() for name in args.workbooks.split(',') if name.strip()]:
+        workbook = workbook_path(name)
+        print(f"\n{name} ({os.path.getsize(workbook) / 1e6:.1f} MB)")
+        results[name] = {}
+        for case in cases:
+            results[name][case] = run_case(case, workbook, args.repeat)
+            print_result(name, case, results[name][case])
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        # Keep baseline entries for workbooks/cases that were not run this time
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        merged = baseline.get('results', {})
+        for name, cases_run in results.items():
+            merged.setdefault(name, {}).update(cases_run)
+        report['results'] = merged
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regressions against {args.baseline}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,120 +1,279 @@
 #!/usr/bin/env python3
 """
 Simple HTTP server to serve board details API.
-Run with: python3 board_details_api.py
+Run with: python3 board_details_api.py [port]
 Then access dashboard at: http://localhost:8000/dashboard.html
+
+The server runs on asyncio: every connection is a coroutine, HTTP/1.1
+keep-alive is supported, static files are sent with sendfile() and
+workbook extraction runs in a thread pool, so a slow board-details call
+(e.g. the first one after e2.xlsx changed) never blocks other clients.
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import asyncio
 import json
-import urllib.parse
-from extract_board_details import extract_board_details
+import mimetypes
 import os
+import sys
+import traceback
+import urllib.parse
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http_cache import ResponseCache, choose_encoding, etag_matches
+from workbook_cache import WorkbookCache
+from workbook_snapshot import load_workbook_data_snapshot
 
-class BoardDetailsHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path.startswith('/api/board-details'):
-            # Parse query parameters
-            parsed_path = urllib.parse.urlparse(self.path)
-            query_params = urllib.parse.parse_qs(parsed_path.query)
-            board_name = query_params.get('name', [None])[0]
-            
-            if not board_name:
-                self.send_response(400)
-                self.send_header('Content-type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps({'error': 'Board name required'}).encode())
-                return
-            
-            # Extract board details
-            details = extract_board_details(board_name)
-            
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps(details, default=str).encode())
-            
-        elif self.path == '/' or self.path == '/dashboard.html':
-            # Serve dashboard.html
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            with open('dashboard.html', 'rb') as f:
-                self.wfile.write(f.read())
-                
-        elif self.path.endswith('.js'):
-            # Serve JavaScript files
-            self.send_response(200)
-            self.send_header('Content-type', 'application/javascript')
-            self.end_headers()
-            try:
-                with open(self.path[1:], 'rb') as f:
-                    self.wfile.write(f.read())
-            except FileNotFoundError:
-                self.send_response(404)
-                self.end_headers()
-                
-        elif self.path.endswith('.css'):
-            # Serve CSS files
-            self.send_response(200)
-            self.send_header('Content-type', 'text/css')
-            self.end_headers()
+# Extracted workbook and serialized responses, reused until e2.xlsx changes
+workbook_cache = WorkbookCache('e2.xlsx', loader=load_workbook_data_snapshot)
+response_cache = ResponseCache()
+
+# Seconds an idle keep-alive connection is kept open
+KEEP_ALIVE_TIMEOUT = 15
+# Largest request head (request line plus headers) accepted
+MAX_HEADER_SIZE = 64 * 1024
+# Files are served from the directory this server is started in
+STATIC_ROOT = os.path.abspath('.')
+
+
+class Request:
+    """One parsed HTTP request head."""
+
+    def __init__(self, method, target, version, headers):
+        self.method = method
+        self.version = version
+        self.headers = headers
+        parsed = urllib.parse.urlsplit(target)
+        self.path = urllib.parse.unquote(parsed.path)
+        self.query = urllib.parse.parse_qs(parsed.query)
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+
+async def read_request(reader):
+    """Read one request head, or return None when the client closed the connection."""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise ValueError('Request header too large')
+
+    lines = head.decode('latin-1').split('\r\n')
+    parts = lines[0].split()
+    if len(parts) != 3:
+        raise ValueError('Malformed request line')
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    request = Request(parts[0], parts[1], parts[2], headers)
+
+    # Discard any request body; none of the endpoints use one
+    length = int(headers.get('content-length', 0) or 0)
+    if length:
+        await reader.readexactly(length)
+    return request
+
+
+def response_head(status, headers, keep_alive):
+    """Serialize a status line and headers."""
+    status = HTTPStatus(status)
+    lines = [f'HTTP/1.1 {status.value} {status.phrase}', f'Date: {formatdate(usegmt=True)}']
+    lines.extend(f'{name}: {value}' for name, value in headers.items())
+    lines.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def send_response(writer, request, status, headers, body=b''):
+    """Send a response with an in-memory body."""
+    if status != 304:
+        headers['Content-Length'] = str(len(body))
+    writer.write(response_head(status, headers, request.keep_alive))
+    if body and request.method != 'HEAD':
+        writer.write(body)
+    await writer.drain()
+
+
+async def send_json(writer, request, status, data):
+    body = json.dumps(data, default=str).encode()
+    await send_response(writer, request, status, {
+        'Content-type': 'application/json',
+        'Access-Control-Allow-Origin': '*'
+    }, body)
+
+
+def board_details_response(board_name, accept_encoding):
+    """Look up (or build) the cached board-details response; runs in the thread pool."""
+    entry = workbook_cache.get_entry()
+    data = entry.value
+    if not data.has_sheet(board_name):
+        return None
+    cached = response_cache.get(
+        entry.version, board_name,
+        lambda: json.dumps(data.board_details(board_name), default=str).encode())
+    # Compressing a large body is CPU work too, so do it here rather than on the event loop
+    cached.body(choose_encoding(accept_encoding))
+    return cached
+
+
+async def handle_board_details(writer, request):
+    board_name = request.query.get('name', [None])[0]
+    if not board_name:
+        await send_json(writer, request, 400, {'error': 'Board name required'})
+        return
+
+    loop = asyncio.get_running_loop()
+    accept_encoding = request.headers.get('accept-encoding')
+    try:
+        cached = await loop.run_in_executor(None, board_details_response, board_name, accept_encoding)
+    except Exception as e:
+        await send_json(writer, request, 500, {'error': str(e)})
+        return
+    if cached is None:
+        await send_json(writer, request, 200, {'error': f'Sheet "{board_name}" not found'})
+        return
+
+    headers = {
+        'Access-Control-Allow-Origin': '*',
+        'ETag': cached.etag,
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding'
+    }
+    if etag_matches(request.headers.get('if-none-match'), cached.etag):
+        await send_response(writer, request, 304, headers)
+        return
+
+    body, encoding = cached.body(choose_encoding(accept_encoding))
+    headers['Content-type'] = 'application/json'
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    await send_response(writer, request, 200, headers, body)
+
+
+def static_file_path(url_path):
+    """Map a URL path to a file under STATIC_ROOT, or None if it points elsewhere."""
+    if url_path == '/':
+        url_path = '/dashboard.html'
+    path = os.path.abspath(os.path.join(STATIC_ROOT, url_path.lstrip('/')))
+    if os.path.commonpath([path, STATIC_ROOT]) != STATIC_ROOT:
+        return None
+    return path
+
+
+def not_modified_since(request, mtime):
+    """Check an If-Modified-Since header against a file's mtime."""
+    value = request.headers.get('if-modified-since')
+    if not value or 'if-none-match' in request.headers:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+async def handle_static(writer, request):
+    path = static_file_path(request.path)
+    try:
+        f = open(path, 'rb') if path else None
+    except ValueError:
+        # e.g. an embedded null byte (/%00)
+        await send_response(writer, request, 400, {'Content-type': 'text/plain'}, b'Bad Request')
+        return
+    except OSError:
+        # Missing, a directory, not readable, or a file used as a directory (/dashboard.html/x)
+        f = None
+    if f is None:
+        await send_response(writer, request, 404, {'Content-type': 'text/plain'}, b'Not Found')
+        return
+
+    with f:
+        st = os.fstat(f.fileno())
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        headers = {
+            'Content-type': content_type,
+            'Last-Modified': formatdate(st.st_mtime, usegmt=True),
+            # Revalidate every time; unchanged files cost a 304 with no body
+            'Cache-Control': 'no-cache'
+        }
+        if path.endswith('.json'):
+            headers['Access-Control-Allow-Origin'] = '*'
+
+        if not_modified_since(request, st.st_mtime):
+            await send_response(writer, request, 304, headers)
+            return
+
+        headers['Content-Length'] = str(st.st_size)
+        writer.write(response_head(200, headers, request.keep_alive))
+        await writer.drain()
+        if request.method != 'HEAD' and st.st_size:
+            # Zero-copy where the OS supports it, buffered read/write otherwise
+            await asyncio.get_running_loop().sendfile(writer.transport, f, 0, st.st_size)
+
+
+async def handle_connection(reader, writer):
+    """Serve requests on one connection until the client or the keep-alive timeout closes it."""
+    try:
+        while True:
             try:
-                with open(self.path[1:], 'rb') as f:
-                    self.wfile.write(f.read())
-            except FileNotFoundError:
-                self.send_response(404)
-                self.end_headers()
-                
-        elif self.path.endswith('.json'):
-            # Serve JSON files
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+                request = await read_request(reader)
+            except ValueError as e:
+                writer.write(response_head(400, {'Content-Length': str(len(str(e)))}, False))
+                writer.write(str(e).encode())
+                await writer.drain()
+                break
+            if request is None:
+                break
+
             try:
-                with open(self.path[1:], 'rb') as f:
-                    self.wfile.write(f.read())
-            except FileNotFoundError:
-                self.send_response(404)
-                self.end_headers()
-        else:
-            # Try to serve static files
-            file_path = self.path[1:] if self.path.startswith('/') else self.path
-            if os.path.exists(file_path) and os.path.isfile(file_path):
-                self.send_response(200)
-                content_type = 'application/octet-stream'
-                if file_path.endswith('.html'):
-                    content_type = 'text/html'
-                elif file_path.endswith('.css'):
-                    content_type = 'text/css'
-                elif file_path.endswith('.js'):
-                    content_type = 'application/javascript'
-                self.send_header('Content-type', content_type)
-                self.end_headers()
-                with open(file_path, 'rb') as f:
-                    self.wfile.write(f.read())
-            else:
-                self.send_response(404)
-                self.end_headers()
-    
-    def log_message(self, format, *args):
-        # Suppress default logging
+                if request.method not in ('GET', 'HEAD'):
+                    await send_response(writer, request, 405, {'Allow': 'GET, HEAD'})
+                elif request.path == '/api/board-details':
+                    await handle_board_details(writer, request)
+                else:
+                    await handle_static(writer, request)
+            except ConnectionError:
+                raise
+            except Exception:
+                # A bug in a handler: answer 500 (unless the response had already
+                # started, which closing the connection cuts short) and hang up
+                traceback.print_exc()
+                body = b'Internal Server Error'
+                writer.write(response_head(500, {'Content-type': 'text/plain',
+                                                 'Content-Length': str(len(body))}, False))
+                writer.write(body)
+                await writer.drain()
+                break
+
+            if not request.keep_alive:
+                break
+    except ConnectionError:
         pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
 
-if __name__ == '__main__':
-    port = 8000
-    server = HTTPServer(('localhost', port), BoardDetailsHandler)
-    print(f'Board Details API Server running on http://localhost:{port}')
-    print(f'Access dashboard at: http://localhost:{port}/dashboard.html')
+
+async def serve(host, port):
+    server = await asyncio.start_server(handle_connection, host, port, limit=MAX_HEADER_SIZE)
+    print(f'Board Details API Server running on http://{host}:{port}')
+    print(f'Access dashboard at: http://{host}:{port}/dashboard.html')
     print('Press Ctrl+C to stop')
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
     try:
-        server.serve_forever()
+        asyncio.run(serve('localhost', port))
     except KeyboardInterrupt:
         print('\nServer stopped')
-        server.shutdown()
-
-
@@ -0,0 +1,307 @@
+"""
+Streaming extraction of board sheets from e2.xlsx.
+
+This is the one place that knows how a board sheet is laid out: a header row
+(BRAND, ITEM, PRICE, QTY, AMOUNT, ...) near the top, item rows below it, and
+summary rows (NET TOTAL, NO OF UNITS) at the bottom. The workbook is opened
+in openpyxl's read-only mode (or with the lighter xlsx_reader, see READERS)
+and every sheet is streamed once with iter_rows(values_only=True), producing
+the item rows and summary values in the same pass.
+"""
+
+import os
+import re
+from collections import deque
+
+import openpyxl
+
+import formula_engine
+import xlsx_reader
+from metrics import phase
+from totallist_index import load_totallist_index
+
+# Workbook readers: openpyxl's read-only mode, or xlsx_reader, which parses
+# the sheet XML straight into the same value tuples without openpyxl's cell
+# objects, or formulas: xlsx_reader with every formula recalculated by
+# formula_engine.py instead of trusting the cached values (for workbooks
+# saved without them). The E2_XLSX_READER environment variable picks the default.
+READERS = ['openpyxl', 'xml', 'formulas']
+DEFAULT_READER = os.environ.get('E2_XLSX_READER', 'openpyxl')
+
+# Bump when a change here alters the extracted data, so stored extractions
+# (workbook_snapshot.py) are rebuilt instead of served
+EXTRACTION_VERSION = 1
+
+# Keywords that identify the header row (searched in the first 9 rows)
+HEADER_KEYWORDS = ['ITEM', 'QTY', 'PRICE', 'AMOUNT', 'BRAND', 'DESCRIPTION']
+HEADER_SEARCH_ROWS = 9
+HEADER_SEARCH_COLUMNS = 14
+
+# Define preferred column order (most common columns first)
+# Note: 'back' is excluded as it's just a hyperlink, not a data column
+PREFERRED_ORDER = ['BRAND', 'ITEM', 'DESCRIPTION', 'PRICE', 'QTY', 'QUANTITY', 'AMOUNT']
+
+# Columns to exclude (hyperlinks/formatting, not data columns)
+EXCLUDED_COLUMNS = ['BACK', 'LIST']
+
+# Item columns the dashboard treats as the row's AMOUNT (rows without one are hidden)
+AMOUNT_COLUMN_NAMES = ['AMOUNT', 'Amount', 'amount', 'AMT', 'Amt', 'amt']
+
+# Summary rows are looked for in the last 51 rows of a sheet: the label sits
+# in column C and the value in column F (or a neighbouring column)
+SUMMARY_WINDOW = 51
+SUMMARY_LABEL_INDEX = 2
+SUMMARY_VALUE_INDEXES = [5, 4, 6, 3]
+
+
+def open_workbook(path='e2.xlsx', reader=None):
+    """Open the workbook for streaming (read-only, cached formula values)."""
+    reader = reader or DEFAULT_READER
+    if reader == 'xml':
+        return xlsx_reader.load_workbook(path)
+    if reader == 'formulas':
+        return formula_engine.load_workbook(path)
+    if reader != 'openpyxl':
+        raise ValueError(f'Unknown workbook reader "{reader}" (expected one of {", ".join(READERS)})')
+    return openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+
+def parse_number(value):
+    """Parse a summary cell to a float (strings may carry units, e.g. "300.00 kVAR")."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str):
+            num_match = re.search(r'[\d,]+\.?\d*', value.replace(',', ''))
+            if num_match:
+                return float(num_match.group())
+            return None
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def is_header_row(row):
+    """Check if a row looks like a header row."""
+    row_values = [str(value).upper() if value else '' for value in row[:HEADER_SEARCH_COLUMNS]]
+    joined = ' '.join(row_values)
+    return any(keyword in joined for keyword in HEADER_KEYWORDS)
+
+
+def order_columns(header_row, width):
+    """Return [(header_name, column_index)] in output order for a header row.
+
+    Preferred headers come first (case-insensitive match), then the rest
+    alphabetically. Column indexes are 0-based.
+    """
+    headers = {}
+    for col, cell_value in enumerate(header_row):
+        if cell_value:
+            header_name = str(cell_value).strip()
+            if header_name and header_name.upper() not in EXCLUDED_COLUMNS:
+                headers[col] = header_name
+
+    # If no headers found, use default column names
+    if not headers:
+        for col in range(min(width, 19)):
+            headers[col] = f'Column{col + 1}'
+
+    all_headers_dict_upper = {h.upper(): h for h in headers.values()}
+
+    ordered_headers = []
+    used_headers = set()
+    for pref_header in PREFERRED_ORDER:
+        if pref_header in all_headers_dict_upper and pref_header not in used_headers:
+            ordered_headers.append(all_headers_dict_upper[pref_header])
+            used_headers.add(pref_header)
+
+    remaining = [h for h_upper, h in all_headers_dict_upper.items() if h_upper not in used_headers]
+    ordered_headers.extend(sorted(remaining, key=lambda x: x.upper()))
+
+    # Each header reads from the first column carrying that exact name
+    first_col = {}
+    for col, header_name in headers.items():
+        first_col.setdefault(header_name, col)
+    return [(header_name, first_col[header_name]) for header_name in ordered_headers]
+
+
+def row_to_item(row, columns):
+    """Map a row to an item dict, or return None if the row has no data."""
+    item = {}
+    has_data = False
+    for header_name, col in columns:
+        cell_value = row[col] if col < len(row) else None
+        item[header_name] = cell_value
+        if cell_value is not None and str(cell_value).strip() != '':
+            has_data = True
+    return item if has_data else None
+
+
+def item_columns(items):
+    """{HEADER: header} of a board's items (from the first item's keys).
+
+    Headers are matched ignoring case and surrounding spaces, so 'Qty ' is
+    found as 'QTY'.
+    """
+    if not items:
+        return {}
+    return {header.strip().upper(): header for header in items[0]}
+
+
+def amount_column(items):
+    """The AMOUNT column of a board's items (from the first item's keys), or None.
+
+    Same rule as displayBoardDetails() in dashboard.js.
+    """
+    if not items:
+        return None
+    for header in items[0]:
+        if header in AMOUNT_COLUMN_NAMES or 'AMOUNT' in header.upper():
+            return header
+    return None
+
+
+def has_amount(item, column):
+    """Check if an item row has an AMOUNT, i.e. is shown on the dashboard."""
+    if column is None:
+        return True
+    value = item.get(column)
+    if value is None or value == '' or value == 0:
+        return False
+    return not (isinstance(value, str) and value.strip() == '0')
+
+
+def find_summary(rows):
+    """Scan summary rows for NET TOTAL and NO OF UNITS values."""
+    summary = {}
+    for row in rows:
+        if len(row) <= SUMMARY_LABEL_INDEX or not row[SUMMARY_LABEL_INDEX]:
+            continue
+        item_str = str(row[SUMMARY_LABEL_INDEX]).upper().strip()
+        if 'NET TOTAL' in item_str:
+            key = 'net_total'
+        elif 'NO OF UNITS' in item_str or 'NO OF ITEMS' in item_str:
+            key = 'no_of_units'
+        else:
+            continue
+        if key in summary:
+            continue
+        for check_col in SUMMARY_VALUE_INDEXES:
+            if len(row) > check_col:
+                value = parse_number(row[check_col])
+                if value is not None:
+                    summary[key] = value
+                    break
+    return summary
+
+
+def extract_sheet(ws):
+    """Stream a board sheet once and return {'items': [...], 'summary': {...}}."""
+    rows = ws.iter_rows(values_only=True)
+    tail = deque(maxlen=SUMMARY_WINDOW)
+
+    # Read up to the first 9 rows looking for the header row
+    leading = []
+    header_index = None
+    for row in rows:
+        tail.append(row)
+        leading.append(row)
+        if is_header_row(row):
+            header_index = len(leading) - 1
+            break
+        if len(leading) >= HEADER_SEARCH_ROWS:
+            break
+
+    if not leading:
+        return {'items': [], 'summary': {}}
+
+    # Without a recognizable header, row 1 is used as the header
+    if header_index is None:
+        header_index = 0
+    header_row = leading[header_index]
+    columns = order_columns(header_row, len(header_row))
+
+    items = []
+    for row in leading[header_index + 1:]:
+        item = row_to_item(row, columns)
+        if item is not None:
+            items.append(item)
+    for row in rows:
+        tail.append(row)
+        item = row_to_item(row, columns)
+        if item is not None:
+            items.append(item)
+
+    return {'items': items, 'summary': find_summary(tail)}
+
+
+def extract_board_details(board_name, wb, index=None):
+    """Extract detailed data from a specific board sheet.
+
+    Pass a prebuilt TOTALLIST index when extracting many boards so the
+    metadata lookup does not rescan the sheet for every board.
+    """
+    try:
+        if board_name not in wb.sheetnames:
+            return {'error': f'Sheet "{board_name}" not found'}
+
+        if index is None:
+            index = load_totallist_index(wb)
+        sheet = extract_sheet(wb[board_name])
+        return board_details(board_name, sheet, index)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def board_details(board_name, sheet, index):
+    """Combine an extracted sheet with its TOTALLIST metadata."""
+    return {
+        'name': board_name,
+        'metadata': index.metadata(board_name) if index is not None else {},
+        'summary': sheet['summary'],
+        'items': sheet['items']
+    }
+
+
+class WorkbookData:
+    """Everything extracted from one version of the workbook."""
+
+    def __init__(self, index, sheets):
+        self.index = index
+        self.sheets = sheets
+
+    def sheet_names(self):
+        """Names of all extracted sheets, in workbook order."""
+        return list(self.sheets)
+
+    def has_sheet(self, name):
+        """Check if the workbook has a sheet with this name."""
+        return name in self.sheets
+
+    def sheet(self, name):
+        """Return {'items': [...], 'summary': {...}} for a sheet, or None."""
+        return self.sheets.get(name)
+
+    def board_details(self, board_name):
+        """Return the details dict for a sheet, or None if there is no such sheet."""
+        sheet = self.sheet(board_name)
+        if sheet is None:
+            return None
+        return board_details(board_name, sheet, self.index)
+
+
+def load_workbook_data(path='e2.xlsx', reader=None):
+    """Stream the whole workbook once: TOTALLIST index plus every sheet's items/summary."""
+    with phase('xlsx open'):
+        wb = open_workbook(path, reader)
+    try:
+        with phase('totallist'):
+            index = load_totallist_index(wb)
+        sheets = {}
+        # Header detection and item rows, one streaming pass per sheet
+        with phase('sheets'):
+            for ws in wb.worksheets:
+                sheets[ws.title] = extract_sheet(ws)
+        return WorkbookData(index, sheets)
+    finally:
+        wb.close()
@@ -0,0 +1,246 @@
+"""
+MDB -> SMDB -> DB tree of the boards in TOTALLIST with rolled-up totals.
+
+Every board's parent is the board named in its SMDB column if it has one,
+otherwise the one in its MDB column; main MDBs hang off the root. Parents
+are matched by exact name, then ignoring case and spaces. SMDB names that
+match no board in TOTALLIST become placeholder nodes (no values of their
+own) under the child's MDB, so the grouping is kept.
+
+Each node stores its own estimate/load/items and the totals of its whole
+subtree, computed once when the tree is built. Reading any node's totals
+is then a dictionary lookup. When a board's values change, only the totals
+on its path to the root are recomputed.
+"""
+
+import threading
+
+from dashboard_history import board_keys
+
+ROOT_KEY = ''
+
+
+def board_values(record):
+    """(estimate, load, items) of a TOTALLIST record, as the dashboard counts them.
+
+    Returns None for records whose values can't be parsed (the dashboard skips those).
+    """
+    try:
+        estimate = float(record['estimate']) if record['estimate'] is not None else 0
+        load = record['load_kw'] or 0
+        items = int(record['items']) if record['items'] is not None else 0
+    except (ValueError, TypeError):
+        return None
+    return estimate, load, items
+
+
+def _lookup_key(name):
+    return ''.join(str(name).split()).upper()
+
+
+class TreeNode:
+    """A board (or placeholder SMDB) with its own and its subtree's totals."""
+
+    __slots__ = ['key', 'name', 'kind', 'parent', 'children', 'placeholder',
+                 'estimate', 'load', 'items',
+                 'total_estimate', 'total_load', 'total_items', 'board_count']
+
+    def __init__(self, key, name, kind=None, placeholder=False):
+        self.key = key
+        self.name = name
+        self.kind = kind
+        self.parent = None
+        self.children = []
+        self.placeholder = placeholder
+        self.estimate = 0
+        self.load = 0
+        self.items = 0
+        self.total_estimate = 0
+        self.total_load = 0
+        self.total_items = 0
+        self.board_count = 0
+
+    def recompute(self):
+        """Recompute this node's subtree totals from its own values and its children's totals."""
+        self.total_estimate = self.estimate + sum(child.total_estimate for child in self.children)
+        self.total_load = self.load + sum(child.total_load for child in self.children)
+        self.total_items = self.items + sum(child.total_items for child in self.children)
+        own = 0 if self.placeholder or self.key == ROOT_KEY else 1
+        self.board_count = own + sum(child.board_count for child in self.children)
+
+    def to_dict(self, depth=None):
+        data = {
+            'key': self.key,
+            'name': self.name,
+            'kind': self.kind,
+            'estimate': self.estimate,
+            'load': self.load,
+            'items': self.items,
+            'totalEstimate': self.total_estimate,
+            'totalLoad': self.total_load,
+            'totalItems': self.total_items,
+            'boardCount': self.board_count
+        }
+        if self.placeholder:
+            data['placeholder'] = True
+        if depth is None or depth > 0:
+            next_depth = None if depth is None else depth - 1
+            data['children'] = [child.to_dict(next_depth) for child in self.children]
+        else:
+            data['childCount'] = len(self.children)
+        return data
+
+
+class BoardTree:
+    """The board hierarchy of one TOTALLIST with memoized subtree totals."""
+
+    def __init__(self, records):
+        self._lock = threading.Lock()
+        self.root = TreeNode(ROOT_KEY, 'ALL')
+        self.nodes = {ROOT_KEY: self.root}
+        self._structure = None
+        self._build(records)
+
+    def _build(self, records):
+        records = [record for record in records if board_values(record) is not None]
+        keys = board_keys(records)
+        by_lookup = {}
+        for key, record in zip(keys, records):
+            node = TreeNode(key, record['name'], record['kind'])
+            node.estimate, node.load, node.items = board_values(record)
+            self.nodes[key] = node
+            # First row wins for duplicated names
+            by_lookup.setdefault(record['name'], node)
+            by_lookup.setdefault(_lookup_key(record['name']), node)
+
+        def find(name):
+            if not name:
+                return None
+            return by_lookup.get(str(name).strip()) or by_lookup.get(_lookup_key(name))
+
+        for key, record in zip(keys, records):
+            node = self.nodes[key]
+            mdb = find(record['mdb'])
+            parent = find(record['smdb'])
+            if parent is None and record['smdb']:
+                parent = self._placeholder(record['smdb'], mdb)
+            if parent is None:
+                parent = mdb
+            if parent is None or parent is node or self._is_descendant(parent, node):
+                parent = self.root
+            node.parent = parent
+            parent.children.append(node)
+        self._structure = self._structure_of(keys, records)
+
+        # Children before parents: a post-order walk from the root
+        for node in self._post_order():
+            node.recompute()
+
+    @staticmethod
+    def _structure_of(keys, records):
+        """What the hierarchy is built from: board keys and their parent columns."""
+        return [
+            (key, _lookup_key(record['smdb'] or ''), _lookup_key(record['mdb'] or ''))
+            for key, record in zip(keys, records)
+        ]
+
+    def _placeholder(self, name, mdb):
+        """Node for an SMDB that is referenced but has no TOTALLIST row of its own."""
+        key = f'{str(name).strip()} (not in TOTALLIST)'
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = TreeNode(key, str(name).strip(), 'SMDB', placeholder=True)
+            node.parent = mdb or self.root
+            node.parent.children.append(node)
+        return node
+
+    @staticmethod
+    def _is_descendant(node, ancestor):
+        while node is not None:
+            if node is ancestor:
+                return True
+            node = node.parent
+        return False
+
+    def _post_order(self):
+        order = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children)
+        return reversed(order)
+
+    def get(self, name):
+        """Node for a board key or name (case-insensitive), or None."""
+        node = self.nodes.get(name)
+        if node is None:
+            wanted = _lookup_key(name)
+            node = next((n for n in self.nodes.values() if _lookup_key(n.key) == wanted), None)
+        return node
+
+    def update_board(self, key, estimate=None, load=None, items=None):
+        """Change one board's own values and refresh the totals on its path to the root."""
+        with self._lock:
+            self._set_values(key, estimate, load, items)
+
+    def _set_values(self, key, estimate=None, load=None, items=None):
+        # Callers hold self._lock
+        node = self.nodes[key]
+        if estimate is not None:
+            node.estimate = estimate
+        if load is not None:
+            node.load = load
+        if items is not None:
+            node.items = items
+        while node is not None:
+            node.recompute()
+            node = node.parent
+
+    def update_records(self, records):
+        """Apply a newer TOTALLIST to this tree in place.
+
+        Returns the number of boards whose values or KIND changed, or None when the
+        hierarchy itself changed (boards added, removed or moved) and the
+        tree has to be rebuilt instead. The whole update happens under the
+        tree's lock, so readers see either the old or the new tree, never a mix.
+        """
+        records = [record for record in records if board_values(record) is not None]
+        keys = board_keys(records)
+        if self._structure_of(keys, records) != self._structure:
+            return None
+
+        changed = 0
+        with self._lock:
+            for key, record in zip(keys, records):
+                values = board_values(record)
+                node = self.nodes[key]
+                kind_changed = record['kind'] != node.kind
+                if kind_changed:
+                    # KIND does not shape the hierarchy, so it can change in place too
+                    node.kind = record['kind']
+                if values != (node.estimate, node.load, node.items):
+                    self._set_values(key, *values)
+                    changed += 1
+                elif kind_changed:
+                    changed += 1
+        return changed
+
+    def to_dict(self, key=ROOT_KEY, depth=None):
+        """JSON-ready subtree under a node (the whole tree by default)."""
+        with self._lock:
+            node = self.nodes[key]
+            return node.to_dict(depth)
+
+    def totals(self):
+        """Rolled-up totals of every node by key."""
+        with self._lock:
+            return {
+                key: {
+                    'estimate': node.total_estimate,
+                    'load': node.total_load,
+                    'items': node.total_items,
+                    'boardCount': node.board_count
+                }
+                for key, node in self.nodes.items()
+            }
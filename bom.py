@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Project bill of materials: total quantity and amount per (BRAND, ITEM).
+
+Every board's quantified item rows (a numeric QTY above zero) are loaded
+into columnar arrays, with quantity and amount multiplied by the board's
+NO OF UNITS. Totals are then computed for the whole project and for every
+board's subtree in the MDB -> SMDB -> DB hierarchy (board_tree.py) in
+one pass. Rows are first summed per (board, item). Each board's sums are then
+repeated once for every group the board belongs to (the project, its MDB,
+its SMDB...). A single bincount over (group, item) produces all the
+totals.
+
+NumPy is optional: without it the same totals are computed with plain
+dictionaries, which is fine for e2.xlsx-sized projects.
+
+Brands and item texts are matched ignoring case and repeated spaces; the
+first spelling seen is reported. A BRAND of 0 (how the sheets mark
+unbranded rows) counts as no brand. Rows with an AMOUNT but no QTY (lump
+sums) are not part of the BOM.
+
+Usage:
+    python3 bom.py                    # whole project, largest amounts first
+    python3 bom.py --node MDB3        # one MDB/SMDB subtree
+    python3 bom.py --csv bom.csv      # every group, as CSV
+"""
+
+import argparse
+import csv
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from board_extraction import READERS, amount_column, has_amount, item_columns, load_workbook_data
+from board_tree import ROOT_KEY, BoardTree
+
+QTY_COLUMN_NAMES = ['QTY', 'QUANTITY']
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _normalize(value):
+    if value is None or value == 0:
+        return ''
+    return ' '.join(str(value).split())
+
+
+def board_units(sheet, record):
+    """NO OF UNITS of a board: the sheet's summary value, else TOTALLIST's NO OF ITEMS, else 1."""
+    for value in (sheet['summary'].get('no_of_units'), record.get('items')):
+        try:
+            if value is not None:
+                return float(value)
+        except (TypeError, ValueError):
+            continue
+    return 1.0
+
+
+def quantified_rows(items):
+    """(brand, item, qty, amount) of every row with a numeric QTY above zero."""
+    headers = item_columns(items)
+    qty_column = next((headers[name] for name in QTY_COLUMN_NAMES if name in headers), None)
+    if qty_column is None:
+        return
+    brand_column = headers.get('BRAND')
+    item_column = headers.get('ITEM') or headers.get('DESCRIPTION')
+    amount = amount_column(items)
+    for item in items:
+        qty = _number(item.get(qty_column))
+        if not qty or qty <= 0 or not has_amount(item, amount):
+            continue
+        yield (
+            _normalize(item.get(brand_column)) if brand_column else '',
+            _normalize(item.get(item_column)) if item_column else '',
+            qty,
+            (_number(item.get(amount)) or 0.0) if amount else 0.0
+        )
+
+
+class BillOfMaterials:
+    """Per-(brand, item) totals of the project and of every MDB/SMDB subtree."""
+
+    def __init__(self, data, tree=None):
+        records = data.index.records if data.index is not None else []
+        self.tree = tree or BoardTree(records)
+        self._load(data)
+        self._aggregate()
+
+    def _load(self, data):
+        """Columnar rows: board (tree key) index, item key index, qty and amount per row."""
+        self.boards = []          # tree keys of the boards with rows
+        self.keys = []            # (brand, item) display spelling
+        key_ids = {}
+        boards, keys, qtys, amounts = [], [], [], []
+        for node in self.tree.nodes.values():
+            if node.placeholder or node.key == ROOT_KEY:
+                continue
+            sheet = data.sheet(node.name)
+            if sheet is None:
+                continue
+            record = data.index.get(node.name) or {}
+            units = board_units(sheet, record)
+            board_id = None
+            for brand, item, qty, amount in quantified_rows(sheet['items']):
+                lookup = (brand.upper(), item.upper())
+                key_id = key_ids.get(lookup)
+                if key_id is None:
+                    key_id = key_ids[lookup] = len(self.keys)
+                    self.keys.append((brand, item))
+                if board_id is None:
+                    board_id = len(self.boards)
+                    self.boards.append(node.key)
+                boards.append(board_id)
+                keys.append(key_id)
+                qtys.append(qty * units)
+                amounts.append(amount * units)
+        self._rows = (boards, keys, qtys, amounts)
+
+    def _groups_of(self, board_key):
+        """Keys of the subtrees a board's rows count towards: its own and every ancestor's."""
+        groups = []
+        node = self.tree.nodes[board_key]
+        while node is not None:
+            groups.append(node.key)
+            node = node.parent
+        return groups
+
+    def _aggregate(self):
+        # Subtree keys with totals, the project first
+        self.groups = [ROOT_KEY]
+        group_ids = {ROOT_KEY: 0}
+        board_groups = []
+        for board_key in self.boards:
+            ids = []
+            for group in self._groups_of(board_key):
+                if group not in group_ids:
+                    group_ids[group] = len(self.groups)
+                    self.groups.append(group)
+                ids.append(group_ids[group])
+            board_groups.append(ids)
+        self._group_ids = group_ids
+        aggregate = self._aggregate_numpy if np is not None else self._aggregate_python
+        self._totals = aggregate(board_groups)
+
+    def _aggregate_numpy(self, board_groups):
+        """{group id: [(key id, qty, amount, board count)]} from one bincount over (group, key)."""
+        boards, keys, qtys, amounts = (np.asarray(column) for column in self._rows)
+        n_keys = max(len(self.keys), 1)
+        if not len(boards):
+            return {}
+
+        # Sum rows per (board, key) first, so board counts are distinct boards
+        pair, inverse = np.unique(boards.astype(np.int64) * n_keys + keys, return_inverse=True)
+        pair_qty = np.bincount(inverse, weights=qtys.astype(float), minlength=len(pair))
+        pair_amount = np.bincount(inverse, weights=amounts.astype(float), minlength=len(pair))
+        pair_board = pair // n_keys
+        pair_key = pair % n_keys
+
+        # Repeat every (board, key) pair once per group its board belongs to
+        group_counts = np.array([len(ids) for ids in board_groups], dtype=np.int64)
+        group_flat = np.array([group for ids in board_groups for group in ids], dtype=np.int64)
+        group_start = np.concatenate(([0], np.cumsum(group_counts)[:-1]))
+        repeats = group_counts[pair_board]
+        pair_index = np.repeat(np.arange(len(pair)), repeats)
+        # Position of each repeated copy within its board's group list
+        within = np.arange(len(pair_index)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        groups = group_flat[group_start[pair_board[pair_index]] + within]
+
+        # Only the (group, key) cells that occur, not a dense groups x keys table
+        cells, cell_index = np.unique(groups * n_keys + pair_key[pair_index], return_inverse=True)
+        qty = np.bincount(cell_index, weights=pair_qty[pair_index], minlength=len(cells))
+        amount = np.bincount(cell_index, weights=pair_amount[pair_index], minlength=len(cells))
+        count = np.bincount(cell_index, minlength=len(cells))
+
+        totals = {}
+        for i, cell in enumerate(cells.tolist()):
+            group_id, key_id = divmod(cell, n_keys)
+            totals.setdefault(group_id, []).append((key_id, float(qty[i]), float(amount[i]), int(count[i])))
+        return totals
+
+    def _aggregate_python(self, board_groups):
+        """Same as _aggregate_numpy, with dictionaries."""
+        pairs = {}
+        for board, key, qty, amount in zip(*self._rows):
+            total = pairs.setdefault((board, key), [0.0, 0.0])
+            total[0] += qty
+            total[1] += amount
+        cells = {}
+        for (board, key), (qty, amount) in pairs.items():
+            for group in board_groups[board]:
+                cell = cells.setdefault((group, key), [0.0, 0.0, 0])
+                cell[0] += qty
+                cell[1] += amount
+                cell[2] += 1
+        totals = {}
+        for (group, key), (qty, amount, count) in sorted(cells.items()):
+            totals.setdefault(group, []).append((key, qty, amount, count))
+        return totals
+
+    def group_keys(self):
+        """Keys of the project ('') and of every board with quantified rows in its subtree."""
+        return list(self.groups)
+
+    def get(self, key=ROOT_KEY, sort='amount'):
+        """BOM of one subtree: its lines sorted by amount (or qty/name) and its totals, or None."""
+        group_id = self._group_ids.get(key)
+        node = self.tree.nodes.get(key)
+        if node is None:
+            return None
+        lines = []
+        for key_id, qty, amount, boards in self._totals.get(group_id, []):
+            brand, item = self.keys[key_id]
+            lines.append({'brand': brand, 'item': item, 'qty': qty, 'amount': amount, 'boards': boards})
+        if sort == 'name':
+            lines.sort(key=lambda line: (line['brand'].upper(), line['item'].upper()))
+        else:
+            lines.sort(key=lambda line: line[sort], reverse=True)
+        return {
+            'key': key,
+            'name': node.name,
+            'kind': node.kind,
+            'lineCount': len(lines),
+            'totalQty': sum(line['qty'] for line in lines),
+            'totalAmount': sum(line['amount'] for line in lines),
+            'lines': lines
+        }
+
+
+def write_csv(bom, path):
+    """Every group's lines as CSV rows: group, brand, item, qty, amount, boards."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['GROUP', 'BRAND', 'ITEM', 'QTY', 'AMOUNT', 'BOARDS'])
+        for key in bom.group_keys():
+            group = bom.get(key, sort='name')
+            for line in group['lines']:
+                writer.writerow([key or 'PROJECT', line['brand'], line['item'],
+                                 round(line['qty'], 3), round(line['amount'], 2), line['boards']])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bill of materials per (BRAND, ITEM) from e2.xlsx')
+    parser.add_argument('--node', default=ROOT_KEY, help='MDB/SMDB whose subtree to report (default: whole project)')
+    parser.add_argument('--sort', choices=['amount', 'qty', 'name'], default='amount', help='line order')
+    parser.add_argument('--top', type=int, default=30, help='lines to print (default 30, 0 = all)')
+    parser.add_argument('--csv', metavar='FILE', help='write every group (project, MDBs, SMDBs) to a CSV file')
+    parser.add_argument('--reader', choices=READERS,
+                        help='workbook reader: openpyxl (default), xml (the faster direct XML reader) '
+                             'or formulas (xml with every formula recalculated)')
+    args = parser.parse_args()
+
+    print("Reading e2.xlsx...")
+    bom = BillOfMaterials(load_workbook_data('e2.xlsx', args.reader))
+    node = bom.tree.get(args.node) if args.node else bom.tree.root
+    result = bom.get(node.key, args.sort) if node is not None else None
+    if result is None:
+        print(f"Error: no board \"{args.node}\" in TOTALLIST")
+        sys.exit(1)
+
+    print(f"\n{result['name']}: {result['lineCount']} lines, total amount {result['totalAmount']:,.2f}\n")
+    print(f"{'BRAND':<12} {'ITEM':<40} {'QTY':>10} {'AMOUNT':>14} {'BOARDS':>7}")
+    for line in result['lines'][:args.top or None]:
+        print(f"{line['brand'][:12]:<12} {line['item'][:40]:<40} {line['qty']:>10,.1f} "
+              f"{line['amount']:>14,.2f} {line['boards']:>7}")
+    if args.csv:
+        write_csv(bom, args.csv)
+        print(f"\nCSV written to {args.csv} ({len(bom.group_keys())} groups)")
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Build every dashboard output from a single read of e2.xlsx.
+
+update_estimates.py, extract_all_boards.py, generate_embedded_data.py and
+generate_all_board_details.py each open the workbook on their own. build.py
+streams it once into an in-memory WorkbookData (the TOTALLIST index plus
+every sheet's items and summary, see board_extraction.py) and writes all
+of their outputs from it, in stages:
+
+    all boards      mdb_data.json and all_boards_data.json
+    embedded data   embed_data.js (once all boards is done)
+    board details   board_details/*.json, only boards whose inputs changed
+
+A timing summary of the load and of every stage is printed at the end.
+The stages run one after another: they are pure-Python work that threads
+would not speed up, and they take a fraction of the load time, which is
+what the single read saves.
+build_manifest.json is updated the same way the individual scripts update
+it, so they can still be run on their own, and when nothing changed since
+the last build the workbook is not loaded at all.
+
+With --update-estimates, TOTALLIST's Estimate and NO OF ITEMS cells are
+first patched from each board sheet's NET TOTAL and NO OF UNITS (like
+update_estimates.py) and the outputs are built with the new values.
+
+Usage:
+    python3 build.py
+    python3 build.py --update-estimates
+    python3 build.py --force --reader xml
+"""
+
+import argparse
+import os
+import time
+
+from board_extraction import DEFAULT_READER, READERS, load_workbook_data
+from build_manifest import hash_files, load_manifest, save_manifest, write_json_atomic
+from extract_all_boards import OUTPUT_FILES, summarize_boards, write_outputs
+from generate_all_board_details import (OUTPUT_DIR, board_details_entry, board_inputs, board_json_path,
+                                        built_with, changed_boards, is_up_to_date, remove_stale_boards)
+from generate_embedded_data import INPUT_FILES, embedded_data_js
+from metrics import PhaseTimer
+from profiling import add_profile_arguments, profiled
+from update_estimates import apply_updates, estimate_updates, patch_totallist, summary_values
+from xlsx_package import sheet_hashes
+
+WORKBOOK = 'e2.xlsx'
+EMBEDDED_DATA = 'embed_data.js'
+
+
+def outputs_up_to_date(manifest, hashes, reader=None):
+    """Check if every output was built from the current sheets and is still there."""
+    previous = manifest.get('all_boards', {})
+    if (previous.get('totallist') != hashes.get('TOTALLIST')
+            or previous.get('reader') != (reader or DEFAULT_READER)
+            or not all(os.path.exists(path) for path in OUTPUT_FILES)):
+        return False
+    embedded = manifest.get('embedded_data', {})
+    if embedded.get('inputs') != hash_files(INPUT_FILES) or not os.path.exists(EMBEDDED_DATA):
+        return False
+    return is_up_to_date(manifest.get('board_details'), hashes, reader)
+
+
+# Stages: each takes the results of the stages it depends on
+
+def build_all_boards(data):
+    """Write mdb_data.json and all_boards_data.json; returns both structures."""
+    outputs = summarize_boards(data.index)
+    write_outputs(*outputs)
+    return outputs
+
+
+def build_embedded_data(outputs):
+    """Write embed_data.js; returns the hash of the JSON files it was built from."""
+    with open(EMBEDDED_DATA, 'w') as f:
+        f.write(embedded_data_js(*outputs))
+    return hash_files(INPUT_FILES)
+
+
+def build_board_details(data, hashes, previous, reader=None):
+    """Write the changed board_details/ files; returns (manifest entry, boards written, errors)."""
+    index = data.index
+    boards = list(dict.fromkeys(index.names()))
+    previous_boards = previous['boards'] if previous else {}
+    inputs = {board_name: board_inputs(board_name, hashes, index) for board_name in boards}
+    changed = changed_boards(boards, inputs, previous_boards)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    built = {board_name: inputs[board_name] for board_name in boards if board_name not in changed}
+    errors = []
+    for board_name in changed:
+        details = data.board_details(board_name)
+        if details is None:
+            errors.append(f'{board_name}: Sheet "{board_name}" not found')
+            continue
+        try:
+            write_json_atomic(board_json_path(board_name), details,
+                              indent=2, default=str, ensure_ascii=False)
+        except Exception as e:
+            errors.append(f'{board_name}: saving: {e}')
+            continue
+        built[board_name] = inputs[board_name]
+
+    remove_stale_boards(previous_boards, inputs)
+    return board_details_entry(hashes, reader, boards, built), len(changed) - len(errors), errors
+
+
+def run_stages(stages):
+    """Run (name, function, dependencies) stages in order.
+
+    Every stage gets the results of the stages it depends on (listed before
+    it) as arguments. Returns {name: (result, seconds)}.
+    """
+    results = {}
+    for name, function, dependencies in stages:
+        arguments = [results[dependency][0] for dependency in dependencies]
+        started = time.perf_counter()
+        result = function(*arguments)
+        results[name] = (result, time.perf_counter() - started)
+    return results
+
+
+def print_timings(timer, results, notes):
+    print("\nTimings:")
+    for name, seconds in timer.phases.items():
+        print(f"  {name:<20} {seconds:>8.2f}s")
+    for name, (_, seconds) in results.items():
+        print(f"  {name:<20} {seconds:>8.2f}s  {notes.get(name, '')}".rstrip())
+    print(f"  {'total':<20} {timer.elapsed():>8.2f}s")
+
+
+def build(force=False, reader=None, update=False):
+    manifest = load_manifest()
+    timer = PhaseTimer()
+
+    print(f"Checking {WORKBOOK} for changed sheets...")
+    try:
+        with timer.phase('check'):
+            hashes = sheet_hashes(WORKBOOK)
+    except FileNotFoundError:
+        print(f"Error: {WORKBOOK} not found in current directory")
+        return
+    if not force and not update and outputs_up_to_date(manifest, hashes, reader):
+        print("No sheet changed since the last build, every output is up to date")
+        return
+
+    print(f"Loading {WORKBOOK}...")
+    with timer.activate():
+        data = load_workbook_data(WORKBOOK, reader)
+    if data.index is None:
+        print("Error: TOTALLIST sheet not found!")
+        return
+    print(f"Loaded {len(data.sheets)} sheets, {len(data.index)} boards in TOTALLIST")
+
+    if update:
+        print("Updating estimates in TOTALLIST...")
+        with timer.phase('update estimates'):
+            values = estimate_updates(data.index, lambda board_name: summary_values(
+                (data.sheet(board_name) or {}).get('summary')))
+            skipped = patch_totallist(WORKBOOK, values)
+            apply_updates(data.index, values, skipped)
+            hashes = sheet_hashes(WORKBOOK)
+
+    previous = None if force else built_with(manifest.get('board_details'), reader)
+    results = run_stages([
+        ('all boards', lambda: build_all_boards(data), []),
+        ('embedded data', build_embedded_data, ['all boards']),
+        ('board details', lambda: build_board_details(data, hashes, previous, reader), []),
+    ])
+
+    mdb_output, all_boards_output = results['all boards'][0]
+    details_entry, written, errors = results['board details'][0]
+    for error in errors:
+        print(f"  ERROR: {error}")
+
+    manifest['all_boards'] = {'totallist': hashes.get('TOTALLIST'), 'reader': reader or DEFAULT_READER}
+    manifest['embedded_data'] = {'inputs': results['embedded data'][0]}
+    manifest['board_details'] = details_entry
+    save_manifest(manifest)
+
+    print_timings(timer, results, {
+        'all boards': (f"{all_boards_output['count']} boards, {mdb_output['count']} main MDBs, "
+                       f"total {all_boards_output['total_estimate']:,.2f} AED"),
+        'embedded data': EMBEDDED_DATA,
+        'board details': f"{written} of {len(details_entry['boards']) + len(errors)} boards written"
+                         + (f", {len(errors)} errors" if errors else '')
+    })
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Build mdb_data.json, all_boards_data.json, embed_data.js and board_details/ '
+                    'from one read of e2.xlsx')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild everything, ignoring build_manifest.json')
+    parser.add_argument('--update-estimates', action='store_true',
+                        help="first update TOTALLIST's Estimate and NO OF ITEMS from the board sheets")
+    parser.add_argument('--reader', choices=READERS,
+                        help='workbook reader: openpyxl (default), xml (the faster direct XML reader) '
+                             'or formulas (xml with every formula recalculated)')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profiled(args, 'build'):
+        build(force=args.force, reader=args.reader, update=args.update_estimates)
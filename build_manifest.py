@@ -0,0 +1,69 @@
+"""
+Build manifest for incremental regeneration.
+
+build_manifest.json (next to board_details/) records what each generator
+script produced last time: the content hash of every board sheet and of
+its TOTALLIST row (plus the reader used and the boards that failed), the
+TOTALLIST hash behind all_boards_data.json, and the inputs behind
+embed_data.js. A rerun compares against it and only rebuilds
+outputs whose inputs changed.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_PATH = 'build_manifest.json'
+
+# Bump when the generated output format changes so every output is rebuilt
+MANIFEST_VERSION = 1
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Load the manifest, or return an empty one if it is missing or outdated."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        manifest = {'version': MANIFEST_VERSION}
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """Write the manifest atomically."""
+    manifest['version'] = MANIFEST_VERSION
+    write_json_atomic(path, manifest, indent=2, ensure_ascii=False)
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """Write JSON to a temporary file and rename it into place."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def hash_value(value):
+    """Stable hash of a JSON-serializable value."""
+    data = json.dumps(value, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+
+def hash_files(paths):
+    """Hash the contents of several files together (None if any is missing)."""
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            return None
+        digest.update(b'\0')
+    return digest.hexdigest()
@@ -0,0 +1,163 @@
+"""
+Server-Sent Events notifications for workbook changes.
+
+One background thread watches e2.xlsx through the WorkbookCache (a stat()
+call per interval; the file is only re-read when it actually changed). When
+a new workbook version appears, the on_change callback runs once to rebuild
+whatever the server precomputes (any dict it returns is added to the
+event), and a "version" event is pushed to every subscribed client. Server
+work is therefore proportional to edits, not to the number of open
+dashboards.
+
+Under a thread-pool server every open stream holds a thread, so the number
+of streams can be capped (max_subscribers): past it open_stream() returns
+None, the server answers 503 and the dashboard polls instead.
+"""
+
+import json
+import queue
+import threading
+import time
+
+# Seconds between file checks
+POLL_INTERVAL = 2.0
+# Seconds between keep-alive comments on idle event streams
+HEARTBEAT_INTERVAL = 15.0
+# Events kept per slow client before older ones are dropped
+MAX_PENDING_EVENTS = 10
+
+
+def format_sse(event, data):
+    """Format one Server-Sent Events message."""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+class ChangeNotifier:
+    """Watches a WorkbookCache and broadcasts version events to subscribers."""
+
+    def __init__(self, cache, interval=POLL_INTERVAL, on_change=None, max_subscribers=None):
+        self.cache = cache
+        self.interval = interval
+        self.on_change = on_change
+        self.max_subscribers = max_subscribers    # None: no limit
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._version = None
+        self._event = None
+
+    def start(self):
+        """Start the watcher thread (safe to call more than once)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='workbook-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                # A half-written workbook or a missing file: try again next interval
+                print(f"Workbook watcher: {e}")
+            self._stop.wait(self.interval)
+
+    def check(self):
+        """Reload the workbook if it changed and notify subscribers of a new version."""
+        entry = self.cache.get_entry()
+        if entry.version == self._version:
+            return
+        extra = self.on_change(entry) if self.on_change is not None else None
+        self._version = entry.version
+        self.publish('version', self.describe(entry, extra))
+
+    def describe(self, entry, extra=None):
+        """Payload of a version event."""
+        data = {'version': entry.version, 'lastUpdated': entry.modified.isoformat()}
+        if extra:
+            data.update(extra)
+        return data
+
+    def publish(self, event, data):
+        message = format_sse(event, data)
+        with self._lock:
+            if event == 'version':
+                self._event = message
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # The client is not keeping up; drop its oldest event
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                q.put_nowait(message)
+
+    def subscribe(self):
+        """New subscriber queue, or None when max_subscribers streams are already open."""
+        q = queue.Queue(maxsize=MAX_PENDING_EVENTS)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(q)
+            current = self._event
+        if current is not None:
+            # New clients learn the current version straight away
+            q.put_nowait(current)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def open_stream(self, heartbeat=HEARTBEAT_INTERVAL):
+        """SSE body for one client, or None when the stream limit is reached."""
+        self.start()
+        q = self.subscribe()
+        if q is None:
+            return None
+        return EventStream(self, q, heartbeat)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+class EventStream:
+    """Iterable SSE text for one subscriber.
+
+    The subscription is released when the client goes away, and also by
+    close(), which the WSGI server calls even if the body was never iterated.
+    """
+
+    def __init__(self, notifier, q, heartbeat=HEARTBEAT_INTERVAL):
+        self.notifier = notifier
+        self.queue = q
+        self.heartbeat = heartbeat
+
+    def __iter__(self):
+        try:
+            # Tell EventSource to wait a few seconds before reconnecting
+            yield 'retry: 5000\n\n'
+            last_sent = time.monotonic()
+            while True:
+                try:
+                    yield self.queue.get(timeout=self.heartbeat)
+                    last_sent = time.monotonic()
+                except queue.Empty:
+                    if time.monotonic() - last_sent >= self.heartbeat:
+                        yield ': keep-alive\n\n'
+                        last_sent = time.monotonic()
+        finally:
+            self.close()
+
+    def close(self):
+        self.notifier.unsubscribe(self.queue)
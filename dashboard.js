@@ -18,13 +18,43 @@ function formatNumber(num) {
     return new Intl.NumberFormat('en-AE').format(num);
 }
 
+// Dashboard data version and board list from the last API response,
+// used to request and apply ?since= deltas
+let dashboardVersion = null;
+let apiBoards = [];
+
+// Key for every board: its name, with "#2", "#3"... for repeated names
+// (must match board_keys() in dashboard_history.py)
+function boardKeys(boards) {
+    const seen = {};
+    return boards.map(board => {
+        seen[board.name] = (seen[board.name] || 0) + 1;
+        return seen[board.name] === 1 ? board.name : `${board.name}#${seen[board.name]}`;
+    });
+}
+
+// Apply an added/removed/modified delta to a board list
+function applyBoardsDelta(boards, delta) {
+    const keys = boardKeys(boards);
+    const byKey = new Map(keys.map((key, i) => [key, boards[i]]));
+    (delta.removed || []).forEach(key => byKey.delete(key));
+    (delta.modified || []).forEach(board => byKey.set(board.key, board));
+    (delta.added || []).forEach(board => byKey.set(board.key, board));
+    const order = delta.order || Array.from(byKey.keys());
+    return order.map(key => byKey.get(key));
+}
+
 // Load and display dashboard data
 async function loadDashboardData() {
     try {
         // Try to fetch from API endpoint first (when running on server)
         let response;
         try {
-            response = await fetch('/api/dashboard-data');
+            // Once we have a version, ask only for what changed since then
+            const url = dashboardVersion !== null
+                ? `/api/dashboard-data?since=${dashboardVersion}`
+                : '/api/dashboard-data';
+            response = await fetch(url);
             if (!response.ok) {
                 throw new Error('API not available');
             }
@@ -35,9 +65,21 @@ async function loadDashboardData() {
                 throw new Error(apiData.error);
             }
             
+            const boards = apiData.delta
+                ? applyBoardsDelta(apiBoards, apiData)
+                : (apiData.allBoards || []);
+            apiBoards = boards;
+            const newVersion = apiData.version !== undefined ? apiData.version : null;
+            if (newVersion !== dashboardVersion) {
+                // Prefetched board details belong to the previous workbook version
+                boardDetailsCache.clear();
+                prefetchedMDBs.clear();
+            }
+            dashboardVersion = newVersion;
+            
             // Transform API data to match expected format
             const data = {
-                all_boards: apiData.allBoards || [],
+                all_boards: boards,
                 total_estimate: apiData.allBoardsTotal || 0,
                 total_load: apiData.allBoardsTotalLoad || 0,
                 total_items: apiData.allBoardsTotalItems || 0,
@@ -61,8 +103,12 @@ async function loadDashboardData() {
         } catch (apiError) {
             console.warn('API fetch failed, trying JSON file:', apiError);
             
-            // Fallback: Try to fetch from JSON file
-            response = await fetch('all_boards_data.json');
+            // Fallback: Try to fetch from JSON file (the compact copy in the static data if there is one)
+            const staticIndex = await loadStaticIndex();
+            const allBoardsPath = staticIndex && staticIndex.allBoards
+                ? `${STATIC_DATA_DIR}/${staticIndex.allBoards}`
+                : 'all_boards_data.json';
+            response = await fetch(allBoardsPath);
             if (!response.ok) {
                 throw new Error('Failed to load data');
             }
@@ -261,7 +307,7 @@ function displayMDBSection(mdbName, boards) {
         // Make row clickable
         row.style.cursor = 'pointer';
         row.addEventListener('click', () => {
-            showBoardDetails(board.name);
+            showBoardDetails(board.name, mdbName);
         });
         
         tbody.appendChild(row);
@@ -287,6 +333,11 @@ function setupFilter() {
 
 // Filter MDB sections based on selection
 function filterMDBSections(selectedMDB) {
+    if (selectedMDB !== 'all') {
+        // The user is likely to open boards of this MDB next
+        prefetchMDBDetails(selectedMDB);
+    }
+    
     const allSections = document.querySelectorAll('.mdb-section');
     
     allSections.forEach(section => {
@@ -303,8 +354,88 @@ function filterMDBSections(selectedMDB) {
     });
 }
 
+// Board details prefetched with the batch API, by board name
+const boardDetailsCache = new Map();
+const prefetchedMDBs = new Set();
+
+// Fetch the details of every board under a main MDB in one request (NDJSON stream)
+async function prefetchMDBDetails(mdbName) {
+    if (!mdbName || prefetchedMDBs.has(mdbName)) return;
+    prefetchedMDBs.add(mdbName);
+    
+    try {
+        const response = await fetch(`/api/board-details/batch?mdb=${encodeURIComponent(mdbName)}`);
+        const contentType = response.headers.get('content-type') || '';
+        if (!response.ok || !contentType.includes('application/x-ndjson') || !response.body) {
+            throw new Error('Batch API not available');
+        }
+        
+        // Store each board as its line arrives
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.forEach(line => {
+                if (!line.trim()) return;
+                const details = JSON.parse(line);
+                if (!details.error) {
+                    boardDetailsCache.set(details.name, details);
+                }
+            });
+            if (done) break;
+        }
+    } catch (err) {
+        // Not running on the Flask server; details are fetched one by one instead
+        console.warn('Board details prefetch failed:', err);
+    }
+}
+
+// Static hosting: static_data/index.json (generate_static_data.py) maps every
+// board to a content-hashed file and the byte range of its JSON in that file
+const STATIC_DATA_DIR = 'static_data';
+let staticIndexPromise = null;
+const staticFiles = new Map();
+
+function loadStaticIndex() {
+    if (!staticIndexPromise) {
+        staticIndexPromise = fetch(`${STATIC_DATA_DIR}/index.json`, { cache: 'no-cache' })
+            .then(response => response.ok ? response.json() : null)
+            .catch(() => null);
+    }
+    return staticIndexPromise;
+}
+
+// Fetch a data file once; file names change whenever their contents do
+function loadStaticFile(fileName) {
+    if (!staticFiles.has(fileName)) {
+        const promise = fetch(`${STATIC_DATA_DIR}/${fileName}`).then(response => {
+            if (!response.ok) {
+                throw new Error(`Static data file not found: ${fileName}`);
+            }
+            return response.arrayBuffer();
+        });
+        promise.catch(() => staticFiles.delete(fileName));
+        staticFiles.set(fileName, promise);
+    }
+    return staticFiles.get(fileName);
+}
+
+// Board details from the static data, or null if there is no index or board entry
+async function loadStaticBoardDetails(boardName) {
+    const index = await loadStaticIndex();
+    const entry = index && index.boards && index.boards[boardName];
+    if (!entry) return null;
+    const buffer = await loadStaticFile(entry.file);
+    const bytes = new Uint8Array(buffer, entry.offset, entry.length);
+    return JSON.parse(new TextDecoder().decode(bytes));
+}
+
 // Show board details modal
-async function showBoardDetails(boardName) {
+async function showBoardDetails(boardName, mdbName) {
     const modal = document.getElementById('board-detail-modal');
     const loading = document.getElementById('detail-loading');
     const content = document.getElementById('detail-content');
@@ -330,26 +461,30 @@ async function showBoardDetails(boardName) {
         let data;
         
         try {
-            response = await fetch(`/api/board-details?name=${encodeURIComponent(boardName)}`);
-            if (!response.ok) {
-                throw new Error('API not available');
-            }
+            if (boardDetailsCache.has(boardName)) {
+                data = boardDetailsCache.get(boardName);
+            } else {
+                response = await fetch(`/api/board-details?name=${encodeURIComponent(boardName)}`);
+                if (!response.ok) {
+                    throw new Error('API not available');
+                }
             
-            // Check if response is JSON (API response) or HTML (redirect from static hosting)
-            const contentType = response.headers.get('content-type');
-            if (contentType && contentType.includes('application/json')) {
-                try {
-                    data = await response.json();
-                } catch (jsonParseError) {
-                    // If JSON parsing fails, it might be HTML from redirect
-                    throw new Error('API endpoint returned invalid response');
+                // Check if response is JSON (API response) or HTML (redirect from static hosting)
+                const contentType = response.headers.get('content-type');
+                if (contentType && contentType.includes('application/json')) {
+                    try {
+                        data = await response.json();
+                    } catch (jsonParseError) {
+                        // If JSON parsing fails, it might be HTML from redirect
+                        throw new Error('API endpoint returned invalid response');
+                    }
+                } else {
+                    // Response is not JSON, likely HTML redirect from static hosting
+                    throw new Error('API endpoint not available');
                 }
-            } else {
-                // Response is not JSON, likely HTML redirect from static hosting
-                throw new Error('API endpoint not available');
             }
         } catch (apiError) {
-            // Fallback: Try to fetch from static JSON file
+            // Fallback: Try the static data files, then the per-board JSON file
             console.warn('API fetch failed, trying JSON file:', apiError);
             
             // Sanitize board name for filename (replace special characters)
@@ -357,12 +492,18 @@ async function showBoardDetails(boardName) {
             const jsonPath = `board_details/${safeName}.json`;
             
             try {
-                response = await fetch(jsonPath);
-                if (!response.ok) {
-                    throw new Error(`Board details file not found: ${jsonPath}`);
+                data = await loadStaticBoardDetails(boardName).catch(err => {
+                    console.warn('Static data not available:', err);
+                    return null;
+                });
+                if (!data) {
+                    response = await fetch(jsonPath);
+                    if (!response.ok) {
+                        throw new Error(`Board details file not found: ${jsonPath}`);
+                    }
+                    
+                    data = await response.json();
                 }
-                
-                data = await response.json();
             } catch (jsonError) {
                 // If JSON file also fails, show error
                 throw new Error(`Unable to load board details. ${jsonError.message}`);
@@ -378,6 +519,9 @@ async function showBoardDetails(boardName) {
         loading.style.display = 'none';
         content.style.display = 'block';
         
+        // Load the rest of this MDB's boards so the next ones open instantly
+        prefetchMDBDetails(mdbName);
+        
     } catch (err) {
         console.error('Error loading board details:', err);
         loading.style.display = 'none';
@@ -711,26 +855,65 @@ function checkHashAndOpenModal() {
     }
 }
 
-// Auto-refresh interval (in milliseconds) - refresh every 30 seconds
+// Auto-refresh: the server pushes a "version" event over Server-Sent Events
+// whenever e2.xlsx changes. Polling every 30 seconds is only used when the
+// event stream is not available (e.g. static hosting).
 let autoRefreshInterval = null;
 const AUTO_REFRESH_INTERVAL = 30000; // 30 seconds
+let changeEvents = null;
+let dataVersion = null;
 
 // Start auto-refresh
 function startAutoRefresh() {
-    // Clear any existing interval
-    if (autoRefreshInterval) {
-        clearInterval(autoRefreshInterval);
-    }
+    // Clear any existing interval or event stream
+    stopAutoRefresh();
     
     // Only start auto-refresh if we're on a server (not file:// protocol)
-    if (window.location.protocol === 'http:' || window.location.protocol === 'https:') {
-        autoRefreshInterval = setInterval(() => {
-            console.log('Auto-refreshing dashboard data...');
-            loadDashboardData();
-        }, AUTO_REFRESH_INTERVAL);
-        
-        console.log(`Auto-refresh enabled: updating every ${AUTO_REFRESH_INTERVAL / 1000} seconds`);
+    if (window.location.protocol !== 'http:' && window.location.protocol !== 'https:') {
+        return;
     }
+    
+    if (window.EventSource) {
+        changeEvents = new EventSource('/api/events');
+        changeEvents.addEventListener('version', (event) => {
+            const info = JSON.parse(event.data);
+            if (dataVersion !== null && info.version !== dataVersion) {
+                console.log('Workbook changed, refreshing dashboard data...');
+                loadDashboardData();
+            }
+            dataVersion = info.version;
+        });
+        let eventsOpened = false;
+        changeEvents.onopen = () => {
+            eventsOpened = true;
+        };
+        changeEvents.onerror = () => {
+            // Once connected, EventSource retries by itself (e.g. across a server restart).
+            // CLOSED means the endpoint doesn't exist or refused the stream (503 when the
+            // server is at its event stream limit); an error before the first open means
+            // the connection failed. In both cases poll instead.
+            if (changeEvents && (changeEvents.readyState === EventSource.CLOSED || !eventsOpened)) {
+                console.warn('Change notifications unavailable, falling back to polling');
+                changeEvents.close();
+                changeEvents = null;
+                startPolling();
+            }
+        };
+        console.log('Auto-refresh enabled: listening for workbook changes');
+        return;
+    }
+    
+    startPolling();
+}
+
+// Poll for new data at a fixed interval
+function startPolling() {
+    autoRefreshInterval = setInterval(() => {
+        console.log('Auto-refreshing dashboard data...');
+        loadDashboardData();
+    }, AUTO_REFRESH_INTERVAL);
+    
+    console.log(`Auto-refresh enabled: updating every ${AUTO_REFRESH_INTERVAL / 1000} seconds`);
 }
 
 // Stop auto-refresh
@@ -739,6 +922,10 @@ function stopAutoRefresh() {
         clearInterval(autoRefreshInterval);
         autoRefreshInterval = null;
     }
+    if (changeEvents) {
+        changeEvents.close();
+        changeEvents = null;
+    }
 }
 
 // Initialize dashboard on page load
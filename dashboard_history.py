@@ -0,0 +1,127 @@
+"""
+Versioned dashboard data with a short history for delta responses.
+
+Every new workbook version gets a dashboard version id. Ids are the
+workbook's modification time in milliseconds (bumped if that would not
+increase), so they stay unique across server restarts and every worker
+process of a multi-process server gives the same file the same id.
+
+The last few versions keep their boards keyed by name. A client that
+already has version N can ask for /api/dashboard-data?since=N and get only
+the boards that were added, removed or modified since then, plus the new
+totals.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Number of past versions kept for delta responses
+MAX_VERSIONS = 20
+
+# Fields of the dashboard payload that hold board lists rather than totals
+BOARD_LIST_FIELDS = ['allBoards']
+
+
+def board_keys(boards):
+    """Stable key for every board: its name, with "#2", "#3"... for repeated names."""
+    seen = {}
+    keys = []
+    for board in boards:
+        count = seen.get(board['name'], 0) + 1
+        seen[board['name']] = count
+        keys.append(board['name'] if count == 1 else f"{board['name']}#{count}")
+    return keys
+
+
+class DashboardVersion:
+    """One dashboard payload and its boards keyed by board key."""
+
+    def __init__(self, version_id, workbook_version, payload):
+        self.id = version_id
+        self.workbook_version = workbook_version
+        self.payload = dict(payload, version=version_id)
+        boards = payload.get('allBoards', [])
+        self.keys = board_keys(boards)
+        self.boards = dict(zip(self.keys, boards))
+
+
+class DashboardHistory:
+    """Assigns version ids to dashboard payloads and computes deltas between them."""
+
+    def __init__(self, max_versions=MAX_VERSIONS):
+        self._versions = OrderedDict()
+        self._max_versions = max_versions
+        self._current = None
+        self._lock = threading.Lock()
+        self._last_id = 0
+
+    @property
+    def current(self):
+        return self._current
+
+    def record(self, workbook_version, modified, build_payload):
+        """Return the DashboardVersion for a workbook version, building it on first sight.
+
+        modified is the workbook's modification time (a datetime).
+        """
+        current = self._current
+        if current is not None and current.workbook_version == workbook_version:
+            return current
+
+        with self._lock:
+            current = self._current
+            if current is not None and current.workbook_version == workbook_version:
+                return current
+
+            payload = build_payload()
+            if 'error' in payload:
+                # Errors are not versioned; the next request tries again
+                return DashboardVersion(None, workbook_version, payload)
+
+            version_id = max(self._last_id + 1, int(modified.timestamp() * 1000))
+            self._last_id = version_id
+            current = DashboardVersion(version_id, workbook_version, payload)
+            self._versions[version_id] = current
+            while len(self._versions) > self._max_versions:
+                self._versions.popitem(last=False)
+            self._current = current
+            return current
+
+    def get(self, version_id):
+        return self._versions.get(version_id)
+
+    def delta(self, since_id, current):
+        """Changes from version since_id to current, or None if since_id is unknown."""
+        previous = self._versions.get(since_id)
+        if previous is None or current.id is None:
+            return None
+
+        # Added and modified boards carry their key so clients can place them
+        added = [
+            dict(current.boards[key], key=key) for key in current.keys
+            if key not in previous.boards
+        ]
+        removed = [key for key in previous.keys if key not in current.boards]
+        modified = [
+            dict(current.boards[key], key=key) for key in current.keys
+            if key in previous.boards and previous.boards[key] != current.boards[key]
+        ]
+
+        delta = {
+            key: value for key, value in current.payload.items()
+            if key not in BOARD_LIST_FIELDS
+        }
+        delta.update({
+            'delta': True,
+            'since': since_id,
+            'added': added,
+            'removed': removed,
+            'modified': modified
+        })
+
+        # Only send the board order when applying the delta would not reproduce it
+        kept = [key for key in previous.keys if key in current.boards]
+        expected = kept + [key for key in current.keys if key not in previous.boards]
+        if expected != current.keys:
+            delta['order'] = current.keys
+        return delta
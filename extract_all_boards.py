@@ -1,51 +1,29 @@
-import openpyxl
+import argparse
 import json
+import os
+from board_extraction import DEFAULT_READER, READERS, open_workbook
+from build_manifest import load_manifest, save_manifest
+from profiling import add_profile_arguments, profiled
+from totallist_index import load_totallist_index
+from xlsx_package import sheet_hashes
 
-def extract_all_boards():
-    """Extract all boards from TOTALLIST sheet with all available columns."""
-    print("Loading workbook...")
-    wb = openpyxl.load_workbook('e2.xlsx', data_only=True)
-    
-    if 'TOTALLIST' not in wb.sheetnames:
-        print("Error: TOTALLIST sheet not found!")
-        return
-    
-    ws_totallist = wb['TOTALLIST']
-    
+OUTPUT_FILES = ['mdb_data.json', 'all_boards_data.json']
+
+def summarize_boards(index):
+    """Build the mdb_data.json and all_boards_data.json structures from the TOTALLIST index."""
     # Find all boards
     all_boards = []
     main_mdb_boards = []
     
-    # Column indices (1-based) - Updated based on actual structure
-    numtag_col = 1      # Column A
-    kind_col = 2        # Column B
-    mdb_col = 3         # Column C
-    smdb_col = 4        # Column D
-    itemdrop_col = 5    # Column E (Board Name)
-    load_col = 6        # Column F
-    items_col = 7       # Column G
-    estimate_col = 8    # Column H
-    
-    print(f"Scanning {ws_totallist.max_row} rows in TOTALLIST sheet...")
-    
-    # Process rows starting from row 2 (assuming row 1 is header)
-    for row_idx in range(2, ws_totallist.max_row + 1):
-        board_name_cell = ws_totallist.cell(row_idx, itemdrop_col)
-        board_name = board_name_cell.value
-        
-        if not board_name or str(board_name).strip() == '':
-            continue
-        
-        board_name = str(board_name).strip()
-        
-        # Extract all fields
-        numtag = ws_totallist.cell(row_idx, numtag_col).value
-        kind = ws_totallist.cell(row_idx, kind_col).value
-        mdb = ws_totallist.cell(row_idx, mdb_col).value
-        smdb = ws_totallist.cell(row_idx, smdb_col).value
-        load = ws_totallist.cell(row_idx, load_col).value
-        items = ws_totallist.cell(row_idx, items_col).value
-        estimate = ws_totallist.cell(row_idx, estimate_col).value
+    for record in index:
+        board_name = record['name']
+        numtag = record['numtag']
+        kind = record['kind']
+        mdb = record['mdb']
+        smdb = record['smdb']
+        load = record['load_raw']
+        items = record['items']
+        estimate = record['estimate']
         
         try:
             estimate_value = float(estimate) if estimate is not None else 0
@@ -63,9 +41,9 @@ def extract_all_boards():
             board_data = {
                 'name': board_name,
                 'numtag': numtag if numtag is not None else None,
-                'kind': str(kind).strip() if kind else None,
-                'mdb': str(mdb).strip() if mdb else None,
-                'smdb': str(smdb).strip() if smdb else None,
+                'kind': kind,
+                'mdb': mdb,
+                'smdb': smdb,
                 'load': load_value,
                 'items': items_value,
                 'estimate': estimate_value
@@ -76,7 +54,7 @@ def extract_all_boards():
             # Check if it's one of the 4 main MDBs
             # Main MDBs are identified by KIND='MDB' and the board name matches MDB1, MDB2, MDB3, or MDB.GF.04
             board_name_upper = board_name.upper()
-            kind_upper = str(kind).upper() if kind else ''
+            kind_upper = kind.upper() if kind else ''
             
             is_main_mdb = (
                 kind_upper == 'MDB' and (
@@ -86,7 +64,7 @@ def extract_all_boards():
                     board_name_upper == 'MDB4' or
                     board_name_upper == 'MDB.GF.04' or
                     'MDB.GF.04' in board_name_upper or
-                    (mdb and str(mdb).upper() in ['MDB1', 'MDB2', 'MDB3', 'MDB.GF.04', 'MDB4'])
+                    (mdb and mdb.upper() in ['MDB1', 'MDB2', 'MDB3', 'MDB.GF.04', 'MDB4'])
                 )
             )
             
@@ -155,25 +133,75 @@ def extract_all_boards():
         'main_mdb_total': main_total,
         'boards_by_mdb': boards_by_mdb
     }
-    
-    # Save to JSON files
+    return mdb_output, all_boards_output
+
+def write_outputs(mdb_output, all_boards_output):
+    """Save mdb_data.json and all_boards_data.json."""
     with open('mdb_data.json', 'w') as f:
         json.dump(mdb_output, f, indent=2)
     
     with open('all_boards_data.json', 'w') as f:
         json.dump(all_boards_output, f, indent=2)
-    
+
+def print_summary(mdb_output, all_boards_output):
     print(f"\nSummary:")
-    print(f"  Main MDBs: {len(main_mdb_boards)}")
-    print(f"  Main MDB Total: {main_total:,.2f} AED")
-    print(f"  Main MDB Total Load: {main_total_load:,.2f} kW")
-    print(f"  All Boards: {len(all_boards)}")
-    print(f"  All Boards Total: {all_total:,.2f} AED")
-    print(f"  All Boards Total Load: {all_total_load:,.2f} kW")
-    print(f"  Total Items: {all_total_items}")
+    print(f"  Main MDBs: {mdb_output['count']}")
+    print(f"  Main MDB Total: {mdb_output['total_estimate']:,.2f} AED")
+    print(f"  Main MDB Total Load: {mdb_output['total_load']:,.2f} kW")
+    print(f"  All Boards: {all_boards_output['count']}")
+    print(f"  All Boards Total: {all_boards_output['total_estimate']:,.2f} AED")
+    print(f"  All Boards Total Load: {all_boards_output['total_load']:,.2f} kW")
+    print(f"  Total Items: {all_boards_output['total_items']}")
     print(f"  Data saved to mdb_data.json and all_boards_data.json")
+
+def extract_all_boards(force=False, reader=None):
+    """Extract all boards from TOTALLIST sheet with all available columns."""
+    # Both outputs come from TOTALLIST alone, so skip the run if it is unchanged
+    # and was read the same way (the formulas reader recalculates its values)
+    manifest = load_manifest()
+    totallist_hash = sheet_hashes('e2.xlsx', ['TOTALLIST']).get('TOTALLIST')
+    previous = manifest.get('all_boards', {})
+    if (not force and totallist_hash is not None
+            and previous.get('totallist') == totallist_hash
+            and previous.get('reader') == (reader or DEFAULT_READER)
+            and all(os.path.exists(path) for path in OUTPUT_FILES)):
+        print("TOTALLIST unchanged, mdb_data.json and all_boards_data.json are up to date")
+        with open('mdb_data.json') as f:
+            mdb_output = json.load(f)
+        with open('all_boards_data.json') as f:
+            all_boards_output = json.load(f)
+        return mdb_output, all_boards_output
+    
+    # Only TOTALLIST is read, streamed in read-only mode
+    print("Loading workbook...")
+    wb = open_workbook('e2.xlsx', reader)
+    try:
+        index = load_totallist_index(wb)
+    finally:
+        wb.close()
+    
+    if index is None:
+        print("Error: TOTALLIST sheet not found!")
+        return
+    
+    print(f"Found {len(index)} boards in TOTALLIST sheet...")
+    mdb_output, all_boards_output = summarize_boards(index)
+    write_outputs(mdb_output, all_boards_output)
+    
+    manifest['all_boards'] = {'totallist': totallist_hash, 'reader': reader or DEFAULT_READER}
+    save_manifest(manifest)
     
+    print_summary(mdb_output, all_boards_output)
     return mdb_output, all_boards_output
 
 if __name__ == '__main__':
-    extract_all_boards()
+    parser = argparse.ArgumentParser(description='Extract mdb_data.json and all_boards_data.json from e2.xlsx')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild even if TOTALLIST is unchanged since the last run')
+    parser.add_argument('--reader', choices=READERS,
+                        help='workbook reader: openpyxl (default), xml (the faster direct XML reader) '
+                             'or formulas (xml with every formula recalculated)')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profiled(args, 'extract_all_boards'):
+        extract_all_boards(force=args.force, reader=args.reader)
@@ -0,0 +1,859 @@
+#!/usr/bin/env python3
+"""
+Headless recalculation of the formulas in an .xlsx workbook.
+
+The extraction scripts read the values Excel cached next to every formula.
+A workbook saved by openpyxl (or generated by a script) has formulas
+without cached values, and AMOUNT, NET TOTAL and TOTALLIST Estimate then
+read back as None. This module evaluates the formula subset the project
+workbooks use, without Excel or LibreOffice:
+
+- numbers, strings, TRUE/FALSE, error values and the operators
+  + - * / ^ & % = <> < > <= >= (on single values and, elementwise, ranges)
+- references: A1, $A$1, ranges A1:B5, other sheets ('SMDB.GF.01'!F180),
+  table columns (total_list[Estimate])
+- SUM, SUMPRODUCT, SUBTOTAL (9/109 SUM, 1/101 AVERAGE, 2/102 COUNT,
+  4/104 MAX, 5/105 MIN), MIN, MAX, AVERAGE, COUNT, ROUND, ABS, IF, IFERROR
+
+Formulas are parsed once per relative (R1C1) form, so a column of
+=D5*E5, =D6*E6, ... is parsed once, and bound to closures over the cell
+values. Each formula registers
+the cells it reads, giving a dependency graph with a topological order of
+all formula cells. recalculate() evaluates every formula in that order;
+set_values() changes input cells and re-evaluates only the formulas
+downstream of them. Formulas outside the subset (defined names, other
+functions) keep their cached value and are listed in unsupported. Hidden
+rows are not known, so SUBTOTAL(109, ...) sums them like SUBTOTAL(9, ...).
+
+open_workbook(path, reader='formulas') (board_extraction.py) reads through
+RecalculatedWorkbook, so every extraction script can use the recalculated
+values (E2_XLSX_READER=formulas).
+
+Usage:
+    python3 formula_engine.py                         # recalculate e2.xlsx, compare with the cached values
+    python3 formula_engine.py book.xlsx --set "SMDB.GF.01!E12=4" --show TOTALLIST!H264
+"""
+
+import argparse
+import math
+import posixpath
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from openpyxl.formula.translate import Translator
+from openpyxl.utils.cell import column_index_from_string, get_column_letter, range_boundaries
+from openpyxl.utils.datetime import to_excel
+
+import xlsx_reader
+from xlsx_package import MAIN_NS, PKG_REL_NS, sheet_parts
+
+ERROR_CODES = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'}
+TABLE_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/table'
+
+SHEET_PREFIX = r"(?:(?:'(?:[^']|'')+'|[A-Za-z_][\w.]*)!)"
+CELL = r'\$?[A-Za-z]{1,3}\$?\d+'
+TOKEN = re.compile(rf"""\s*(?:
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<error>\#(?:NULL!|DIV/0!|VALUE!|REF!|NAME\?|NUM!|N/A))
+  | (?P<function>[A-Za-z_][\w.]*)(?=\s*\()
+  | (?P<table>[A-Za-z_][\w.]*\[(?:[^\[\]]|\[[^\]]*\])*\])
+  | (?P<ref>{SHEET_PREFIX}?{CELL}(?::{CELL})?)(?![\w(])
+  | (?P<bool>TRUE|FALSE)\b
+  | (?P<op><>|<=|>=|[-+*/^&=<>%(),])
+)""", re.X | re.I)
+CELL_REF = re.compile(rf'^({SHEET_PREFIX})?({CELL})$')
+CELL_PARTS = re.compile(r'(\$?)([A-Za-z]{1,3})(\$?)(\d+)')
+# A1 references outside strings and quoted sheet names (for relative_form)
+RELATIVE_REF = re.compile(r""""(?:[^"]|"")*"|'(?:[^']|'')*'|(?<![\w.$])(\$?)([A-Za-z]{1,3})(\$?)(\d+)(?![\w(!\[])""")
+
+# Binary operators by precedence, lowest first
+PRECEDENCE = {'=': 1, '<>': 1, '<': 1, '>': 1, '<=': 1, '>=': 1, '&': 2, '+': 3, '-': 3, '*': 4, '/': 4, '^': 5}
+SUBTOTAL_FUNCTIONS = {1: 'AVERAGE', 2: 'COUNT', 4: 'MAX', 5: 'MIN', 9: 'SUM'}
+
+
+class CellError(Exception):
+    """An Excel error value (#DIV/0!, #VALUE!, ...) raised during evaluation."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class FormulaSyntaxError(ValueError):
+    """A formula outside the supported subset."""
+
+
+class Array(list):
+    """Values of a range (row by row) or of an elementwise operation on ranges."""
+
+
+def _sheet_name(prefix):
+    name = prefix[:-1]
+    if name.startswith("'"):
+        name = name[1:-1].replace("''", "'")
+    return name
+
+
+def _number(value):
+    """A value as a number, the way Excel coerces operands of arithmetic."""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return to_excel(value)
+    if isinstance(value, str):
+        if value in ERROR_CODES:
+            raise CellError(value)
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    raise CellError('#VALUE!')
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, str) and value in ERROR_CODES:
+        raise CellError(value)
+    return str(value)
+
+
+def _check(value):
+    """Raise the error a cell holds, so errors propagate through every operation."""
+    if isinstance(value, str) and value in ERROR_CODES:
+        raise CellError(value)
+    return value
+
+
+def _compare(op, left, right):
+    left, right = _check(left), _check(right)
+    # Blank cells compare as 0, "" or FALSE depending on the other side
+    if left is None:
+        left = '' if isinstance(right, str) else False if isinstance(right, bool) else 0
+    if right is None:
+        right = '' if isinstance(left, str) else False if isinstance(left, bool) else 0
+
+    def rank(value):
+        return 2 if isinstance(value, bool) else 1 if isinstance(value, str) else 0
+
+    if rank(left) != rank(right):
+        left, right = rank(left), rank(right)
+    elif isinstance(left, str):
+        left, right = left.upper(), right.upper()
+    elif isinstance(left, (datetime, date)) or isinstance(right, (datetime, date)):
+        left, right = _number(left), _number(right)
+    return {'=': left == right, '<>': left != right, '<': left < right,
+            '>': left > right, '<=': left <= right, '>=': left >= right}[op]
+
+
+def _arithmetic(op, left, right):
+    if op == '&':
+        return _text(left) + _text(right)
+    if op in ('=', '<>', '<', '>', '<=', '>='):
+        return _compare(op, left, right)
+    left, right = _number(left), _number(right)
+    if op == '+':
+        return left + right
+    if op == '-':
+        return left - right
+    if op == '*':
+        return left * right
+    if op == '/':
+        if right == 0:
+            raise CellError('#DIV/0!')
+        return left / right
+    try:
+        result = left ** right
+    except (OverflowError, ZeroDivisionError):
+        raise CellError('#NUM!')
+    if isinstance(result, complex):
+        raise CellError('#NUM!')
+    return result
+
+
+def _elementwise(function, *operands):
+    """Apply function to single values, or element by element when an operand is a range."""
+    arrays = [operand for operand in operands if isinstance(operand, Array)]
+    if not arrays:
+        return function(*operands)
+    size = len(arrays[0])
+    if any(len(array) != size for array in arrays):
+        raise CellError('#VALUE!')
+    result = Array()
+    for i in range(size):
+        try:
+            result.append(function(*(operand[i] if isinstance(operand, Array) else operand
+                                     for operand in operands)))
+        except CellError as e:
+            result.append(e.code)
+    return result
+
+
+def _numbers(values):
+    """Numbers of SUM-style arguments: range cells only count when numeric, single values are coerced."""
+    for value in values:
+        if isinstance(value, Array):
+            for cell in value:
+                _check(cell)
+                if isinstance(cell, (int, float)) and not isinstance(cell, bool):
+                    yield cell
+        else:
+            yield _number(value)
+
+
+def _sum(*values):
+    return sum(_numbers(values))
+
+
+def _min(*values):
+    return min(_numbers(values), default=0)
+
+
+def _max(*values):
+    return max(_numbers(values), default=0)
+
+
+def _count(*values):
+    count = 0
+    for value in values:
+        cells = value if isinstance(value, Array) else [value]
+        count += sum(1 for cell in cells if isinstance(cell, (int, float)) and not isinstance(cell, bool))
+    return count
+
+
+def _average(*values):
+    numbers = list(_numbers(values))
+    if not numbers:
+        raise CellError('#DIV/0!')
+    return sum(numbers) / len(numbers)
+
+
+def _sumproduct(*arrays):
+    arrays = [array if isinstance(array, Array) else Array([array]) for array in arrays]
+    if not arrays or any(len(array) != len(arrays[0]) for array in arrays):
+        raise CellError('#VALUE!')
+    total = 0
+    for cells in zip(*arrays):
+        product = 1
+        for cell in cells:
+            _check(cell)
+            product *= cell if isinstance(cell, (int, float)) and not isinstance(cell, bool) else 0
+        total += product
+    return total
+
+
+def _round(value, digits=0):
+    value, digits = _number(value), int(_number(digits))
+    rounded = Decimal(repr(float(value))).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP)
+    return float(rounded)
+
+
+def _abs(value):
+    return abs(_number(value))
+
+
+def _subtotal(function, *values):
+    name = SUBTOTAL_FUNCTIONS.get(int(_number(function)) % 100)
+    if name is None:
+        raise CellError('#VALUE!')
+    return FUNCTIONS[name](*values)
+
+
+FUNCTIONS = {
+    'SUM': _sum, 'SUMPRODUCT': _sumproduct, 'SUBTOTAL': _subtotal, 'MIN': _min, 'MAX': _max,
+    'AVERAGE': _average, 'COUNT': _count, 'ROUND': _round, 'ABS': _abs
+}
+# Functions whose arguments are evaluated lazily
+CONDITIONALS = {'IF', 'IFERROR'}
+
+
+def _truth(value):
+    value = _check(value)
+    if isinstance(value, str):
+        raise CellError('#VALUE!')
+    return bool(_number(value))
+
+
+def _scalar(value):
+    """The value a cell gets from a formula result (a single-cell range gives its value)."""
+    if isinstance(value, Array):
+        if len(value) != 1:
+            raise CellError('#VALUE!')
+        value = value[0]
+    if value is None:
+        return 0
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            raise CellError('#NUM!')
+        # Excel writes whole numbers without a decimal point; read back they are ints
+        if value.is_integer() and abs(value) < 1e15:
+            return int(value)
+    return value
+
+
+class Table:
+    """An Excel table (ListObject): its sheet, bounds and column names."""
+
+    def __init__(self, sheet, ref, columns, header_rows, totals_rows):
+        self.sheet = sheet
+        self.min_col, self.min_row, self.max_col, self.max_row = range_boundaries(ref)
+        self.columns = [column.upper() for column in columns]
+        self.header_rows = header_rows
+        self.totals_rows = totals_rows
+
+    def column_range(self, specifiers):
+        """(first row, last row, column) of Table[Column] / Table[[#Data],[Column]], or None."""
+        areas = {specifier.upper() for specifier in specifiers if specifier.startswith('#')}
+        columns = [specifier.upper() for specifier in specifiers if not specifier.startswith('#')]
+        if len(columns) != 1 or columns[0] not in self.columns or not areas <= {'#DATA', '#ALL'}:
+            return None
+        first, last = self.min_row, self.max_row
+        if '#ALL' not in areas:
+            first += self.header_rows
+            last -= self.totals_rows
+        return first, last, self.min_col + self.columns.index(columns[0])
+
+
+def read_tables(zf, parts):
+    """{TABLE NAME: Table} for every table part of the workbook's sheets."""
+    tables = {}
+    for sheet, member in parts.items():
+        rels_path = posixpath.join(posixpath.dirname(member), '_rels', posixpath.basename(member) + '.rels')
+        if rels_path not in zf.namelist():
+            continue
+        for rel in ET.fromstring(zf.read(rels_path)).iter(f'{{{PKG_REL_NS}}}Relationship'):
+            if rel.get('Type') != TABLE_REL_TYPE:
+                continue
+            target = rel.get('Target')
+            path = target[1:] if target.startswith('/') else \
+                posixpath.normpath(posixpath.join(posixpath.dirname(member), target))
+            table = ET.fromstring(zf.read(path))
+            columns = [column.get('name', '') for column in table.iter(f'{{{MAIN_NS}}}tableColumn')]
+            name = table.get('displayName') or table.get('name')
+            tables[name.upper()] = Table(sheet, table.get('ref'), columns,
+                                         int(table.get('headerRowCount', 1)),
+                                         int(table.get('totalsRowCount', 0)))
+    return tables
+
+
+class Formula:
+    """A compiled formula: its text, the closure computing it and the cells it reads."""
+
+    __slots__ = ['text', 'evaluate', 'precedents']
+
+    def __init__(self, text, evaluate, precedents):
+        self.text = text
+        self.evaluate = evaluate
+        self.precedents = precedents
+
+
+class FormulaParser:
+    """Parses a formula into a syntax tree of nested tuples.
+
+    Relative references are stored as offsets from the formula's cell, so
+    formulas that only differ by position (D5*E5, D6*E6, ...) share a tree.
+    """
+
+    def __init__(self, text, row, column):
+        self.tokens = self._tokenize(text)
+        self.position = 0
+        self.row = row
+        self.column = column
+
+    def parse(self):
+        tree = self._expression(0)
+        if self.position != len(self.tokens):
+            raise FormulaSyntaxError(f'unexpected "{self.tokens[self.position][1]}"')
+        return tree
+
+    @staticmethod
+    def _tokenize(text):
+        tokens = []
+        position = 0
+        text = text.rstrip()
+        while position < len(text):
+            match = TOKEN.match(text, position)
+            if match is None or match.end() == position:
+                raise FormulaSyntaxError(f'cannot parse "{text[position:position + 20]}"')
+            tokens.append((match.lastgroup, match.group(match.lastgroup)))
+            position = match.end()
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def _take(self, value=None):
+        token = self._peek()
+        if token[0] is None or (value is not None and token[1] != value):
+            raise FormulaSyntaxError(f'expected "{value}"' if value else 'unexpected end of formula')
+        self.position += 1
+        return token
+
+    def _expression(self, min_precedence):
+        left = self._unary()
+        while True:
+            kind, op = self._peek()
+            if kind != 'op' or op not in PRECEDENCE or PRECEDENCE[op] < min_precedence:
+                return left
+            self.position += 1
+            # Every operator is left-associative in Excel, ^ included: 2^3^2 = 64
+            left = ('binary', op, left, self._expression(PRECEDENCE[op] + 1))
+
+    def _unary(self):
+        kind, op = self._peek()
+        if kind == 'op' and op in ('-', '+'):
+            self.position += 1
+            operand = self._unary()
+            return ('negate', operand) if op == '-' else operand
+        operand = self._primary()
+        while self._peek() == ('op', '%'):
+            self.position += 1
+            operand = ('percent', operand)
+        return operand
+
+    def _primary(self):
+        kind, value = self._take()
+        if kind == 'number':
+            return ('constant', float(value) if any(c in value for c in '.eE') else int(value))
+        if kind == 'string':
+            return ('constant', value[1:-1].replace('""', '"'))
+        if kind == 'bool':
+            return ('constant', value.upper() == 'TRUE')
+        if kind == 'error':
+            return ('constant', value.upper())
+        if kind == 'ref':
+            return self._reference(value)
+        if kind == 'table':
+            name, _, rest = value.partition('[')
+            specifiers = re.findall(r'\[([^\]]*)\]', rest[:-1]) or [rest[:-1]]
+            return ('table', name.upper(), tuple(s.strip() for s in specifiers))
+        if kind == 'function':
+            return self._call(value.upper())
+        if (kind, value) == ('op', '('):
+            inner = self._expression(0)
+            self._take(')')
+            return inner
+        raise FormulaSyntaxError(f'unexpected "{value}"')
+
+    def _call(self, name):
+        if name not in FUNCTIONS and name not in CONDITIONALS:
+            raise FormulaSyntaxError(f'unsupported function {name}')
+        self._take('(')
+        args = []
+        if self._peek() != ('op', ')'):
+            while True:
+                args.append(self._expression(0))
+                if self._peek() != ('op', ','):
+                    break
+                self.position += 1
+        self._take(')')
+        if name == 'IF' and not 2 <= len(args) <= 3:
+            raise FormulaSyntaxError('IF takes 2 or 3 arguments')
+        if name == 'IFERROR' and len(args) != 2:
+            raise FormulaSyntaxError('IFERROR takes 2 arguments')
+        return ('call', name, tuple(args))
+
+    def _corner(self, text):
+        """(row, row absolute, column, column absolute) of A1/$A$1, relative parts as offsets."""
+        column_abs, letters, row_abs, digits = CELL_PARTS.match(text).groups()
+        row, column = int(digits), column_index_from_string(letters.upper())
+        return (row if row_abs else row - self.row, bool(row_abs),
+                column if column_abs else column - self.column, bool(column_abs))
+
+    def _reference(self, text):
+        prefix, _, cells = text.rpartition('!')
+        sheet = _sheet_name(prefix + '!') if prefix else None
+        corners = tuple(self._corner(cell) for cell in cells.split(':'))
+        return ('cell' if len(corners) == 1 else 'range', sheet) + corners
+
+
+def relative_form(text, row, column):
+    """The formula with every A1 reference written as an offset from (row, column), R1C1 style.
+
+    Formulas with the same relative form have the same parse tree.
+    """
+    def replace(match):
+        if match.group(2) is None:
+            return match.group(0)   # a string or quoted sheet name
+        column_abs, letters, row_abs, digits = match.groups()
+        c = f'C{letters.upper()}' if column_abs else f'C[{column_index_from_string(letters.upper()) - column}]'
+        r = f'R{digits}' if row_abs else f'R[{int(digits) - row}]'
+        return r + c
+    return RELATIVE_REF.sub(replace, text)
+
+
+class FormulaBinder:
+    """Turns a parse tree into closures over the workbook's values for one formula cell."""
+
+    def __init__(self, workbook, sheet, row, column):
+        self.workbook = workbook
+        self.sheet = sheet
+        self.row = row
+        self.column = column
+        self.precedents = set()
+
+    def bind(self, node):
+        kind = node[0]
+        if kind == 'constant':
+            value = node[1]
+            return lambda: value
+        if kind == 'binary':
+            op, left, right = node[1], self.bind(node[2]), self.bind(node[3])
+            return lambda: _elementwise(lambda a, b: _arithmetic(op, a, b), left(), right())
+        if kind == 'negate':
+            operand = self.bind(node[1])
+            return lambda: _elementwise(lambda a: -_number(a), operand())
+        if kind == 'percent':
+            operand = self.bind(node[1])
+            return lambda: _elementwise(lambda a: _number(a) / 100, operand())
+        if kind == 'call':
+            return self._call(node[1], [self.bind(arg) for arg in node[2]])
+        if kind == 'table':
+            table = self.workbook.tables.get(node[1])
+            bounds = table.column_range(node[2]) if table is not None else None
+            if bounds is None:
+                raise FormulaSyntaxError(f'unsupported table reference {node[1]}[{",".join(node[2])}]')
+            first, last, column = bounds
+            return self._range(table.sheet, first, last, column, column)
+
+        sheet = self.sheet if node[1] is None else self.workbook.sheet_names.get(node[1].upper())
+        if sheet is None:
+            return lambda: '#REF!'
+        corners = [(row if row_abs else row + self.row, column if column_abs else column + self.column)
+                   for row, row_abs, column, column_abs in node[2:]]
+        if kind == 'cell':
+            key = (sheet,) + corners[0]
+            self.precedents.add(key)
+            values = self.workbook.values
+            return lambda: values.get(key)
+        (row1, column1), (row2, column2) = corners
+        return self._range(sheet, min(row1, row2), max(row1, row2), min(column1, column2), max(column1, column2))
+
+    def _range(self, sheet, min_row, max_row, min_col, max_col):
+        keys = [(sheet, row, column) for row in range(min_row, max_row + 1)
+                for column in range(min_col, max_col + 1)]
+        self.precedents.update(keys)
+        values = self.workbook.values
+        return lambda: Array(values.get(key) for key in keys)
+
+    @staticmethod
+    def _call(name, args):
+        if name == 'IF':
+            condition, then = args[0], args[1]
+            otherwise = args[2] if len(args) == 3 else (lambda: False)
+            return lambda: then() if _truth(_scalar(condition())) else otherwise()
+        if name == 'IFERROR':
+            value, fallback = args
+
+            def if_error():
+                try:
+                    result = value()
+                    return _check(result) if not isinstance(result, Array) else result
+                except CellError:
+                    return fallback()
+            return if_error
+
+        function = FUNCTIONS[name]
+        return lambda: function(*(arg() for arg in args))
+
+
+def format_ref(key):
+    sheet, row, column = key
+    quoted = sheet if re.fullmatch(r'[A-Za-z_]\w*', sheet) else "'" + sheet.replace("'", "''") + "'"
+    return f'{quoted}!{get_column_letter(column)}{row}'
+
+
+class FormulaWorkbook:
+    """Values and formulas of every sheet, with the dependency graph between formula cells."""
+
+    def __init__(self, path):
+        self.values = {}         # (sheet, row, column) -> value
+        self.formulas = {}       # (sheet, row, column) -> Formula
+        self.cached = {}         # formula cell -> value cached in the file (None if missing)
+        self.unsupported = {}    # formula cell -> (formula text, reason)
+        self.cycles = []         # formula cells on a circular reference (keep their cached value)
+        self._dependents = {}    # cell -> formula cells reading it
+        self._rank = {}          # formula cell -> position in the evaluation order
+        self._load(path)
+        self._build_graph()
+
+    def _load(self, path):
+        texts = {}
+        with zipfile.ZipFile(path) as zf:
+            parts = sheet_parts(zf)
+            self.tables = read_tables(zf, parts)
+        workbook = xlsx_reader.load_workbook(path)
+        try:
+            self.sheet_names = {name.upper(): name for name in workbook.sheetnames}
+            for ws in workbook.worksheets:
+                elements = {}
+                for row, cells in ws.cells(elements):
+                    for column, value in cells:
+                        self.values[(ws.title, row, column)] = value
+                texts.update(self._formula_texts(ws.title, elements))
+        finally:
+            workbook.close()
+        self._texts = texts
+
+    @staticmethod
+    def _formula_texts(sheet, elements):
+        """{cell: formula text} for one sheet, expanding shared formulas to each cell."""
+        masters = {}
+        for (row, column), element in elements.items():
+            if element.get('t') == 'shared' and element.text and element.get('si') is not None:
+                masters[element.get('si')] = (element.text, f'{get_column_letter(column)}{row}')
+        texts = {}
+        for (row, column), element in elements.items():
+            text = element.text
+            if element.get('t') == 'shared' and not text:
+                master = masters.get(element.get('si'))
+                if master is None:
+                    continue
+                origin = master[1]
+                target = f'{get_column_letter(column)}{row}'
+                text = Translator('=' + master[0], origin=origin).translate_formula(target)[1:]
+            if text:
+                texts[(sheet, row, column)] = text
+        return texts
+
+    def _parse(self, text, row, column):
+        """Parse tree of a formula, shared by all formulas with the same relative form."""
+        form = relative_form(text, row, column)
+        tree = self._trees.get(form)
+        if tree is None:
+            try:
+                tree = FormulaParser(text, row, column).parse()
+            except (FormulaSyntaxError, ValueError) as e:
+                tree = FormulaSyntaxError(str(e))
+            self._trees[form] = tree
+        if isinstance(tree, FormulaSyntaxError):
+            raise tree
+        return tree
+
+    def _build_graph(self):
+        self._trees = {}
+        for key, text in self._texts.items():
+            self.cached[key] = self.values.get(key)
+            binder = FormulaBinder(self, *key)
+            try:
+                evaluate = binder.bind(self._parse(text, key[1], key[2]))
+            except (FormulaSyntaxError, ValueError) as e:
+                self.unsupported[key] = (text, str(e))
+                continue
+            self.formulas[key] = Formula(text, evaluate, binder.precedents)
+            for precedent in binder.precedents:
+                self._dependents.setdefault(precedent, []).append(key)
+        del self._texts, self._trees
+
+        # Topological order (Kahn): a formula comes after every formula it reads
+        waiting = {key: sum(1 for p in formula.precedents if p in self.formulas)
+                   for key, formula in self.formulas.items()}
+        ready = [key for key, count in waiting.items() if count == 0]
+        order = []
+        while ready:
+            key = ready.pop()
+            order.append(key)
+            for dependent in self._dependents.get(key, ()):
+                if dependent in waiting:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        ready.append(dependent)
+        self._rank = {key: rank for rank, key in enumerate(order)}
+        self.cycles = [key for key in self.formulas if key not in self._rank]
+
+    def _evaluate(self, key):
+        try:
+            return _scalar(self.formulas[key].evaluate())
+        except CellError as e:
+            return e.code
+        except RecursionError:
+            return '#NUM!'
+
+    def key(self, ref):
+        """(sheet, row, column) of "Sheet!A1" / "'Sheet name'!A1" (or a key tuple)."""
+        if isinstance(ref, tuple):
+            return ref
+        match = CELL_REF.match(ref.strip())
+        if match is None or not match.group(1):
+            raise ValueError(f'Invalid cell reference "{ref}" (expected Sheet!A1)')
+        sheet = self.sheet_names.get(_sheet_name(match.group(1)).upper())
+        if sheet is None:
+            raise ValueError(f'No sheet "{_sheet_name(match.group(1))}" in the workbook')
+        cell = match.group(2).replace('$', '')
+        letters = cell.rstrip('0123456789')
+        return sheet, int(cell[len(letters):]), column_index_from_string(letters.upper())
+
+    def get(self, ref):
+        return self.values.get(self.key(ref))
+
+    def recalculate(self):
+        """Evaluate every formula in dependency order; returns the number evaluated."""
+        order = sorted(self._rank, key=self._rank.get)
+        for key in order:
+            self.values[key] = self._evaluate(key)
+        return len(order)
+
+    def set_values(self, changes):
+        """Set input cells and recompute only the formulas downstream of them.
+
+        changes maps references (or keys) to new values. Returns {key: new
+        value} of every formula cell whose value changed.
+        """
+        dirty = set()
+        pending = []
+        for ref, value in changes.items():
+            key = self.key(ref)
+            if key in self.formulas:
+                # A value typed over a formula replaces it, as in Excel
+                self._remove_formula(key)
+            self.values[key] = value
+            pending.append(key)
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if dependent in self.formulas and dependent not in dirty and dependent in self._rank:
+                    dirty.add(dependent)
+                    pending.append(dependent)
+
+        changed = {}
+        for key in sorted(dirty, key=self._rank.get):
+            value = self._evaluate(key)
+            if value != self.values.get(key):
+                self.values[key] = value
+                changed[key] = value
+        return changed
+
+    def _remove_formula(self, key):
+        """Drop a formula cell from the graph; it becomes a plain input cell."""
+        formula = self.formulas.pop(key)
+        self._rank.pop(key, None)
+        if key in self.cycles:
+            self.cycles.remove(key)
+        for precedent in set(formula.precedents):
+            dependents = self._dependents.get(precedent)
+            if dependents is not None:
+                dependents[:] = [dependent for dependent in dependents if dependent != key]
+                if not dependents:
+                    del self._dependents[precedent]
+
+    def mismatches(self, tolerance=1e-6):
+        """Formula cells whose value differs from the value cached in the file: [(key, cached, value)]."""
+        result = []
+        for key, cached in self.cached.items():
+            if cached is None or key not in self.formulas:
+                continue
+            value = self.values.get(key)
+            if isinstance(cached, (int, float)) and isinstance(value, (int, float)) \
+                    and not isinstance(cached, bool) and not isinstance(value, bool):
+                if math.isclose(cached, value, rel_tol=tolerance, abs_tol=tolerance):
+                    continue
+            elif cached == value:
+                continue
+            result.append((key, cached, value))
+        return result
+
+    def sheet_results(self, sheet):
+        """{(row, column): value} of the evaluated formula cells of one sheet."""
+        return {(row, column): self.values.get((s, row, column))
+                for (s, row, column) in self.formulas if s == sheet}
+
+
+class RecalculatedWorksheet(xlsx_reader.XmlWorksheet):
+    """XmlWorksheet whose formula cells read the recalculated values."""
+
+    def _parse_rows(self, formulas=None):
+        results = self.parent.results.get(self.title)
+        for row_number, cells in super()._parse_rows(formulas):
+            if results:
+                cells = [(column, results.get((row_number, column), value)) for column, value in cells]
+            yield row_number, cells
+
+
+class RecalculatedWorkbook(xlsx_reader.XmlWorkbook):
+    """Read-only workbook (xlsx_reader API) with every supported formula recalculated."""
+
+    worksheet_class = RecalculatedWorksheet
+
+    def __init__(self, path):
+        self.engine = FormulaWorkbook(path)
+        self.engine.recalculate()
+        self.results = {}
+        for (sheet, row, column) in self.engine.formulas:
+            self.results.setdefault(sheet, {})[(row, column)] = self.engine.values[(sheet, row, column)]
+        super().__init__(path)
+
+
+def load_workbook(path):
+    """Open an .xlsx for streaming values, with formulas recalculated instead of their cached values."""
+    return RecalculatedWorkbook(path)
+
+
+def parse_assignment(text):
+    """("Sheet!A1", value) from "Sheet!A1=value"; numbers become int/float, anything else text."""
+    ref, sep, value = text.rpartition('=')
+    if not sep or not ref:
+        raise ValueError(f'Expected Sheet!A1=value, got "{text}"')
+    for cast in (int, float):
+        try:
+            return ref, cast(value)
+        except ValueError:
+            continue
+    return ref, value
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recalculate the formulas of an .xlsx workbook without Excel')
+    parser.add_argument('path', nargs='?', default='e2.xlsx', help='workbook (default e2.xlsx)')
+    parser.add_argument('--set', action='append', default=[], metavar='SHEET!A1=VALUE',
+                        help='change an input cell and show the formula cells that change (repeatable)')
+    parser.add_argument('--show', action='append', default=[], metavar='SHEET!A1', help='print a cell value')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    engine = FormulaWorkbook(args.path)
+    loaded = time.perf_counter()
+    count = engine.recalculate()
+    recalculated = time.perf_counter()
+    print(f"Loaded {args.path}: {len(engine.formulas)} formulas in {loaded - started:.2f}s, "
+          f"recalculated in {(recalculated - loaded) * 1000:.1f} ms")
+
+    missing = sum(1 for key, cached in engine.cached.items() if cached is None and key in engine.formulas)
+    mismatches = engine.mismatches()
+    print(f"  {len(engine.formulas) - missing} had a cached value ({len(mismatches)} differ), {missing} had none")
+    for key, cached, value in mismatches[:10]:
+        print(f"  DIFFERS {format_ref(key)}: cached {cached!r}, computed {value!r}")
+    if len(mismatches) > 10:
+        print(f"  ... {len(mismatches) - 10} more differences")
+    for key, (text, reason) in list(engine.unsupported.items())[:10]:
+        print(f"  Unsupported {format_ref(key)} ={text} ({reason}), cached value kept")
+    if engine.cycles:
+        print(f"  {len(engine.cycles)} formulas on circular references, cached values kept")
+
+    try:
+        changes = dict(parse_assignment(text) for text in args.set)
+        if changes:
+            started = time.perf_counter()
+            changed = engine.set_values(changes)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"\nSet {len(changes)} cells: {len(changed)} formula cells changed ({elapsed:.2f} ms)")
+            for key, value in list(changed.items())[:20]:
+                print(f"  {format_ref(key)} = {value!r}")
+        for ref in args.show:
+            print(f"{ref} = {engine.get(ref)!r}")
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    sys.exit(1 if mismatches else 0)
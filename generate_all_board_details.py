@@ -3,246 +3,203 @@
 Generate JSON files for all board details.
 This script extracts details for all boards and saves them as individual JSON files
 so they can be served as static files for online deployment.
+
+Reruns are incremental: build_manifest.json records the hash of every board
+sheet and TOTALLIST row, and only boards whose inputs changed are rebuilt.
+Use --force to rebuild everything.
 """
 
-import openpyxl
-import json
+import argparse
 import os
-import re
-from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from board_extraction import DEFAULT_READER, READERS, open_workbook, extract_board_details
+from build_manifest import load_manifest, save_manifest, write_json_atomic, hash_value
+from profiling import add_profile_arguments, profiled
+from totallist_index import load_totallist_index
+from xlsx_package import sheet_hashes
+
+OUTPUT_DIR = 'board_details'
+
+# Workbook and index opened once per worker process (see _init_worker)
+_worker_wb = None
+_worker_index = None
 
-def extract_board_details(board_name, wb):
-    """Extract detailed data from a specific board sheet."""
+def board_json_path(board_name, output_dir=OUTPUT_DIR):
+    """Return the JSON path for a board (sanitized filename)."""
+    safe_name = board_name.replace('/', '_').replace('\\', '_').replace(':', '_')
+    return os.path.join(output_dir, f'{safe_name}.json')
+
+def process_board(board_name, wb, index, output_dir=OUTPUT_DIR):
+    """Extract one board and save its JSON file. Returns an error message or None."""
+    details = extract_board_details(board_name, wb, index)
+    if 'error' in details:
+        return details['error']
+    
     try:
-        if board_name not in wb.sheetnames:
-            return {'error': f'Sheet "{board_name}" not found'}
-        
-        ws = wb[board_name]
-        
-        # Get board metadata from TOTALLIST sheet
-        board_metadata = {}
-        if 'TOTALLIST' in wb.sheetnames:
-            ws_totallist = wb['TOTALLIST']
-            for row_idx in range(2, ws_totallist.max_row + 1):
-                itemdrop = ws_totallist.cell(row_idx, 5).value
-                if itemdrop and str(itemdrop).strip() == board_name:
-                    kind = ws_totallist.cell(row_idx, 2).value
-                    mdb = ws_totallist.cell(row_idx, 3).value
-                    smdb = ws_totallist.cell(row_idx, 4).value
-                    load = ws_totallist.cell(row_idx, 6).value
-                    
-                    # Parse load value safely
-                    load_value = None
-                    if load is not None:
-                        try:
-                            if isinstance(load, str):
-                                num_match = re.search(r'[\d,]+\.?\d*', load.replace(',', ''))
-                                if num_match:
-                                    load_value = float(num_match.group())
-                            else:
-                                load_value = float(load)
-                        except (ValueError, TypeError):
-                            load_value = None
-                    
-                    board_metadata = {
-                        'kind': str(kind).strip() if kind else None,
-                        'mdb': str(mdb).strip() if mdb else None,
-                        'smdb': str(smdb).strip() if smdb else None,
-                        'load': load_value
-                    }
-                    break
-        
-        # Find header row
-        header_row = 1
-        for row_idx in range(1, min(10, ws.max_row + 1)):
-            row_values = []
-            for col_idx in range(1, min(ws.max_column + 1, 15)):
-                cell_value = ws.cell(row_idx, col_idx).value
-                row_values.append(str(cell_value).upper() if cell_value else '')
-            
-            has_header_keywords = any(keyword in ' '.join(row_values) for keyword in 
-                                     ['ITEM', 'QTY', 'PRICE', 'AMOUNT', 'BRAND', 'DESCRIPTION'])
-            
-            if has_header_keywords:
-                header_row = row_idx
-                break
-        
-        # Define preferred column order
-        preferred_order = ['BRAND', 'ITEM', 'DESCRIPTION', 'PRICE', 'QTY', 'QUANTITY', 'AMOUNT']
-        excluded_columns = ['back', 'BACK', 'list', 'LIST']
-        
-        # Extract headers
-        headers = {}
-        for col in range(1, ws.max_column + 1):
-            cell_value = ws.cell(header_row, col).value
-            if cell_value:
-                header_name = str(cell_value).strip()
-                if header_name and header_name.upper() not in [ex.upper() for ex in excluded_columns]:
-                    headers[col] = header_name
-        
-        if not headers:
-            for col in range(1, min(ws.max_column + 1, 20)):
-                headers[col] = f'Column{col}'
-        
-        # Get all headers and determine their order
-        all_headers_list = list(headers.values())
-        all_headers_dict_upper = {h.upper(): h for h in all_headers_list}
-        
-        # Create ordered header list
-        ordered_headers = []
-        used_headers = set()
-        
-        for pref_header in preferred_order:
-            pref_upper = pref_header.upper()
-            if pref_upper in all_headers_dict_upper and pref_upper not in used_headers:
-                original_header = all_headers_dict_upper[pref_upper]
-                ordered_headers.append(original_header)
-                used_headers.add(pref_upper)
-        
-        remaining = [h for h_upper, h in all_headers_dict_upper.items() if h_upper not in used_headers]
-        ordered_headers.extend(sorted(remaining, key=lambda x: x.upper()))
-        
-        # Extract data rows
-        items = []
-        for row_idx in range(header_row + 1, ws.max_row + 1):
-            row_data = OrderedDict()
-            has_data = False
-            
-            for header_name in ordered_headers:
-                col_idx = None
-                for col, h in headers.items():
-                    if h == header_name:
-                        col_idx = col
-                        break
-                
-                if col_idx:
-                    cell_value = ws.cell(row_idx, col_idx).value
-                    row_data[header_name] = cell_value
-                    if cell_value is not None and str(cell_value).strip() != '':
-                        has_data = True
-            
-            if has_data:
-                items.append(row_data)
-        
-        # Find summary data (NET TOTAL, NO OF UNITS)
-        summary = {}
-        for row_idx in range(max(1, ws.max_row - 50), ws.max_row + 1):
-            row = ws[row_idx]
-            if len(row) > 2 and row[2].value:
-                item_str = str(row[2].value).upper().strip()
-                if 'NET TOTAL' in item_str and 'net_total' not in summary:
-                    for check_col in [5, 4, 6, 3]:
-                        if len(row) > check_col:
-                            value = row[check_col].value
-                            if value is not None:
-                                try:
-                                    if isinstance(value, str):
-                                        num_match = re.search(r'[\d,]+\.?\d*', value.replace(',', ''))
-                                        if num_match:
-                                            value = float(num_match.group())
-                                        else:
-                                            continue
-                                    else:
-                                        value = float(value)
-                                    summary['net_total'] = value
-                                    break
-                                except (ValueError, TypeError):
-                                    continue
-                elif ('NO OF UNITS' in item_str or 'NO OF ITEMS' in item_str) and 'no_of_units' not in summary:
-                    for check_col in [5, 4, 6, 3]:
-                        if len(row) > check_col:
-                            value = row[check_col].value
-                            if value is not None:
-                                try:
-                                    if isinstance(value, str):
-                                        num_match = re.search(r'[\d,]+\.?\d*', value.replace(',', ''))
-                                        if num_match:
-                                            value = float(num_match.group())
-                                        else:
-                                            continue
-                                    else:
-                                        value = float(value)
-                                    summary['no_of_units'] = value
-                                    break
-                                except (ValueError, TypeError):
-                                    continue
-        
-        # Convert OrderedDict items to regular dicts
-        items_dicts = []
-        for item in items:
-            if isinstance(item, OrderedDict):
-                items_dicts.append(dict(item))
-            else:
-                items_dicts.append(item)
-        
-        return {
-            'name': board_name,
-            'metadata': board_metadata,
-            'summary': summary,
-            'items': items_dicts
-        }
-        
+        write_json_atomic(board_json_path(board_name, output_dir), details,
+                          indent=2, default=str, ensure_ascii=False)
     except Exception as e:
-        return {'error': str(e)}
+        return f"saving: {e}"
+    return None
 
-def main():
-    print("Loading Excel file...")
+def _init_worker(path, index, reader=None):
+    global _worker_wb, _worker_index
+    _worker_wb = open_workbook(path, reader)
+    _worker_index = index
+
+def _process_in_worker(board_name):
+    return process_board(board_name, _worker_wb, _worker_index)
+
+def board_inputs(board_name, hashes, index):
+    """Hashes of everything a board's JSON file is built from."""
+    return {
+        'sheet': hashes.get(board_name),
+        'totallist': hash_value(index.metadata(board_name))
+    }
+
+def built_with(previous, reader):
+    """The previous run's manifest entry if it used the same reader, else None (rebuild everything)."""
+    if previous and previous.get('reader') == (reader or DEFAULT_READER):
+        return previous
+    return None
+
+def is_up_to_date(previous, hashes, reader=None):
+    """Check if the previous run used this reader and the same sheets, had no failures and its files are all there."""
+    previous = built_with(previous, reader)
+    if not previous or previous.get('sheets') != hashes or previous.get('failed'):
+        return False
+    return all(os.path.exists(board_json_path(board_name)) for board_name in previous['boards'])
+
+def board_details_entry(hashes, reader, boards, built):
+    """Manifest entry of a run: the sheet hashes and reader it used and the inputs of every built board.
+
+    Boards that failed are left out of 'boards' and listed in 'failed', so the
+    next run retries them even if no sheet changed.
+    """
+    return {
+        'sheets': hashes,
+        'reader': reader or DEFAULT_READER,
+        'boards': {board_name: built[board_name] for board_name in boards if board_name in built},
+        'failed': [board_name for board_name in boards if board_name not in built]
+    }
+
+def changed_boards(boards, inputs, previous_boards):
+    """Boards whose sheet or TOTALLIST row changed since the previous run, or whose file is missing."""
+    return [
+        board_name for board_name in boards
+        if previous_boards.get(board_name) != inputs[board_name]
+        or not os.path.exists(board_json_path(board_name))
+    ]
+
+def remove_stale_boards(previous_boards, inputs):
+    """Remove files of boards that are no longer listed in TOTALLIST."""
+    for board_name in previous_boards:
+        if board_name not in inputs:
+            json_path = board_json_path(board_name)
+            if os.path.exists(json_path):
+                os.remove(json_path)
+                print(f"Removed {json_path} (board no longer in TOTALLIST)")
+
+def main(jobs=1, force=False, reader=None):
+    manifest = load_manifest()
+    previous = None if force else built_with(manifest.get('board_details'), reader)
+    
+    print("Checking e2.xlsx for changed sheets...")
     try:
-        wb = openpyxl.load_workbook('e2.xlsx', data_only=True)
+        hashes = sheet_hashes('e2.xlsx')
     except FileNotFoundError:
         print("Error: e2.xlsx not found in current directory")
         return
+    except Exception as e:
+        print(f"Error reading Excel file: {e}")
+        return
+    
+    if is_up_to_date(previous, hashes, reader):
+        print(f"All {len(previous['boards'])} boards are up to date, nothing to regenerate")
+        return
+    
+    print("Loading Excel file...")
+    try:
+        wb = open_workbook('e2.xlsx', reader)
     except Exception as e:
         print(f"Error loading Excel file: {e}")
         return
     
     # Load all boards from TOTALLIST
     print("Loading board list from TOTALLIST sheet...")
-    boards = []
-    if 'TOTALLIST' in wb.sheetnames:
-        ws_totallist = wb['TOTALLIST']
-        for row_idx in range(2, ws_totallist.max_row + 1):
-            board_name = ws_totallist.cell(row_idx, 5).value  # Column E (Itemdrop)
-            if board_name and str(board_name).strip():
-                boards.append(str(board_name).strip())
-    else:
+    index = load_totallist_index(wb)
+    if index is None:
         print("Error: TOTALLIST sheet not found")
+        wb.close()
         return
+    boards = list(dict.fromkeys(index.names()))
     
     print(f"Found {len(boards)} boards")
     
+    # Only boards whose sheet or TOTALLIST row changed need rebuilding
+    previous_boards = previous['boards'] if previous else {}
+    inputs = {board_name: board_inputs(board_name, hashes, index) for board_name in boards}
+    changed = changed_boards(boards, inputs, previous_boards)
+    if len(changed) < len(boards):
+        print(f"{len(boards) - len(changed)} boards unchanged, regenerating {len(changed)}")
+    
     # Create board_details directory
-    os.makedirs('board_details', exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    # Extract details for each board
+    # Extract details for each changed board
     success_count = 0
     error_count = 0
+    built = {board_name: inputs[board_name] for board_name in boards if board_name not in changed}
     
-    for i, board_name in enumerate(boards, 1):
-        print(f"[{i}/{len(boards)}] Processing {board_name}...", end=' ', flush=True)
-        
-        details = extract_board_details(board_name, wb)
-        
-        if 'error' in details:
-            print(f"ERROR: {details['error']}")
-            error_count += 1
-        else:
-            # Save as JSON file (sanitize filename)
-            safe_name = board_name.replace('/', '_').replace('\\', '_').replace(':', '_')
-            json_path = os.path.join('board_details', f'{safe_name}.json')
-            
-            try:
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(details, f, indent=2, default=str, ensure_ascii=False)
+    if jobs > 1 and len(changed) > 1:
+        # Each worker opens its own read-only workbook; results come back in board order
+        wb.close()
+        print(f"Using {jobs} worker processes")
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                       initargs=('e2.xlsx', index, reader))
+        chunksize = max(1, len(changed) // (jobs * 4))
+        results = executor.map(_process_in_worker, changed, chunksize=chunksize)
+    else:
+        executor = None
+        results = (process_board(board_name, wb, index) for board_name in changed)
+    
+    try:
+        for i, (board_name, error) in enumerate(zip(changed, results), 1):
+            print(f"[{i}/{len(changed)}] Processing {board_name}...", end=' ', flush=True)
+            if error:
+                print(f"ERROR: {error}")
+                error_count += 1
+            else:
                 print("OK")
                 success_count += 1
-            except Exception as e:
-                print(f"ERROR saving: {e}")
-                error_count += 1
+                built[board_name] = inputs[board_name]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        else:
+            wb.close()
+    
+    remove_stale_boards(previous_boards, inputs)
+    
+    manifest['board_details'] = board_details_entry(hashes, reader, boards, built)
+    save_manifest(manifest)
     
     print(f"\nCompleted: {success_count} successful, {error_count} errors")
-    print(f"JSON files saved in: board_details/")
+    print(f"JSON files saved in: {OUTPUT_DIR}/")
 
 if __name__ == '__main__':
-    main()
-
+    parser = argparse.ArgumentParser(description='Generate board_details/*.json from e2.xlsx')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='number of worker processes (0 = one per CPU core)')
+    parser.add_argument('--force', action='store_true',
+                        help='regenerate every board, ignoring build_manifest.json')
+    parser.add_argument('--reader', choices=READERS,
+                        help='workbook reader: openpyxl (default), xml (the faster direct XML reader) '
+                             'or formulas (xml with every formula recalculated)')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.profile is not None and jobs > 1:
+        print("Note: --profile only covers the main process; use --jobs 1 to profile the extraction itself")
+    with profiled(args, 'generate_all_board_details'):
+        main(jobs=jobs, force=args.force, reader=args.reader)
@@ -1,8 +1,44 @@
+import argparse
 import json
+import os
+from build_manifest import load_manifest, save_manifest, hash_files
 
-def generate_embedded_data():
+INPUT_FILES = ['mdb_data.json', 'all_boards_data.json']
+
+def embedded_data_js(mdb_data, all_boards_data):
+    """Return the embed_data.js source for the extracted MDB and all-boards data."""
+    # Use compact JSON format to reduce file size
+    return f"""// Embedded dashboard data - Generated automatically
+// This file contains the data embedded to avoid CORS issues when opening HTML directly
+// Generated from e2.xlsx TOTALLIST sheet
+// To regenerate: python3 generate_embedded_data.py
+
+window.dashboardData = {{
+    mdbBoards: {json.dumps(mdb_data.get('mdb_boards', []), separators=(',', ':'))},
+    totalEstimate: {mdb_data.get('total_estimate', 0)},
+    totalLoad: {mdb_data.get('total_load', 0)},
+    totalItems: {mdb_data.get('total_items', 0)},
+    mdbCount: {mdb_data.get('count', 0)},
+    allBoards: {json.dumps(all_boards_data.get('all_boards', []), separators=(',', ':'))},
+    allBoardsTotal: {all_boards_data.get('total_estimate', 0)},
+    allBoardsTotalLoad: {all_boards_data.get('total_load', 0)},
+    allBoardsTotalItems: {all_boards_data.get('total_items', 0)},
+    allBoardsCount: {all_boards_data.get('count', 0)}
+}};
+"""
+
+def generate_embedded_data(force=False):
     """Generate embedded JavaScript files from JSON data to avoid CORS issues."""
     
+    # Skip the rewrite if neither input file changed since embed_data.js was generated
+    manifest = load_manifest()
+    inputs_hash = hash_files(INPUT_FILES)
+    previous = manifest.get('embedded_data', {})
+    if (not force and inputs_hash is not None
+            and previous.get('inputs') == inputs_hash and os.path.exists('embed_data.js')):
+        print("mdb_data.json and all_boards_data.json unchanged, embed_data.js is up to date")
+        return
+    
     # Read MDB data
     try:
         with open('mdb_data.json', 'r') as f:
@@ -23,31 +59,15 @@ def generate_embedded_data():
             'count': mdb_data.get('count', 0)
         }
     
-    # Generate embedded data file
-    # Use compact JSON format to reduce file size
-    embedded_content = f"""// Embedded dashboard data - Generated automatically
-// This file contains the data embedded to avoid CORS issues when opening HTML directly
-// Generated from e2.xlsx TOTALLIST sheet
-// To regenerate: python3 generate_embedded_data.py
-
-window.dashboardData = {{
-    mdbBoards: {json.dumps(mdb_data.get('mdb_boards', []), separators=(',', ':'))},
-    totalEstimate: {mdb_data.get('total_estimate', 0)},
-    totalLoad: {mdb_data.get('total_load', 0)},
-    totalItems: {mdb_data.get('total_items', 0)},
-    mdbCount: {mdb_data.get('count', 0)},
-    allBoards: {json.dumps(all_boards_data.get('all_boards', []), separators=(',', ':'))},
-    allBoardsTotal: {all_boards_data.get('total_estimate', 0)},
-    allBoardsTotalLoad: {all_boards_data.get('total_load', 0)},
-    allBoardsTotalItems: {all_boards_data.get('total_items', 0)},
-    allBoardsCount: {all_boards_data.get('count', 0)}
-}};
-"""
+    embedded_content = embedded_data_js(mdb_data, all_boards_data)
     
     # Write to file
     with open('embed_data.js', 'w') as f:
         f.write(embedded_content)
     
+    manifest['embedded_data'] = {'inputs': inputs_hash}
+    save_manifest(manifest)
+    
     print("✓ Generated embed_data.js successfully")
     print(f"  - Main MDBs: {mdb_data.get('count', 0)}")
     print(f"  - Total MDB Estimate: {mdb_data.get('total_estimate', 0):,.2f}")
@@ -55,5 +75,9 @@ window.dashboardData = {{
     print(f"  - Total All Boards Estimate: {all_boards_data.get('total_estimate', 0):,.2f}")
 
 if __name__ == '__main__':
-    generate_embedded_data()
+    parser = argparse.ArgumentParser(description='Generate embed_data.js from the extracted JSON files')
+    parser.add_argument('--force', action='store_true',
+                        help='regenerate even if the JSON inputs are unchanged')
+    args = parser.parse_args()
+    generate_embedded_data(force=args.force)
 
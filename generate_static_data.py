@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Generate compact, precompressed board data for static hosting.
+
+board_details/*.json (generate_all_board_details.py) is pretty-printed and
+keeps every catalogue row of a board sheet, although the dashboard only
+shows rows with an AMOUNT. This script writes the same details to
+static_data/ in a form that is much cheaper to download:
+
+- compact JSON with the rows the dashboard hides (AMOUNT empty or 0) left
+  out
+- one file per board, or with --shard-size N up to N boards of the same
+  main MDB per shard file (one line per board)
+- file names carry a hash of their contents, so browsers and CDNs can cache
+  them forever and an update only changes the files whose boards changed
+- a .gz (and, with the brotli package, a .br) copy of every file for hosts
+  that serve precompressed files (nginx gzip_static/brotli_static, ...)
+- index.json mapping every board to its file and the byte offset/length of
+  its JSON inside that file, plus the hash of its contents
+
+dashboard.js reads static_data/index.json when the API is not available and
+fetches each shard at most once. Files no longer referenced by the index are
+removed.
+
+Usage:
+    python3 generate_static_data.py                   # one file per board
+    python3 generate_static_data.py --shard-size 40   # up to 40 boards per shard
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from board_extraction import READERS, amount_column, has_amount, load_workbook_data
+from profiling import add_profile_arguments, profiled
+
+OUTPUT_DIR = 'static_data'
+INDEX_FILE = 'index.json'
+ALL_BOARDS_SOURCE = 'all_boards_data.json'
+# Subdirectories (and file prefixes) owned by this script; stale files there are removed
+BOARDS_DIR = 'boards'
+SHARDS_DIR = 'shards'
+HASH_LENGTH = 12
+COMPRESSED_SUFFIXES = ['.gz', '.br']
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()[:HASH_LENGTH]
+
+
+def drop_hidden_rows(details):
+    """Board details without the item rows the dashboard never shows."""
+    column = amount_column(details['items'])
+    if column is None:
+        return details
+    return dict(details, items=[item for item in details['items'] if has_amount(item, column)])
+
+
+def safe_file_name(name):
+    """A board or MDB name usable in a URL path segment."""
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', str(name)).strip('_') or 'board'
+
+
+def shard_groups(names, index, shard_size):
+    """[(file stem, [board names])]: one per board, or shards of up to shard_size per main MDB."""
+    if shard_size <= 1:
+        return [(f'{BOARDS_DIR}/{safe_file_name(name)}', [name]) for name in names]
+
+    by_mdb = {}
+    for name in names:
+        mdb = index.metadata(name).get('mdb') or 'OTHER'
+        by_mdb.setdefault(str(mdb), []).append(name)
+    groups = []
+    for mdb, members in by_mdb.items():
+        for start in range(0, len(members), shard_size):
+            number = start // shard_size + 1
+            groups.append((f'{SHARDS_DIR}/{safe_file_name(mdb)}-{number}', members[start:start + shard_size]))
+    return groups
+
+
+def write_variants(path, data):
+    """Write a file and its .gz/.br variants, each atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    variants = {'': data, '.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data)
+    # The plain file goes last, so its presence means the variants are complete
+    for suffix in sorted(variants, key=lambda s: s == ''):
+        tmp_path = f'{path}{suffix}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(variants[suffix])
+        os.replace(tmp_path, path + suffix)
+    if brotli is None and os.path.exists(path + '.br'):
+        # Left from a run with brotli installed; it would be served instead of the new file
+        os.remove(path + '.br')
+
+
+def write_file(output_dir, relative_path, data):
+    """Write a content-addressed file and its variants unless it is already there."""
+    path = os.path.join(output_dir, relative_path)
+    if os.path.exists(path):
+        return False
+    write_variants(path, data)
+    return True
+
+
+def remove_stale_files(output_dir, referenced):
+    """Remove files this script wrote earlier that the new index no longer references."""
+    removed = 0
+    for subdir in (BOARDS_DIR, SHARDS_DIR, ''):
+        directory = os.path.join(output_dir, subdir)
+        if not os.path.isdir(directory):
+            continue
+        for file_name in os.listdir(directory):
+            relative = f'{subdir}/{file_name}' if subdir else file_name
+            base = relative
+            for suffix in COMPRESSED_SUFFIXES:
+                if base.endswith(suffix):
+                    base = base[:-len(suffix)]
+            if not subdir and not base.startswith('all_boards_data.'):
+                continue
+            if base not in referenced and os.path.isfile(os.path.join(output_dir, relative)):
+                os.remove(os.path.join(output_dir, relative))
+                removed += 1
+        if subdir and not os.listdir(directory):
+            os.rmdir(directory)
+    return removed
+
+
+def generate_static_data(output_dir=OUTPUT_DIR, shard_size=0, reader=None, path='e2.xlsx'):
+    print(f"Reading {path}...")
+    try:
+        data = load_workbook_data(path, reader)
+    except FileNotFoundError:
+        print(f"Error: {path} not found in current directory")
+        return None
+    if data.index is None:
+        print("Error: TOTALLIST sheet not found")
+        return None
+
+    names = [name for name in dict.fromkeys(data.index.names()) if data.has_sheet(name)]
+    missing = len(set(data.index.names())) - len(names)
+    print(f"Found {len(names)} boards" + (f" ({missing} listed in TOTALLIST without a sheet)" if missing else ""))
+
+    boards = {}
+    files = {}
+    written = 0
+    raw_size = 0
+    for stem, members in shard_groups(names, data.index, shard_size):
+        chunks = []
+        entries = {}
+        offset = 0
+        for name in members:
+            details = data.board_details(name)
+            raw_size += len(compact_json(details))
+            body = compact_json(drop_hidden_rows(details))
+            entries[name] = {'offset': offset, 'length': len(body), 'hash': content_hash(body)}
+            chunks.append(body)
+            offset += len(body) + 1
+        content = b'\n'.join(chunks) + b'\n'
+        file_name = f'{stem}.{content_hash(content)}.json'
+        written += write_file(output_dir, file_name, content)
+        files[file_name] = len(content)
+        for name, entry in entries.items():
+            boards[name] = dict(entry, file=file_name)
+
+    index = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'source': path,
+        'boards': boards,
+        'files': files
+    }
+
+    # The dashboard's board list, compacted (all_boards_data.json comes from extract_all_boards.py)
+    if os.path.exists(ALL_BOARDS_SOURCE):
+        with open(ALL_BOARDS_SOURCE, encoding='utf-8') as f:
+            content = compact_json(json.load(f))
+        file_name = f'all_boards_data.{content_hash(content)}.json'
+        written += write_file(output_dir, file_name, content)
+        files[file_name] = len(content)
+        index['allBoards'] = file_name
+    else:
+        print(f"Note: {ALL_BOARDS_SOURCE} not found, run extract_all_boards.py to include the board list")
+
+    # The index keeps its name; it is the one file clients revalidate
+    index_bytes = compact_json(index)
+    write_variants(os.path.join(output_dir, INDEX_FILE), index_bytes)
+
+    removed = remove_stale_files(output_dir, set(files))
+
+    total = sum(files.values())
+    print(f"\n{len(boards)} boards in {len(files)} files, {written} written, {removed} stale files removed")
+    print(f"Board data: {raw_size / 1e6:.2f} MB -> {total / 1e6:.2f} MB compact "
+          f"(index {len(index_bytes) / 1e3:.1f} KB)")
+    print(f"Output saved in: {output_dir}/")
+    return index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate compact, precompressed board data for static hosting')
+    parser.add_argument('--output', default=OUTPUT_DIR, help=f'output directory (default {OUTPUT_DIR})')
+    parser.add_argument('--shard-size', type=int, default=0,
+                        help='pack up to N boards of the same main MDB per file (default: one file per board)')
+    parser.add_argument('--reader', choices=READERS,
+                        help='workbook reader: openpyxl (default), xml (the faster direct XML reader) '
+                             'or formulas (xml with every formula recalculated)')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profiled(args, 'generate_static_data'):
+        generate_static_data(args.output, args.shard_size, args.reader)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic project workbook with the same layout as e2.xlsx.
+
+For load and scale testing the server and the generators on projects far
+bigger than Silwa Tower. The workbook has:
+
+- TOTALLIST: NumTag, KIND, MDB, SMDB, Itemdrop, Load, NO OF ITEMS, Estimate
+  for every board. Main MDBs come first, then bus bar raisers and SMDBs
+  under the MDBs and DBs under the SMDBs.
+- TEMPLATE: the item catalogue, like the template sheets in e2.xlsx.
+- One sheet per board: the back/BRAND/ITEM/PRICE/QTY/AMOUNT header, one
+  row per catalogue item (only some with a QTY, the rest priced filler
+  like in the real sheets), zero rows, and the TOTAL ... NET TOTAL footer
+  with the NO OF UNITS value.
+
+Cells hold values, not formulas, as in a workbook saved by Excel and read
+with data_only=True. With --formulas, AMOUNT, the footer rows and the
+TOTALLIST Estimate/NO OF ITEMS columns are formulas instead, with no cached
+values, like a workbook saved by openpyxl (see formula_engine.py). The same
+arguments and seed always give the same cell contents.
+
+Usage:
+    python3 generate_synthetic_workbook.py --boards 1000 --output big.xlsx
+    python3 generate_synthetic_workbook.py --boards 200 --rows 1000 --seed 7
+    python3 generate_synthetic_workbook.py --boards 100 --formulas --output formulas.xlsx
+"""
+
+import argparse
+import random
+
+BOARD_HEADER = ['back', 'BRAND', 'ITEM', 'PRICE', 'QTY', 'AMOUNT']
+TOTALLIST_HEADER = ['NumTag', 'KIND', 'MDB', 'SMDB', 'Itemdrop', 'Load', 'NO OF ITEMS', 'Estimate']
+
+BRANDS = ['EATON1', 'EATON2', 'ABB', 'SCHNEIDER', 'LEGRAND', 0]
+ITEM_TYPES = [
+    # (item text, ratings, base price)
+    ('ACB {}A 4P 65kA LSIG', [800, 1250, 1600, 2000, 2500, 3200], 9000),
+    ('MCCB {}A TP 36kA', [63, 100, 125, 160, 250, 400, 630], 300),
+    ('MCCB - NON AUTO {}A', [63, 125, 200, 400], 250),
+    ('MCB {}A SP C', [6, 10, 16, 20, 32, 40, 63], 12),
+    ('RCCB {}A 4P 30mA', [25, 40, 63, 100], 95),
+    ('ISOLATOR {}A TP', [32, 63, 100, 125], 40),
+    ('CONTACTOR {}A 3P', [9, 18, 32, 65, 115], 60),
+    ('{}A ATS', [100, 250, 400, 800], 3000),
+    ('CT {}/5A', [100, 200, 400, 800, 1600], 35),
+]
+ENCLOSURES = ['4R 16M ', '5R 16M ', '4R 24M ', '5R 24M ', '6R 24M ']
+KINDS = ['BUS BAR RAISER', 'SMDB']
+
+# Footer rates, as in e2.xlsx
+LABOUR_RATE = 0.07
+OVERHEAD_RATE = 0.5
+TAX_RATE = 0.05
+PROVISIONAL_RATE = 0.1
+# Zero rows between the catalogue and the footer
+FILLER_ROWS = 3
+
+
+def make_catalogue(rows, rng):
+    """(brand, item, price) of the item rows every board sheet lists."""
+    catalogue = []
+    while len(catalogue) < rows:
+        if rng.random() < 0.1:
+            item, price = rng.choice(ENCLOSURES), rng.randint(150, 550)
+            catalogue.append((0, item, price))
+            continue
+        template, ratings, base = rng.choice(ITEM_TYPES)
+        rating = rng.choice(ratings)
+        price = round(base * (1 + rating / 500) * rng.uniform(0.8, 1.2), 3)
+        catalogue.append((rng.choice(BRANDS), template.format(rating), price))
+    return catalogue
+
+
+def make_boards(boards, mdbs, rng):
+    """(kind, mdb, smdb, name) for every board, in TOTALLIST order."""
+    result = [('MDB', f'MDB{i}', None, f'MDB{i}') for i in range(1, min(mdbs, boards) + 1)]
+    smdbs = []
+    while len(result) < boards:
+        n = len(result) + 1
+        if not smdbs or rng.random() < 0.12:
+            kind = rng.choice(KINDS)
+            mdb = f'MDB{rng.randint(1, mdbs)}'
+            prefix = 'BB' if kind == 'BUS BAR RAISER' else 'SMDB.SYN'
+            name = f'{prefix}.{n:05d}'
+            result.append((kind, mdb, None, name))
+            if kind == 'SMDB':
+                smdbs.append((name, mdb))
+        else:
+            smdb, mdb = rng.choice(smdbs)
+            result.append(('DB', mdb, smdb, f'DB.SYN.{n:05d}'))
+    return result
+
+
+def footer_formulas(first_row, last_row):
+    """Column F formulas of the footer rows, for item rows first_row..last_row."""
+    total = last_row + 1
+    return [
+        f'=SUM(F{first_row}:F{last_row})', f'=ROUND(F{total}*{LABOUR_RATE},2)', f'=F{total}+F{total + 1}',
+        None, f'=F{total + 2}*F{total + 3}',
+        f'=F{total + 4}*{OVERHEAD_RATE}', f'=F{total + 4}+F{total + 5}',
+        f'=F{total + 6}*{TAX_RATE}', f'=F{total + 6}+F{total + 7}',
+        f'=F{total + 8}*{PROVISIONAL_RATE}', f'=F{total + 8}+F{total + 9}'
+    ]
+
+
+def board_rows(catalogue, fill, units, rng, formulas=False):
+    """Rows of one board sheet and its NET TOTAL (and the NET TOTAL/NO OF UNITS rows)."""
+    rows = [BOARD_HEADER]
+    total = 0
+    for brand, item, price in catalogue:
+        qty = rng.choice([1, 2, 3, 4, 6, 8, 12]) if rng.random() < fill else None
+        amount = price * qty if qty else 0
+        total += amount
+        row = len(rows) + 1
+        rows.append([None, brand, item, price, qty, f'=D{row}*E{row}' if formulas else amount])
+    rows.extend([None, None, 0, 0, None, 0] for _ in range(FILLER_ROWS))
+
+    labour = round(total * LABOUR_RATE, 2)
+    after_labour = total + labour
+    after_units = after_labour * units
+    overhead = after_units * OVERHEAD_RATE
+    after_overhead = after_units + overhead
+    tax = after_overhead * TAX_RATE
+    after_tax = after_overhead + tax
+    provisional = after_tax * PROVISIONAL_RATE
+    net_total = after_tax + provisional
+    footer = [
+        ('TOTAL', total), ('LABOUR', labour), ('SUM AFTER LABOUR', after_labour),
+        ('NO OF UNITS', units), ('SUM AFTER NUMBER OF UNITS', after_units),
+        ('OVER HEAD', overhead), ('SUM AFTER OVERHEAD', after_overhead),
+        ('TAX 5%', tax), ('SUM AFTER TAX', after_tax),
+        ('PROVISIONAL SUM 10%', provisional), ('NET TOTAL', net_total)
+    ]
+    first_footer = len(rows) + 1
+    if formulas:
+        cells = footer_formulas(2, len(catalogue) + 1 + FILLER_ROWS)
+        footer = [(label, cell if cell is not None else value) for (label, value), cell in zip(footer, cells)]
+    rows.extend([None, 0, label, 0, None, value] for label, value in footer)
+    return rows, net_total, (first_footer + len(footer) - 1, first_footer + 3)
+
+
+def quoted(sheet):
+    return "'" + sheet.replace("'", "''") + "'"
+
+
+def generate_workbook(path, boards=1000, rows=160, mdbs=4, fill=0.05, seed=0, formulas=False):
+    """Write a synthetic workbook to path; returns the number of boards written."""
+    import openpyxl
+
+    rng = random.Random(seed)
+    catalogue = make_catalogue(rows, rng)
+
+    wb = openpyxl.Workbook(write_only=True)
+    totallist = wb.create_sheet('TOTALLIST')
+    totallist.append(TOTALLIST_HEADER)
+    template = wb.create_sheet('TEMPLATE')
+    template.append(BOARD_HEADER)
+    for brand, item, price in catalogue:
+        template.append([None, brand, item, price, None, 0])
+
+    board_list = make_boards(boards, mdbs, rng)
+    for numtag, (kind, mdb, smdb, name) in enumerate(board_list, 1):
+        units = rng.choice([1, 1, 1, 1, 2, 3])
+        sheet_rows, net_total, (net_row, units_row) = board_rows(catalogue, fill, units, rng, formulas)
+        ws = wb.create_sheet(name)
+        for row in sheet_rows:
+            ws.append(row)
+        load = f'{rng.uniform(1, 2000 if kind == "MDB" else 300):.2f} kW'
+        if formulas:
+            units, net_total = f'={quoted(name)}!F{units_row}', f'={quoted(name)}!F{net_row}'
+        totallist.append([numtag, kind, mdb, smdb, name, load, units, net_total])
+
+    wb.save(path)
+    return len(board_list)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic workbook with the e2.xlsx layout')
+    parser.add_argument('--boards', type=int, default=1000, help='number of boards (default 1000)')
+    parser.add_argument('--rows', type=int, default=160,
+                        help='item rows per board sheet (default 160, like e2.xlsx)')
+    parser.add_argument('--mdbs', type=int, default=4, help='number of main MDBs (default 4)')
+    parser.add_argument('--fill', type=float, default=0.05,
+                        help='fraction of item rows with a quantity (default 0.05)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--formulas', action='store_true',
+                        help='write AMOUNT, footer and TOTALLIST totals as formulas without cached values')
+    parser.add_argument('--output', '-o', default='synthetic.xlsx', help='output file (default synthetic.xlsx)')
+    args = parser.parse_args()
+    if args.boards < 1 or args.rows < 1 or args.mdbs < 1:
+        parser.error('--boards, --rows and --mdbs must be at least 1')
+
+    print(f"Generating {args.boards} boards x {args.rows} rows (seed {args.seed})...")
+    count = generate_workbook(args.output, args.boards, args.rows, args.mdbs, args.fill, args.seed, args.formulas)
+    print(f"Wrote {count} boards to {args.output}")
@@ -0,0 +1,129 @@
+"""
+HTTP validators and compression for the JSON API responses.
+
+API bodies only change when e2.xlsx changes, so every response gets a strong
+ETag built from the workbook version and the request. Clients that send the
+ETag back in If-None-Match get a 304 with no body. Serialized bodies and
+their gzip (and brotli, if the brotli package is installed) variants are
+cached per workbook version, so repeated requests do no JSON encoding or
+compression work at all.
+"""
+
+import gzip
+import hashlib
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import metrics
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 512
+
+
+def make_etag(version, key):
+    """Strong ETag for the response identified by key under a workbook version."""
+    digest = hashlib.sha1(f'{version}\0{key}'.encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header value against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    # Weak comparison is what If-None-Match calls for
+    return any(tag.removeprefix('W/') == etag for tag in candidates)
+
+
+def choose_encoding(accept_encoding):
+    """Pick 'br', 'gzip' or None from an Accept-Encoding header."""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if params in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    """Compress a body with the given content coding."""
+    if encoding == 'br':
+        return brotli.compress(body)
+    if encoding == 'gzip':
+        # mtime=0 keeps the compressed bytes identical for identical bodies
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+
+def gzip_stream(chunks):
+    """Gzip a stream of byte chunks, flushing after each so the client sees them as they come."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CachedResponse:
+    """A serialized body with lazily built compressed variants."""
+
+    def __init__(self, etag, body):
+        self.etag = etag
+        self._variants = {None: body}
+        self._lock = threading.Lock()
+
+    def body(self, encoding=None):
+        """Return (body, encoding actually used) for the preferred encoding."""
+        identity = self._variants[None]
+        if encoding is None or len(identity) < MIN_COMPRESS_SIZE:
+            return identity, None
+        variant = self._variants.get(encoding)
+        if variant is None:
+            with self._lock:
+                variant = self._variants.get(encoding)
+                if variant is None:
+                    variant = self._variants[encoding] = compress(identity, encoding)
+        return variant, encoding
+
+
+class ResponseCache:
+    """Serialized API responses for the current workbook version.
+
+    Entries for older versions are dropped as soon as a newer version is seen.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def get(self, version, key, build_body):
+        """Return the CachedResponse for key, calling build_body() -> bytes on a miss."""
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._responses = {}
+            response = self._responses.get(key)
+        metrics.cache('response', response is not None)
+        if response is not None:
+            return response
+
+        response = CachedResponse(make_etag(version, key), build_body())
+        with self._lock:
+            if version == self._version:
+                response = self._responses.setdefault(key, response)
+        return response
@@ -0,0 +1,194 @@
+"""
+Per-phase timings and Prometheus-format metrics.
+
+A PhaseTimer collects the wall time of named phases ("workbook",
+"extraction", "serialization", ...) of one unit of work, e.g. one API
+request. While a timer is active on a thread, code anywhere below it can
+time a phase with
+
+    with phase('totallist'):
+        ...
+
+which costs nothing when no timer is active (CLI runs, background threads).
+
+The server feeds each request's phases into a MetricsRegistry, which keeps
+counters and histograms and renders them in the Prometheus text format for
+/metrics. Metrics are per process: under gunicorn every worker keeps its
+own, like any client library without a multiprocess collector.
+"""
+
+import contextlib
+import math
+import threading
+import time
+
+# Prometheus' default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_local = threading.local()
+
+
+class PhaseTimer:
+    """Wall times of the named phases of one unit of work, plus cache hits/misses."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.caches = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - started
+
+    def cache(self, name, hit):
+        """Note a cache lookup; the first lookup of each cache is the one reported."""
+        self.caches.setdefault(name, 'hit' if hit else 'miss')
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Make this the timer that phase() reports to on the current thread."""
+        previous = getattr(_local, 'timer', None)
+        _local.timer = self
+        try:
+            yield self
+        finally:
+            _local.timer = previous
+
+    def server_timing(self):
+        """Value for a Server-Timing response header (durations in milliseconds)."""
+        entries = []
+        for name, hit in self.caches.items():
+            entries.append(f'{name}-cache;desc="{hit}"')
+        for name, seconds in self.phases.items():
+            entries.append(f'{name.replace(" ", "-")};dur={seconds * 1000:.2f}')
+        entries.append(f'total;dur={self.elapsed() * 1000:.2f}')
+        return ', '.join(entries)
+
+
+def begin():
+    """Start a new timer and make it active on this thread (see end())."""
+    _local.timer = PhaseTimer()
+    return _local.timer
+
+
+def end():
+    """Deactivate the thread's timer."""
+    _local.timer = None
+
+
+def current_timer():
+    """The timer active on this thread, or None."""
+    return getattr(_local, 'timer', None)
+
+
+def phase(name):
+    """Time a phase on the active timer; a no-op when there is none."""
+    timer = current_timer()
+    return timer.phase(name) if timer is not None else contextlib.nullcontext()
+
+
+def cache(name, hit):
+    """Note a cache hit or miss on the active timer, if any."""
+    timer = current_timer()
+    if timer is not None:
+        timer.cache(name, hit)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        # name -> {labels tuple: value} for counters,
+        # name -> {labels tuple: [bucket counts..., sum, count]} for histograms
+        self._values = {}
+
+    def _declare(self, name, kind, help_text):
+        if name not in self._types:
+            self._types[name] = kind
+            self._help[name] = help_text
+            self._values[name] = {}
+        elif self._types[name] != kind:
+            raise ValueError(f'{name} is already a {self._types[name]}')
+
+    def inc(self, name, help_text, amount=1, **labels):
+        """Add to a counter."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._declare(name, 'counter', help_text)
+            values = self._values[name]
+            values[key] = values.get(key, 0) + amount
+
+    def observe(self, name, help_text, value, **labels):
+        """Record one observation in a histogram."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._declare(name, 'histogram', help_text)
+            values = self._values[name]
+            state = values.get(key)
+            if state is None:
+                state = values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._types):
+                lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} {self._types[name]}')
+                for key, value in sorted(self._values[name].items()):
+                    if self._types[name] == 'counter':
+                        lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+                        continue
+                    for bound, count in zip(self.buckets + (math.inf,), value[:-2] + [value[-1]]):
+                        labels = key + (('le', _format_value(float(bound))),)
+                        lines.append(f'{name}_bucket{_format_labels(labels)} {count}')
+                    lines.append(f'{name}_sum{_format_labels(key)} {_format_value(value[-2])}')
+                    lines.append(f'{name}_count{_format_labels(key)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def record_request(self, endpoint, method, status, timer):
+        """Record one finished request: its count, duration, phases and cache hits/misses."""
+        self.inc('dashboard_http_requests_total', 'HTTP requests served.',
+                 endpoint=endpoint, method=method, status=status)
+        self.observe('dashboard_http_request_duration_seconds',
+                     'Time to produce a response (streamed bodies excluded).',
+                     timer.elapsed(), endpoint=endpoint)
+        for name, seconds in timer.phases.items():
+            self.observe('dashboard_request_phase_duration_seconds',
+                         'Time spent in each phase of a request.',
+                         seconds, endpoint=endpoint, phase=name)
+        for name, hit in timer.caches.items():
+            self.inc('dashboard_cache_lookups_total', 'Cache lookups by cache and result.',
+                     cache=name, result=hit)
@@ -0,0 +1,143 @@
+"""
+Opt-in profiling for the command-line scripts.
+
+Every script gets the same options through add_profile_arguments():
+
+    --profile [FILE]      run under cProfile and write the stats to FILE
+                          (default <script>.prof); view them later with
+                          python3 -m pstats FILE or snakeviz
+    --profile-top N       rows in the printed summaries (default 25)
+    --profile-memory      also trace allocations with tracemalloc
+
+After the run a summary is printed and saved next to the stats file as
+FILE.txt: time per package (openpyxl, this project's modules, stdlib...),
+the top functions by own time and by cumulative time, and with
+--profile-memory the peak traced memory and the source lines that allocated
+the most.
+"""
+
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sysconfig
+import tracemalloc
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+STDLIB_DIR = sysconfig.get_paths()['stdlib']
+DEFAULT_TOP = 25
+# Stack depth recorded per allocation with --profile-memory
+TRACEMALLOC_FRAMES = 10
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', nargs='?', const='', metavar='FILE',
+                        help='profile the run with cProfile and write the stats to FILE '
+                             '(default <script>.prof), plus a FILE.txt summary')
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_TOP, metavar='N',
+                        help=f'rows in the profile summaries (default {DEFAULT_TOP})')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='with --profile, also report the top allocations (tracemalloc)')
+
+
+def _package_of(filename):
+    """Group a code object's file: our modules by name, site-packages by package, or stdlib."""
+    if filename.startswith('<') or filename == '~':
+        return 'builtins'
+    path = os.path.abspath(filename)
+    if os.path.dirname(path) == PROJECT_DIR:
+        return os.path.basename(path)
+    parts = path.split(os.sep)
+    for marker in ('site-packages', 'dist-packages'):
+        if marker in parts:
+            return parts[parts.index(marker) + 1].split('.')[0]
+    if path.startswith(STDLIB_DIR):
+        return 'stdlib'
+    return os.path.basename(path)
+
+
+def time_by_package(stats):
+    """Own time per package or project module, largest first."""
+    totals = {}
+    for (filename, _, _), (_, _, tottime, _, _) in stats.stats.items():
+        package = _package_of(filename)
+        totals[package] = totals.get(package, 0) + tottime
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def project_allocations(snapshot):
+    """Allocated sizes grouped by the innermost frame in this project's own modules."""
+    totals = {}
+    for trace in snapshot.traces:
+        # Frames run from the oldest call to the allocation itself
+        frame = next((f for f in reversed(trace.traceback)
+                      if os.path.dirname(os.path.abspath(f.filename)) == PROJECT_DIR), None)
+        if frame is None:
+            continue
+        size, count = totals.get((frame.filename, frame.lineno), (0, 0))
+        totals[(frame.filename, frame.lineno)] = (size + trace.size, count + 1)
+    return sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+
+
+def profile_summary(profiler, top, snapshot=None, peak=None):
+    """Text summary of a finished profile (and optional tracemalloc snapshot)."""
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    total = stats.total_tt or 1
+
+    out.write(f"Total profiled time: {stats.total_tt:.3f}s\n\nTime by package:\n")
+    for package, seconds in time_by_package(stats)[:top]:
+        out.write(f"  {package:<32} {seconds:8.3f}s  {seconds / total * 100:5.1f}%\n")
+
+    out.write("\nTop functions by own time:\n")
+    stats.sort_stats('tottime').print_stats(top)
+    out.write("Top functions by cumulative time:\n")
+    stats.sort_stats('cumulative').print_stats(top)
+
+    if snapshot is not None:
+        out.write(f"Peak traced memory: {peak / 1e6:.1f} MB\n\nTop allocations by line (still allocated at exit):\n")
+        for stat in snapshot.statistics('lineno')[:top]:
+            frame = stat.traceback[0]
+            out.write(f"  {stat.size / 1e6:8.2f} MB  {stat.count:8d} blocks  {frame.filename}:{frame.lineno}\n")
+        out.write("\nTop allocations by the project line that led to them:\n")
+        for (filename, lineno), (size, count) in project_allocations(snapshot)[:top]:
+            out.write(f"  {size / 1e6:8.2f} MB  {count:8d} blocks  {os.path.basename(filename)}:{lineno}\n")
+    return out.getvalue()
+
+
+@contextlib.contextmanager
+def profiled(args, name):
+    """Run the body under cProfile (and tracemalloc) when args.profile is set.
+
+    name is the script name used for the default stats file, e.g.
+    'update_estimates' -> update_estimates.prof.
+    """
+    if args.profile is None:
+        yield
+        return
+
+    path = args.profile or f'{name}.prof'
+    if args.profile_memory:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = peak = None
+        if args.profile_memory:
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+            ])
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        profiler.dump_stats(path)
+        summary = profile_summary(profiler, args.profile_top, snapshot, peak)
+        with open(path + '.txt', 'w') as f:
+            f.write(summary)
+        print(f"\n{summary}")
+        print(f"Profile written to {path} (summary in {path}.txt)")
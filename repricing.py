@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+What-if repricing: board, MDB and project totals under new prices, without Excel.
+
+Every board's item rows (above the TOTAL footer row) are loaded once into
+columnar arrays: board, (BRAND, ITEM) key, PRICE and QTY. A row is
+"priced" when its AMOUNT is PRICE x QTY; only priced rows follow a price
+change. Lump sums (an AMOUNT without a QTY) and rows whose AMOUNT was typed
+over keep their amount.
+
+The footer of a board sheet is
+
+    TOTAL -> + LABOUR -> x NO OF UNITS -> + OVER HEAD 50% -> + TAX 5%
+          -> + PROVISIONAL SUM 10% -> NET TOTAL
+
+so NET TOTAL moves by (change of TOTAL) x NO OF UNITS x markup, where the
+markup is the sheet's own NET TOTAL / SUM AFTER NUMBER OF UNITS (1.5 x 1.05
+x 1.1 for empty boards). A scenario is therefore a handful of array
+operations: new prices per row, the change of every board's TOTAL in one
+bincount, and the change of every MDB/SMDB subtree and the project in a
+second one over the board tree (board_tree.py). The changes are applied to
+the TOTALLIST estimates the dashboard shows, so run update_estimates.py
+first if the sheets were edited since.
+
+A scenario is a list of rules applied in order. Each rule selects rows by
+brand (exact, ignoring case and spaces) and/or item (a case-insensitive
+substring of ITEM), and either multiplies their price ("factor": 0.9) or
+sets it ("price": 1250):
+
+    [{"brand": "EATON2", "item": "ACB", "factor": 0.85},
+     {"item": "MCCB - NON AUTO 125A", "price": 320}]
+
+NumPy is optional, as in bom.py.
+
+Usage:
+    python3 repricing.py --brand EATON2 --item ACB --factor 0.85
+    python3 repricing.py --scenarios scenarios.json   # [{"name": ..., "rules": [...]}, ...]
+"""
+
+import argparse
+import json
+import math
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from board_extraction import READERS, amount_column, item_columns, load_workbook_data
+from board_tree import ROOT_KEY, BoardTree
+from bom import QTY_COLUMN_NAMES, board_units
+
+# NET TOTAL / SUM AFTER NUMBER OF UNITS with the workbook's standard rates
+DEFAULT_MARKUP = 1.5 * 1.05 * 1.1
+FOOTER_START = 'TOTAL'
+UNITS_SUBTOTAL = 'SUM AFTER NUMBER OF UNITS'
+DEFAULT_BOARD_LIMIT = 100
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _key(value):
+    if value is None or value == 0:
+        return ''
+    return ' '.join(str(value).split()).upper()
+
+
+def board_columns(items):
+    """The BRAND, ITEM, PRICE, QTY and AMOUNT headers of a board's items (None if missing).
+
+    Headers are matched like bom.py does, ignoring case and spaces.
+    """
+    headers = item_columns(items)
+    return {
+        'brand': headers.get('BRAND'),
+        'item': headers.get('ITEM') or headers.get('DESCRIPTION'),
+        'price': headers.get('PRICE'),
+        'qty': next((headers[name] for name in QTY_COLUMN_NAMES if name in headers), None),
+        'amount': amount_column(items),
+    }
+
+
+def footer_markup(items, columns=None):
+    """NET TOTAL / SUM AFTER NUMBER OF UNITS from a board's footer rows, or DEFAULT_MARKUP."""
+    columns = columns or board_columns(items)
+    values = {}
+    for item in items:
+        label = _key(item.get(columns['item']))
+        if label in (UNITS_SUBTOTAL, 'NET TOTAL') and label not in values:
+            values[label] = _number(item.get(columns['amount']))
+    base, net = values.get(UNITS_SUBTOTAL), values.get('NET TOTAL')
+    if base and net is not None:
+        return net / base
+    return DEFAULT_MARKUP
+
+
+def item_rows(items, columns=None):
+    """The rows above the TOTAL footer row."""
+    columns = columns or board_columns(items)
+    for item in items:
+        if _key(item.get(columns['item'])) == FOOTER_START:
+            return
+        yield item
+
+
+def parse_rules(rules):
+    """Validate a scenario's rules; raises ValueError with a message for the API."""
+    if not isinstance(rules, list):
+        raise ValueError('Scenario rules must be a list')
+    parsed = []
+    for rule in rules:
+        if not isinstance(rule, dict):
+            raise ValueError('Every rule must be an object')
+        brand, item = rule.get('brand'), rule.get('item')
+        if not brand and not item:
+            raise ValueError('Every rule needs a brand and/or an item')
+        if ('factor' in rule) == ('price' in rule):
+            raise ValueError('Every rule needs either a factor or a price')
+        value = _number(rule.get('factor', rule.get('price')))
+        if value is None or value < 0 or not math.isfinite(value):
+            raise ValueError(f'Invalid factor/price in rule {json.dumps(rule)}')
+        parsed.append((_key(brand) if brand else None, _key(item) if item else None,
+                       'factor' if 'factor' in rule else 'price', value))
+    return parsed
+
+
+class RepricingModel:
+    """Columnar PRICE/QTY/AMOUNT rows of every board, ready to evaluate price scenarios."""
+
+    def __init__(self, data, tree=None):
+        records = data.index.records if data.index is not None else []
+        self.tree = tree or BoardTree(records)
+        self._load(data)
+        self._link_groups()
+
+    def _load(self, data):
+        self.boards = []      # tree keys of the boards with sheets
+        self.scale = []       # NO OF UNITS x markup: NET TOTAL change per unit of TOTAL change
+        self.keys = []        # (brand, item) keys, upper-case
+        key_ids = {}
+        boards, keys, prices, qtys = [], [], [], []
+        for node in self.tree.nodes.values():
+            if node.placeholder or node.key == ROOT_KEY:
+                continue
+            sheet = data.sheet(node.name)
+            if sheet is None:
+                continue
+            board_id = len(self.boards)
+            self.boards.append(node.key)
+            record = data.index.get(node.name) or {}
+            columns = board_columns(sheet['items'])
+            self.scale.append(board_units(sheet, record) * footer_markup(sheet['items'], columns))
+            for item in item_rows(sheet['items'], columns):
+                price, qty, amount = (_number(item.get(columns[column])) for column in ('price', 'qty', 'amount'))
+                if price is None or not qty or qty <= 0 or amount is None:
+                    continue
+                if not math.isclose(amount, price * qty, rel_tol=1e-6, abs_tol=0.01):
+                    continue
+                lookup = (_key(item.get(columns['brand'])), _key(item.get(columns['item'])))
+                key_id = key_ids.get(lookup)
+                if key_id is None:
+                    key_id = key_ids[lookup] = len(self.keys)
+                    self.keys.append(lookup)
+                boards.append(board_id)
+                keys.append(key_id)
+                prices.append(price)
+                qtys.append(qty)
+        self._rows = (boards, keys, prices, qtys)
+        if np is not None:
+            self._rows = tuple(np.asarray(column, dtype=np.int64 if i < 2 else float)
+                               for i, column in enumerate(self._rows))
+            self.scale = np.asarray(self.scale, dtype=float)
+
+    def _link_groups(self):
+        """Every board's subtree keys (its own and every ancestor's), as flat (board, group) pairs."""
+        self.groups = [ROOT_KEY]
+        group_ids = {ROOT_KEY: 0}
+        pair_boards, pair_groups = [], []
+        for board_id, board_key in enumerate(self.boards):
+            node = self.tree.nodes[board_key]
+            while node is not None:
+                if node.key not in group_ids:
+                    group_ids[node.key] = len(self.groups)
+                    self.groups.append(node.key)
+                pair_boards.append(board_id)
+                pair_groups.append(group_ids[node.key])
+                node = node.parent
+        self._pairs = (pair_boards, pair_groups)
+        if np is not None:
+            self._pairs = tuple(np.asarray(column, dtype=np.int64) for column in self._pairs)
+
+    def _matching_keys(self, brand, item):
+        return [key_id for key_id, (key_brand, key_item) in enumerate(self.keys)
+                if (brand is None or key_brand == brand) and (item is None or item in key_item)]
+
+    def _key_prices(self, rules):
+        """Per-key (set price or None, factor) after applying the rules in order."""
+        prices = {}
+        for brand, item, kind, value in rules:
+            for key_id in self._matching_keys(brand, item):
+                price, factor = prices.get(key_id, (None, 1.0))
+                prices[key_id] = (value, 1.0) if kind == 'price' else (price, factor * value)
+        return prices
+
+    def _board_deltas(self, rules):
+        """(NET TOTAL change per board, number of rows repriced)."""
+        key_prices = self._key_prices(rules)
+        if np is not None:
+            boards, keys, prices, qtys = self._rows
+            set_price = np.full(len(self.keys), np.nan)
+            factor = np.ones(len(self.keys))
+            for key_id, (price, key_factor) in key_prices.items():
+                if price is not None:
+                    set_price[key_id] = price
+                factor[key_id] = key_factor
+            # Overflow to inf is reported by evaluate(), not as a warning
+            with np.errstate(over='ignore', invalid='ignore'):
+                new_prices = np.where(np.isnan(set_price[keys]), prices, set_price[keys]) * factor[keys]
+                row_delta = (new_prices - prices) * qtys
+                total_delta = np.bincount(boards, weights=row_delta, minlength=len(self.boards))
+                changed = int(np.count_nonzero(row_delta))
+                return total_delta * self.scale, changed
+
+        total_delta = [0.0] * len(self.boards)
+        changed = 0
+        for board, key, price, qty in zip(*self._rows):
+            if key not in key_prices:
+                continue
+            set_price, factor = key_prices[key]
+            delta = ((price if set_price is None else set_price) * factor - price) * qty
+            if delta:
+                total_delta[board] += delta
+                changed += 1
+        return [delta * scale for delta, scale in zip(total_delta, self.scale)], changed
+
+    def _group_deltas(self, board_deltas):
+        if np is not None:
+            pair_boards, pair_groups = self._pairs
+            with np.errstate(over='ignore', invalid='ignore'):
+                return np.bincount(pair_groups, weights=board_deltas[pair_boards], minlength=len(self.groups))
+        deltas = [0.0] * len(self.groups)
+        for board, group in zip(*self._pairs):
+            deltas[group] += board_deltas[board]
+        return deltas
+
+    def evaluate(self, rules, name=None, limit=DEFAULT_BOARD_LIMIT):
+        """Totals of the project and every main MDB under one scenario, plus the boards that change.
+
+        Boards are sorted by the size of their change and at most limit are returned.
+        """
+        board_deltas, changed_rows = self._board_deltas(parse_rules(rules))
+        group_deltas = self._group_deltas(board_deltas)
+        group_ids = {key: i for i, key in enumerate(self.groups)}
+
+        def totals(node):
+            delta = float(group_deltas[group_ids[node.key]]) if node.key in group_ids else 0.0
+            return {'name': node.name, 'total': node.total_estimate + delta,
+                    'baseline': node.total_estimate, 'delta': delta}
+
+        boards = []
+        for board_id, delta in enumerate(board_deltas):
+            if delta:
+                node = self.tree.nodes[self.boards[board_id]]
+                boards.append({'name': node.name, 'estimate': node.estimate + float(delta),
+                               'baseline': node.estimate, 'delta': float(delta)})
+        boards.sort(key=lambda board: abs(board['delta']), reverse=True)
+        project = totals(self.tree.root)
+        mdbs = [totals(child) for child in self.tree.root.children]
+        # Huge factors/prices can overflow, and inf/NaN are not valid JSON
+        if not all(math.isfinite(result[field]) for result in [project] + mdbs + boards
+                   for field in ('delta', 'baseline', 'total' if 'total' in result else 'estimate')):
+            raise ValueError(f'Scenario "{name}" gives totals too large to represent')
+        return {
+            'name': name,
+            'rules': rules,
+            'project': project,
+            'mdbs': mdbs,
+            'changedRows': changed_rows,
+            'changedBoards': len(boards),
+            'boards': boards[:limit]
+        }
+
+    def compare(self, scenarios, limit=DEFAULT_BOARD_LIMIT):
+        """Evaluate several {"name", "rules"} scenarios against the same baseline."""
+        if not isinstance(scenarios, list) or not scenarios:
+            raise ValueError('POST a non-empty list of scenarios or {"scenarios": [...]}')
+        results = []
+        for number, scenario in enumerate(scenarios, 1):
+            if not isinstance(scenario, dict):
+                raise ValueError('Every scenario must be an object with "rules"')
+            results.append(self.evaluate(scenario.get('rules'), scenario.get('name') or f'Scenario {number}', limit))
+        return {'pricedRows': len(self._rows[0]), 'scenarios': results}
+
+
+def print_scenario(result):
+    project = result['project']
+    print(f"\n{result['name']}: {result['changedRows']} rows on {result['changedBoards']} boards repriced")
+    print(f"  {'PROJECT':<24} {project['baseline']:>16,.2f} -> {project['total']:>16,.2f} ({project['delta']:+,.2f})")
+    for mdb in result['mdbs']:
+        if mdb['delta']:
+            print(f"  {mdb['name'][:24]:<24} {mdb['baseline']:>16,.2f} -> {mdb['total']:>16,.2f} ({mdb['delta']:+,.2f})")
+    for board in result['boards'][:10]:
+        print(f"    {board['name'][:22]:<22} {board['delta']:+16,.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='What-if board/MDB/project totals under new prices')
+    parser.add_argument('--brand', help='rule: rows of this brand')
+    parser.add_argument('--item', help='rule: rows whose ITEM contains this text')
+    parser.add_argument('--factor', type=float, help='rule: multiply the price by this factor')
+    parser.add_argument('--price', type=float, help='rule: set the price')
+    parser.add_argument('--scenarios', metavar='FILE', help='JSON list of {"name": ..., "rules": [...]} to compare')
+    parser.add_argument('--reader', choices=READERS,
+                        help='workbook reader: openpyxl (default), xml (the faster direct XML reader) '
+                             'or formulas (xml with every formula recalculated)')
+    args = parser.parse_args()
+
+    if args.scenarios:
+        with open(args.scenarios, encoding='utf-8') as f:
+            scenarios = json.load(f)
+    else:
+        rule = {key: value for key, value in vars(args).items()
+                if key in ('brand', 'item', 'factor', 'price') and value is not None}
+        scenarios = [{'name': 'Scenario', 'rules': [rule]}]
+
+    print("Reading e2.xlsx...")
+    model = RepricingModel(load_workbook_data('e2.xlsx', args.reader))
+    try:
+        result = model.compare(scenarios)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    for scenario in result['scenarios']:
+        print_scenario(scenario)
@@ -0,0 +1,161 @@
+"""
+Inverted index over the item rows of every board sheet.
+
+Built once per workbook version from the extracted WorkbookData, it answers
+questions like "which boards use an ACB 2500A 4P" or "everything from
+EATON2" without reading any sheet again.
+
+Every item row of a board listed in TOTALLIST is tokenized from its BRAND,
+ITEM, DESCRIPTION and note columns. Tokens are upper-case runs of letters
+and digits ("ACB", "2500A", "4P", "65KA"; decimals such as "1.5" stay one
+token). Each token maps to the ids of the rows containing it, both for all
+fields together and per field.
+
+A query is a list of terms that must all match (AND). Every term matches as
+a prefix ("EAT" finds "EATON1" and "EATON2"), and "field:term" limits a term
+to one field (brand:eaton2 acb). Prefix lookups bisect a sorted
+vocabulary, so a query costs a few set intersections.
+
+By default only rows with an AMOUNT are searched, i.e. the rows the
+dashboard shows. The price catalogue rows every sheet carries have no
+quantity and are skipped unless include_all is set.
+"""
+
+import bisect
+import re
+
+from board_extraction import amount_column, has_amount
+
+# Item columns that are indexed, by upper-case header name
+SEARCH_FIELDS = {'BRAND': 'brand', 'ITEM': 'item', 'DESCRIPTION': 'description', 'NOTE': 'note', 'NOTES': 'note'}
+TOKEN = re.compile(r'[A-Z0-9]+(?:\.[0-9]+)*')
+DEFAULT_LIMIT = 200
+
+
+def tokenize(text):
+    """Upper-case tokens of a cell or query string."""
+    if text is None:
+        return []
+    return TOKEN.findall(str(text).upper())
+
+
+class SearchIndex:
+    """Token -> row ids over every board's item rows."""
+
+    def __init__(self, data):
+        # Row id -> (board name, position in the board's items, item dict, has amount)
+        self.rows = []
+        self._postings = {}          # token -> set of row ids (all fields)
+        self._field_postings = {}    # field -> token -> set of row ids
+        self._shown = set()          # row ids with an AMOUNT
+        self._mdb = {}
+        self._build(data)
+        self._vocabulary = sorted(self._postings)
+        self._field_vocabulary = {field: sorted(tokens) for field, tokens in self._field_postings.items()}
+
+    def _build(self, data):
+        names = dict.fromkeys(data.index.names()) if data.index is not None else {}
+        for name in names:
+            sheet = data.sheet(name)
+            if sheet is None:
+                continue
+            self._mdb[name] = data.index.metadata(name).get('mdb')
+            items = sheet['items']
+            amount = amount_column(items)
+            fields = [
+                (header, SEARCH_FIELDS[header.strip().upper()])
+                for header in (items[0] if items else ())
+                if header.strip().upper() in SEARCH_FIELDS
+            ]
+            for position, item in enumerate(items):
+                row_id = len(self.rows)
+                shown = has_amount(item, amount)
+                indexed = False
+                for header, field in fields:
+                    for token in tokenize(item.get(header)):
+                        self._postings.setdefault(token, set()).add(row_id)
+                        self._field_postings.setdefault(field, {}).setdefault(token, set()).add(row_id)
+                        indexed = True
+                if not indexed:
+                    # Keep row ids dense but skip rows with nothing to find
+                    self.rows.append(None)
+                    continue
+                self.rows.append((name, position, item, amount))
+                if shown:
+                    self._shown.add(row_id)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _matching(self, term, field=None):
+        """Row ids whose tokens (in one field, or any) start with term."""
+        if field is None:
+            postings, vocabulary = self._postings, self._vocabulary
+        else:
+            postings = self._field_postings.get(field, {})
+            vocabulary = self._field_vocabulary.get(field, [])
+        matched = set()
+        start = bisect.bisect_left(vocabulary, term)
+        for token in vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            matched |= postings[token]
+        return matched
+
+    def parse_query(self, query):
+        """[(field or None, term)] for a query string; raises ValueError for unknown fields."""
+        terms = []
+        for part in str(query).split():
+            field = None
+            if ':' in part:
+                prefix, _, rest = part.partition(':')
+                if prefix.upper() not in SEARCH_FIELDS:
+                    raise ValueError(f'Unknown search field "{prefix}" '
+                                     f'(use one of {", ".join(sorted(set(SEARCH_FIELDS.values())))})')
+                field, part = SEARCH_FIELDS[prefix.upper()], rest
+            terms.extend((field, token) for token in tokenize(part))
+        return terms
+
+    def search(self, query, limit=DEFAULT_LIMIT, include_all=False, mdb=None):
+        """Boards with rows matching every term of query.
+
+        Returns {'boards': [...], 'boardCount', 'rowCount', 'truncated'}; every
+        board has its name, mdb, the matching rows (position and item) and the
+        sum of their amounts. Boards and rows are in workbook order and at
+        most limit rows are returned.
+        """
+        terms = self.parse_query(query)
+        if not terms:
+            return {'boards': [], 'boardCount': 0, 'rowCount': 0, 'truncated': False}
+
+        # Rarest term first keeps the intersections small
+        candidates = sorted((self._matching(term, field) for field, term in terms), key=len)
+        matched = set(candidates[0])
+        for other in candidates[1:]:
+            matched &= other
+            if not matched:
+                break
+        if not include_all:
+            matched &= self._shown
+        if mdb:
+            wanted = str(mdb).strip().upper()
+            matched = {row_id for row_id in matched
+                       if str(self._mdb.get(self.rows[row_id][0]) or '').strip().upper() == wanted}
+
+        boards = {}
+        row_ids = sorted(matched)
+        for row_id in row_ids[:limit]:
+            name, position, item, amount = self.rows[row_id]
+            board = boards.get(name)
+            if board is None:
+                board = boards[name] = {'name': name, 'mdb': self._mdb.get(name), 'amount': 0, 'rows': []}
+            board['rows'].append({'position': position, 'item': item})
+            value = item.get(amount) if amount else None
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                board['amount'] += value
+        return {
+            'boards': list(boards.values()),
+            'boardCount': len({self.rows[row_id][0] for row_id in row_ids}),
+            'rowCount': len(row_ids),
+            'truncated': len(row_ids) > limit
+        }
@@ -1,56 +1,97 @@
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, Response, send_from_directory, jsonify, request
 from flask_cors import CORS
-import openpyxl
 import os
-import re
-from datetime import datetime
-from collections import OrderedDict
+import threading
+import metrics
+from board_tree import BoardTree
+from bom import BillOfMaterials
+from change_notifier import ChangeNotifier
+from dashboard_history import DashboardHistory
+from http_cache import ResponseCache, choose_encoding, etag_matches, gzip_stream, make_etag
+from repricing import DEFAULT_BOARD_LIMIT, RepricingModel
+from search_index import DEFAULT_LIMIT, SearchIndex
+from workbook_cache import WorkbookCache
+from workbook_snapshot import load_workbook_data_snapshot
 
 app = Flask(__name__, static_folder='.')
 CORS(app)  # Enable CORS for all routes
 
-def extract_dashboard_data():
+# Extracted workbook shared by all requests; re-extracted only when e2.xlsx changes.
+# Served from the memory-mapped e2.snapshot when it matches the workbook.
+workbook_cache = WorkbookCache('e2.xlsx', loader=load_workbook_data_snapshot)
+
+# Serialized/compressed API responses for the current workbook version
+response_cache = ResponseCache()
+
+# Dashboard payloads by version id, kept for ?since= delta responses
+dashboard_history = DashboardHistory()
+
+# MDB -> SMDB -> DB tree with rolled-up totals, and the workbook version it reflects
+board_tree = None
+board_tree_version = None
+board_tree_lock = threading.Lock()
+
+# Inverted index over every board's item rows, and the workbook version it was built from
+search_index = None
+search_index_version = None
+search_index_lock = threading.Lock()
+
+# Bill of materials of the project and every MDB/SMDB subtree, and its workbook version
+bom = None
+bom_version = None
+bom_lock = threading.Lock()
+
+# PRICE/QTY rows of every board for what-if scenarios, and its workbook version
+repricing_model = None
+repricing_model_version = None
+repricing_model_lock = threading.Lock()
+
+# Request counts, durations and per-phase timings, served at /metrics
+metrics_registry = metrics.MetricsRegistry()
+
+@app.before_request
+def start_request_timer():
+    metrics.begin()
+
+@app.after_request
+def record_request_timing(response):
+    """Add a Server-Timing header with the request's phases and record them for /metrics."""
+    timer = metrics.current_timer()
+    if timer is not None:
+        response.headers['Server-Timing'] = timer.server_timing()
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics_registry.record_request(endpoint, request.method, response.status_code, timer)
+    return response
+
+@app.teardown_request
+def stop_request_timer(exc):
+    metrics.end()
+
+def current_entry():
+    """The current workbook entry, timed as the request's "workbook" phase."""
+    with metrics.phase('workbook'):
+        return workbook_cache.get_entry()
+
+def extract_dashboard_data(entry=None):
     """Extract dashboard data directly from Excel file."""
     try:
-        wb = openpyxl.load_workbook('e2.xlsx', data_only=True)
+        if entry is None:
+            entry = current_entry()
+        index = entry.value.index
         
-        if 'TOTALLIST' not in wb.sheetnames:
+        if index is None:
             return {'error': 'TOTALLIST sheet not found'}
         
-        ws_totallist = wb['TOTALLIST']
-        
-        # Column indices (1-based) - Based on header: NumTag, KIND, MDB, SMDB, Itemdrop, Load, NO OF ITEMS, Estimate
-        board_name_col = 5  # Column E (Itemdrop - board name)
-        estimate_col = 8    # Column H (Estimate)
-        load_col = 6        # Column F (Load)
-        items_col = 7       # Column G (NO OF ITEMS)
-        kind_col = 2        # Column B (KIND)
-        mdb_col = 3         # Column C (MDB)
-        
         mdb_boards = []
         all_boards = []
         
-        # Process rows starting from row 2
-        for row_idx in range(2, ws_totallist.max_row + 1):
-            board_name_cell = ws_totallist.cell(row_idx, board_name_col)
-            estimate_cell = ws_totallist.cell(row_idx, estimate_col)
-            load_cell = ws_totallist.cell(row_idx, load_col) if load_col <= ws_totallist.max_column else None
-            items_cell = ws_totallist.cell(row_idx, items_col) if items_col <= ws_totallist.max_column else None
-            kind_cell = ws_totallist.cell(row_idx, kind_col) if kind_col <= ws_totallist.max_column else None
-            mdb_cell = ws_totallist.cell(row_idx, mdb_col) if mdb_col <= ws_totallist.max_column else None
-            
-            board_name = board_name_cell.value
-            estimate = estimate_cell.value
-            load = load_cell.value if load_cell else None
-            items = items_cell.value if items_cell else None
-            kind = kind_cell.value if kind_cell else None
-            mdb = mdb_cell.value if mdb_cell else None
-            
-            if not board_name or str(board_name).strip() == '':
-                continue
-            
-            board_name = str(board_name).strip()
+        for record in index:
+            board_name = record['name']
             board_name_upper = board_name.upper()
+            estimate = record['estimate']
+            items = record['items']
+            kind = record['kind']
+            mdb = record['mdb']
             
             # Check if it's one of the 4 main MDBs
             # Also check by KIND column - if KIND is 'MDB', it's a main MDB
@@ -71,20 +112,8 @@ def extract_dashboard_data():
             try:
                 estimate_value = float(estimate) if estimate is not None else 0
                 
-                # Parse load value (might have "kW" suffix or be a string)
-                load_value = 0
-                if load is not None:
-                    if isinstance(load, (int, float)):
-                        load_value = float(load)
-                    elif isinstance(load, str):
-                        # Remove "kW" and whitespace, then parse
-                        load_str = load.replace('kW', '').replace('kW', '').strip()
-                        try:
-                            load_value = float(load_str)
-                        except ValueError:
-                            load_value = 0
-                    else:
-                        load_value = 0
+                # Load (in kW) is parsed once when the TOTALLIST index is built
+                load_value = record['load_kw'] or 0
                 
                 items_value = int(items) if items is not None else 0
                 
@@ -140,7 +169,7 @@ def extract_dashboard_data():
             'allBoardsTotalLoad': all_total_load,
             'allBoardsTotalItems': all_total_items,
             'allBoardsCount': len(all_boards),
-            'lastUpdated': datetime.now().isoformat()
+            'lastUpdated': entry.modified.isoformat()
         }
     except Exception as e:
         return {'error': str(e)}
@@ -150,230 +179,392 @@ def index():
     """Serve the dashboard HTML."""
     return send_from_directory('.', 'dashboard.html')
 
+def cached_json(version, key, build):
+    """Return the CachedResponse for key under a workbook version."""
+    def build_body():
+        with metrics.phase('extraction'):
+            value = build()
+        with metrics.phase('serialization'):
+            return app.json.dumps(value).encode('utf-8')
+    return response_cache.get(version, key, build_body)
+
+def cached_json_response(version, key, build):
+    """Serve a JSON body cached per workbook version, with ETag/304 and compression."""
+    cached = cached_json(version, key, build)
+    headers = {
+        'ETag': cached.etag,
+        'Cache-Control': 'no-cache',  # always revalidate, which is cheap with the ETag
+        'Vary': 'Accept-Encoding'
+    }
+    if etag_matches(request.headers.get('If-None-Match'), cached.etag):
+        return app.response_class(status=304, headers=headers)
+    
+    with metrics.phase('compression'):
+        body, encoding = cached.body(choose_encoding(request.headers.get('Accept-Encoding')))
+    response = app.response_class(body, mimetype='application/json', headers=headers)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def dashboard_version(entry):
+    """Return the versioned dashboard payload for a workbook entry (built once per version)."""
+    def build():
+        with metrics.phase('extraction'):
+            return extract_dashboard_data(entry)
+    return dashboard_history.record(entry.version, entry.modified, build)
+
 @app.route('/api/dashboard-data')
 def dashboard_data():
-    """API endpoint to get dashboard data from Excel."""
-    data = extract_dashboard_data()
-    return jsonify(data)
+    """API endpoint to get dashboard data from Excel.
+    
+    With ?since=<version> only the boards added, removed or modified since
+    that version are returned (plus the new totals), when it is still in
+    the server's history; otherwise the full payload is returned.
+    """
+    try:
+        entry = current_entry()
+    except Exception as e:
+        return jsonify({'error': str(e)})
+    
+    current = dashboard_version(entry)
+    if current.id is None:
+        return jsonify(current.payload)
+    
+    since = request.args.get('since', type=int)
+    if since is not None:
+        delta = dashboard_history.delta(since, current)
+        if delta is not None:
+            return cached_json_response(entry.version, f'dashboard-delta\0{since}\0{current.id}',
+                                        lambda: delta)
+    
+    return cached_json_response(entry.version, f'dashboard-data\0{current.id}', lambda: current.payload)
+
+def warm_dashboard_data(entry):
+    """Build the dashboard payload (with its gzip variant), board tree, search index, BOM and repricing model once for a new workbook version."""
+    current = dashboard_version(entry)
+    if current.id is None:
+        return None
+    cached = cached_json(entry.version, f'dashboard-data\0{current.id}', lambda: current.payload)
+    cached.body('gzip')
+    board_tree_for(entry)
+    search_index_for(entry)
+    bom_for(entry)
+    repricing_model_for(entry)
+    return {'dashboardVersion': current.id}
+
+# Background watcher that pushes a "version" event to dashboards when e2.xlsx changes
+notifier = ChangeNotifier(workbook_cache, on_change=warm_dashboard_data)
+
+@app.route('/api/events')
+def events():
+    """Server-Sent Events stream announcing new workbook versions.
+    
+    Every open stream holds a worker thread, so in --prod mode only
+    --event-streams of them are allowed per worker; past that the client gets
+    a 503 and the dashboard falls back to polling.
+    """
+    stream = notifier.open_stream()
+    if stream is None:
+        return jsonify({'error': 'Too many open event streams, poll /api/dashboard-data instead'}), 503
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # don't let a reverse proxy buffer the stream
+    })
+
+def board_tree_for(entry):
+    """Return the board tree for a workbook entry, updating the previous one in place when only values changed."""
+    global board_tree, board_tree_version
+    with metrics.phase('tree'), board_tree_lock:
+        if board_tree_version != entry.version:
+            records = entry.value.index.records if entry.value.index is not None else []
+            if board_tree is None or board_tree.update_records(records) is None:
+                board_tree = BoardTree(records)
+            board_tree_version = entry.version
+        return board_tree
+
+@app.route('/api/tree')
+def tree():
+    """API endpoint for the MDB -> SMDB -> DB tree with rolled-up totals.
+    
+    ?node=<board> returns the subtree under one board and ?depth=<n> limits
+    how many levels of children are included.
+    """
+    try:
+        entry = current_entry()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    current = board_tree_for(entry)
+    node_name = request.args.get('node')
+    depth = request.args.get('depth', type=int)
+    node = current.get(node_name) if node_name else current.root
+    if node is None:
+        return jsonify({'error': f'Board "{node_name}" not found'}), 404
+    
+    return cached_json_response(entry.version, f'tree\0{node.key}\0{depth}',
+                                lambda: current.to_dict(node.key, depth))
+
+def search_index_for(entry):
+    """Return the search index for a workbook entry, building it once per version."""
+    global search_index, search_index_version
+    with metrics.phase('index'), search_index_lock:
+        if search_index_version != entry.version:
+            search_index = SearchIndex(entry.value)
+            search_index_version = entry.version
+        return search_index
+
+@app.route('/api/search')
+def search():
+    """API endpoint to search item rows of all boards by BRAND, ITEM, DESCRIPTION and note.
+    
+    ?q=acb 2500a 4p matches rows containing every term (as a prefix, so
+    ?q=eaton finds EATON1 and EATON2); brand:eaton2 limits a term to one
+    field. Only rows with an AMOUNT are searched unless ?all=1. ?mdb=MDB3
+    limits the results to one main MDB and ?limit= caps the rows returned.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Search query (q) is required'}), 400
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    include_all = request.args.get('all', '') in ('1', 'true', 'yes')
+    
+    try:
+        entry = current_entry()
+        index = search_index_for(entry)
+        with metrics.phase('search'):
+            result = index.search(query, limit=max(limit, 0), include_all=include_all,
+                                  mdb=request.args.get('mdb'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    result['query'] = query
+    return jsonify(result)
+
+def bom_for(entry):
+    """Return the bill of materials for a workbook entry, building it once per version."""
+    global bom, bom_version
+    current_tree = board_tree_for(entry)
+    with metrics.phase('bom'), bom_lock:
+        if bom_version != entry.version:
+            bom = BillOfMaterials(entry.value, current_tree)
+            bom_version = entry.version
+        return bom
+
+@app.route('/api/bom')
+def bill_of_materials():
+    """API endpoint for the bill of materials: total QTY and AMOUNT per (BRAND, ITEM).
+    
+    ?node=<MDB or SMDB> returns the BOM of one subtree instead of the whole
+    project and ?sort=qty|name changes the line order (default amount).
+    """
+    sort = request.args.get('sort', 'amount')
+    if sort not in ('amount', 'qty', 'name'):
+        return jsonify({'error': f'Unknown sort "{sort}" (use amount, qty or name)'}), 400
+    
+    try:
+        entry = current_entry()
+        current = bom_for(entry)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    node_name = request.args.get('node')
+    node = current.tree.get(node_name) if node_name else current.tree.root
+    if node is None:
+        return jsonify({'error': f'Board "{node_name}" not found'}), 404
+    
+    return cached_json_response(entry.version, f'bom\0{node.key}\0{sort}',
+                                lambda: current.get(node.key, sort))
+
+def repricing_model_for(entry):
+    """Return the repricing model for a workbook entry, building it once per version."""
+    global repricing_model, repricing_model_version
+    current_tree = board_tree_for(entry)
+    with metrics.phase('repricing'), repricing_model_lock:
+        if repricing_model_version != entry.version:
+            repricing_model = RepricingModel(entry.value, current_tree)
+            repricing_model_version = entry.version
+        return repricing_model
+
+@app.route('/api/scenarios', methods=['POST'])
+def scenarios():
+    """Compare what-if price scenarios: project, MDB and board totals under new prices.
+    
+    POST a JSON list of {"name": ..., "rules": [{"brand": ..., "item": ...,
+    "factor": ...} or {..., "price": ...}]} (or {"scenarios": [...]}).
+    ?limit= caps the changed boards listed per scenario.
+    """
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get('scenarios')
+    limit = request.args.get('limit', DEFAULT_BOARD_LIMIT, type=int)
+    
+    try:
+        entry = current_entry()
+        model = repricing_model_for(entry)
+        with metrics.phase('scenarios'):
+            result = model.compare(body, limit=max(limit, 0))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify(result)
 
 @app.route('/api/board-details')
 def board_details():
     """API endpoint to get board details from Excel."""
-    from flask import request
-    
     board_name = request.args.get('name')
     if not board_name:
         return jsonify({'error': 'Board name is required'}), 400
     
     try:
-        wb = openpyxl.load_workbook('e2.xlsx', data_only=True)
+        entry = current_entry()
+        data = entry.value
         
-        if board_name not in wb.sheetnames:
+        if not data.has_sheet(board_name):
             return jsonify({'error': f'Board sheet "{board_name}" not found'}), 404
         
-        # Get board metadata from TOTALLIST sheet
-        board_metadata = {}
-        if 'TOTALLIST' in wb.sheetnames:
-            ws_totallist = wb['TOTALLIST']
-            # Column indices: NumTag=1, KIND=2, MDB=3, SMDB=4, Itemdrop=5, Load=6, NO OF ITEMS=7, Estimate=8
-            for row_idx in range(2, ws_totallist.max_row + 1):
-                itemdrop = ws_totallist.cell(row_idx, 5).value  # Column E (Itemdrop - board name)
-                if itemdrop and str(itemdrop).strip() == board_name:
-                    kind = ws_totallist.cell(row_idx, 2).value  # Column B (KIND)
-                    mdb = ws_totallist.cell(row_idx, 3).value   # Column C (MDB)
-                    smdb = ws_totallist.cell(row_idx, 4).value  # Column D (SMDB)
-                    load = ws_totallist.cell(row_idx, 6).value # Column F (Load)
-                    
-                    # Parse load value safely (handle strings with units like "300.00 kVAR" or "100.5 kW")
-                    load_value = None
-                    if load is not None:
-                        try:
-                            if isinstance(load, str):
-                                # Extract numeric part from string (remove units like "kW", "kVAR", etc.)
-                                num_match = re.search(r'[\d,]+\.?\d*', load.replace(',', ''))
-                                if num_match:
-                                    load_value = float(num_match.group())
-                            else:
-                                load_value = float(load)
-                        except (ValueError, TypeError):
-                            load_value = None
-                    
-                    board_metadata = {
-                        'kind': str(kind).strip() if kind else None,
-                        'mdb': str(mdb).strip() if mdb else None,
-                        'smdb': str(smdb).strip() if smdb else None,
-                        'load': load_value
-                    }
-                    break
-        
-        ws = wb[board_name]
-        
-        # Find header row (look for row with common headers like ITEM, QTY, PRICE, AMOUNT)
-        header_row = 1
-        for row_idx in range(1, min(10, ws.max_row + 1)):
-            row_values = []
-            for col_idx in range(1, min(ws.max_column + 1, 15)):
-                cell_value = ws.cell(row_idx, col_idx).value
-                row_values.append(str(cell_value).upper() if cell_value else '')
-            
-            # Check if this looks like a header row
-            has_header_keywords = any(keyword in ' '.join(row_values) for keyword in 
-                                     ['ITEM', 'QTY', 'PRICE', 'AMOUNT', 'BRAND', 'DESCRIPTION'])
-            
-            if has_header_keywords:
-                header_row = row_idx
-                break
-        
-        # Define preferred column order (most common columns first)
-        # Note: 'back' is excluded as it's just a hyperlink, not a data column
-        preferred_order = ['BRAND', 'ITEM', 'DESCRIPTION', 'PRICE', 'QTY', 'QUANTITY', 'AMOUNT']
-        
-        # Columns to exclude (not data columns)
-        excluded_columns = ['back', 'BACK', 'list', 'LIST']
-        
-        # Extract headers - map each column to its header
-        # Exclude 'back' and 'list' columns as they're just hyperlinks/formatting
-        headers = {}
-        for col in range(1, ws.max_column + 1):
-            cell_value = ws.cell(header_row, col).value
-            if cell_value:
-                header_name = str(cell_value).strip()
-                # Skip excluded columns (hyperlinks, not data)
-                if header_name and header_name.upper() not in [ex.upper() for ex in excluded_columns]:
-                    headers[col] = header_name
-        
-        # If no headers found, use default column names
-        if not headers:
-            for col in range(1, min(ws.max_column + 1, 20)):
-                headers[col] = f'Column{col}'
-        
-        # Get all headers and determine their order
-        all_headers_list = list(headers.values())
-        all_headers_dict_upper = {h.upper(): h for h in all_headers_list}
-        
-        # Create ordered header list: preferred first, then others alphabetically
-        ordered_headers = []
-        used_headers = set()
-        
-        # Add preferred headers in order (case-insensitive match)
-        for pref_header in preferred_order:
-            pref_upper = pref_header.upper()
-            if pref_upper in all_headers_dict_upper and pref_upper not in used_headers:
-                original_header = all_headers_dict_upper[pref_upper]
-                ordered_headers.append(original_header)
-                used_headers.add(pref_upper)
-        
-        # Add remaining headers alphabetically (by original case)
-        remaining = [h for h_upper, h in all_headers_dict_upper.items() if h_upper not in used_headers]
-        ordered_headers.extend(sorted(remaining, key=lambda x: x.upper()))
-        
-        # Extract data rows in the preferred order
-        items = []
-        for row_idx in range(header_row + 1, ws.max_row + 1):
-            row_data = OrderedDict()
-            has_data = False
-            
-            # Map columns in the preferred order
-            for header_name in ordered_headers:
-                # Find the column index for this header
-                col_idx = None
-                for col, h in headers.items():
-                    if h == header_name:
-                        col_idx = col
-                        break
-                
-                if col_idx:
-                    cell_value = ws.cell(row_idx, col_idx).value
-                    row_data[header_name] = cell_value
-                    if cell_value is not None and str(cell_value).strip() != '':
-                        has_data = True
-            
-            # Only add rows that have some data
-            if has_data:
-                # Keep as OrderedDict to ensure order is preserved through JSON serialization
-                items.append(row_data)
-        
-        # Find summary data (NET TOTAL, NO OF UNITS)
-        summary = {}
-        for row_idx in range(max(1, ws.max_row - 50), ws.max_row + 1):
-            row = ws[row_idx]
-            if len(row) > 2 and row[2].value:
-                item_str = str(row[2].value).upper().strip()
-                if 'NET TOTAL' in item_str and 'net_total' not in summary:
-                    # Try multiple columns to find the value
-                    for check_col in [5, 4, 6, 3]:
-                        if len(row) > check_col:
-                            value = row[check_col].value
-                            if value is not None:
-                                try:
-                                    # Handle string values with units (e.g., "300.00 kVAR")
-                                    if isinstance(value, str):
-                                        num_match = re.search(r'[\d,]+\.?\d*', value.replace(',', ''))
-                                        if num_match:
-                                            value = float(num_match.group())
-                                        else:
-                                            continue
-                                    else:
-                                        value = float(value)
-                                    summary['net_total'] = value
-                                    break
-                                except (ValueError, TypeError):
-                                    continue
-                elif ('NO OF UNITS' in item_str or 'NO OF ITEMS' in item_str) and 'no_of_units' not in summary:
-                    # Try multiple columns to find the value
-                    for check_col in [5, 4, 6, 3]:
-                        if len(row) > check_col:
-                            value = row[check_col].value
-                            if value is not None:
-                                try:
-                                    # Handle string values with units
-                                    if isinstance(value, str):
-                                        num_match = re.search(r'[\d,]+\.?\d*', value.replace(',', ''))
-                                        if num_match:
-                                            value = float(num_match.group())
-                                        else:
-                                            continue
-                                    else:
-                                        value = float(value)
-                                    summary['no_of_units'] = value
-                                    break
-                                except (ValueError, TypeError):
-                                    continue
-        
-        # Convert OrderedDict items to regular dicts (Python 3.7+ preserves order)
-        # But keep the order by ensuring we serialize in the right order
-        items_dicts = []
-        for item in items:
-            if isinstance(item, OrderedDict):
-                items_dicts.append(dict(item))
-            else:
-                items_dicts.append(item)
-        
-        return jsonify({
-            'name': board_name,
-            'metadata': board_metadata,
-            'summary': summary,
-            'items': items_dicts
-        })
+        return cached_json_response(entry.version, f'board-details\0{board_name}',
+                                    lambda: data.board_details(board_name))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def batch_board_names(index):
+    """Board names requested from the batch endpoint, de-duplicated in request order.
+    
+    Names come from a POSTed JSON list (or {"names": [...]}), repeated
+    ?name= parameters and/or ?mdb=<main MDB> for every board under that MDB.
+    """
+    names = []
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            body = body.get('names')
+        if not isinstance(body, list):
+            raise ValueError('POST a JSON list of board names or {"names": [...]}')
+        names.extend(str(name) for name in body)
+    names.extend(request.args.getlist('name'))
+    for mdb in request.args.getlist('mdb'):
+        names.extend(index.names_in_mdb(mdb) if index is not None else [])
+    return list(dict.fromkeys(names))
+
+@app.route('/api/board-details/batch', methods=['GET', 'POST'])
+def board_details_batch():
+    """Board details for many boards at once, streamed as NDJSON (one board per line).
+    
+    Every board is resolved from the same workbook version. Boards without a
+    sheet get a {"name": ..., "error": ...} line instead.
+    """
+    try:
+        entry = current_entry()
+        data = entry.value
+        names = batch_board_names(data.index)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    headers = {
+        'ETag': make_etag(entry.version, 'board-details-batch\0' + '\0'.join(names)),
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding'
+    }
+    if etag_matches(request.headers.get('If-None-Match'), headers['ETag']):
+        return app.response_class(status=304, headers=headers)
+    
+    def lines():
+        for name in names:
+            if data.has_sheet(name):
+                # Shares the per-board cache with /api/board-details
+                body, _ = cached_json(entry.version, f'board-details\0{name}',
+                                      lambda: data.board_details(name)).body()
+            else:
+                body = app.json.dumps({'name': name, 'error': f'Board sheet "{name}" not found'}).encode('utf-8')
+            yield body + b'\n'
+    
+    body = lines()
+    if choose_encoding(request.headers.get('Accept-Encoding')) is not None:
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype='application/x-ndjson', headers=headers)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics of this process: request counts, durations, phases and cache hits."""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/<path:path>')
 def serve_static(path):
     """Serve static files."""
     return send_from_directory('.', path)
 
+def serve_production(host, port, workers, threads, event_streams=None):
+    """Serve the app with gunicorn: several worker processes, each with a thread pool.
+    
+    The app is loaded (and e2.snapshot compiled) once in the master process
+    before the workers are forked, so the workers share the memory-mapped
+    snapshot instead of each parsing e2.xlsx.
+    
+    Each /api/events stream holds one of a worker's threads for as long as
+    the dashboard stays open, so at most event_streams (default half the
+    threads) are accepted per worker; the other threads stay free for API
+    requests and dashboards past the limit poll instead.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        # gunicorn is optional (and not available on Windows)
+        print("gunicorn is not installed (pip3 install gunicorn); "
+              "using the threaded development server without debug mode instead.")
+        app.run(debug=False, host=host, port=port, threaded=True)
+        return
+    
+    # Set before the workers are forked, so every worker inherits the limit
+    notifier.max_subscribers = threads // 2 if event_streams is None else event_streams
+    
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            # Threaded workers, so a long-lived /api/events stream doesn't block a whole process
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('preload_app', True)
+            self.cfg.set('keepalive', 5)
+            self.cfg.set('accesslog', '-')
+        
+        def load(self):
+            return app
+    
+    DashboardApplication().run()
+
 if __name__ == '__main__':
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Serve the electrical boards dashboard.')
+    # Default to 5001 to avoid conflict with macOS AirPlay
+    parser.add_argument('port', nargs='?', type=int, default=5001, help='port to listen on (default 5001)')
+    parser.add_argument('--host', default='0.0.0.0', help='address to bind (default 0.0.0.0)')
+    parser.add_argument('--prod', action='store_true',
+                        help='run under gunicorn with several workers instead of the debug server')
+    parser.add_argument('--workers', type=int, default=(os.cpu_count() or 1) + 1,
+                        help='worker processes in --prod mode (default: CPU count + 1)')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='threads per worker in --prod mode (default 8)')
+    parser.add_argument('--event-streams', type=int,
+                        help='change-notification streams per worker in --prod mode (default: half of '
+                             '--threads); each holds a thread, dashboards past the limit poll instead')
+    args = parser.parse_args()
+    port = args.port
     
-    # Try to get port from command line argument, or use default
-    port = 5001  # Default to 5001 to avoid conflict with macOS AirPlay
-    if len(sys.argv) > 1:
-        try:
-            port = int(sys.argv[1])
-        except ValueError:
-            print(f"Invalid port number: {sys.argv[1]}. Using default port 5001.")
+    # Load the workbook data before serving (instant when e2.snapshot is current)
+    try:
+        workbook_cache.get()
+    except Exception as e:
+        print(f"Warning: could not load e2.xlsx: {e}")
     
     print("Starting dashboard server...")
     print(f"Dashboard will be available at: http://localhost:{port}")
@@ -382,7 +573,11 @@ if __name__ == '__main__':
     print(f"  python3 server.py 8000")
     
     try:
-        app.run(debug=True, host='0.0.0.0', port=port)
+        if args.prod:
+            print(f"Production mode: {args.workers} workers x {args.threads} threads")
+            serve_production(args.host, port, args.workers, args.threads, args.event_streams)
+        else:
+            app.run(debug=True, host=args.host, port=port)
     except OSError as e:
         if "Address already in use" in str(e):
             print(f"\nError: Port {port} is already in use.")
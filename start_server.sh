@@ -1,6 +1,10 @@
 #!/bin/bash
 
 # Dashboard Server Startup Script
+#
+# Usage: ./start_server.sh                         development server (port 5001, or 8000)
+#        ./start_server.sh --prod [--workers N] [--threads M] [port]
+#                                                  multi-process gunicorn server
 
 echo "Starting Dashboard Server..."
 echo ""
@@ -22,6 +26,14 @@ python3 -c "import flask" 2>/dev/null || {
     }
 }
 
+# Production mode needs gunicorn
+if [ "$1" = "--prod" ]; then
+    python3 -c "import gunicorn" 2>/dev/null || {
+        echo "gunicorn not found. Installing..."
+        pip3 install gunicorn || echo "Warning: gunicorn not installed, falling back to the threaded development server"
+    }
+fi
+
 # Check if Excel file exists
 if [ ! -f "e2.xlsx" ]; then
     echo "Warning: e2.xlsx not found in current directory"
@@ -36,6 +48,11 @@ echo "Note: If port 5001 is in use, you can specify a different port:"
 echo "  python3 server.py 8000"
 echo ""
 
+if [ "$1" = "--prod" ]; then
+    python3 server.py "$@"
+    exit $?
+fi
+
 # Try port 5001 first, if it fails, try 8000
 python3 server.py 5001 || python3 server.py 8000
 
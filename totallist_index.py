@@ -0,0 +1,157 @@
+"""
+Index of the TOTALLIST sheet.
+
+TOTALLIST has one row per board: NumTag, KIND, MDB, SMDB, Itemdrop (board
+name), Load, NO OF ITEMS, Estimate. The sheet is read once and every board
+row is turned into a record keyed by its normalized name, so looking up a
+board's kind/mdb/smdb/load is a dictionary access instead of a sheet scan.
+"""
+
+import re
+
+# Column indices (1-based) in the TOTALLIST sheet
+NUMTAG_COL = 1      # Column A
+KIND_COL = 2        # Column B
+MDB_COL = 3         # Column C
+SMDB_COL = 4        # Column D
+ITEMDROP_COL = 5    # Column E (board name)
+LOAD_COL = 6        # Column F
+ITEMS_COL = 7       # Column G (NO OF ITEMS)
+ESTIMATE_COL = 8    # Column H
+
+
+def normalize_board_name(value):
+    """Return the board name as it is used for lookups, or None if blank."""
+    if value is None:
+        return None
+    name = str(value).strip()
+    return name or None
+
+
+def parse_load(value):
+    """Parse a Load cell (number or string with units like "100.5 kW") to a float."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str):
+            # Extract numeric part from string (remove units like "kW", "kVAR", etc.)
+            num_match = re.search(r'[\d,]+\.?\d*', value.replace(',', ''))
+            if num_match:
+                return float(num_match.group())
+            return None
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_load_kw(value):
+    """Parse a Load cell only if it is in kW (plain number or "... kW" string).
+
+    Loads in other units, such as the kVAR rating of power factor correctors,
+    return None so they are left out of kW totals.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace('kW', '').strip())
+        except ValueError:
+            return None
+    return None
+
+
+def _cell(row, col):
+    return row[col - 1] if len(row) >= col else None
+
+
+class TotallistIndex:
+    """Board records from TOTALLIST, in sheet order and indexed by name."""
+
+    def __init__(self, records):
+        self.records = records
+        self._by_name = {}
+        self._by_upper = {}
+        for record in records:
+            # First row wins for duplicated names, as the old linear scans did
+            self._by_name.setdefault(record['name'], record)
+            self._by_upper.setdefault(record['name'].upper(), record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def names(self):
+        """Board names in TOTALLIST order (duplicates included)."""
+        return [record['name'] for record in self.records]
+
+    def names_in_mdb(self, mdb):
+        """Names of the boards fed from a main MDB (MDB column, case-insensitive), in TOTALLIST order."""
+        key = normalize_board_name(mdb)
+        if key is None:
+            return []
+        key = key.upper()
+        return [record['name'] for record in self.records
+                if record['mdb'] is not None and str(record['mdb']).strip().upper() == key]
+
+    def get(self, name):
+        """Return the record for a board name, or None."""
+        key = normalize_board_name(name)
+        if key is None:
+            return None
+        record = self._by_name.get(key)
+        if record is None:
+            record = self._by_upper.get(key.upper())
+        return record
+
+    def metadata(self, name):
+        """Return the kind/mdb/smdb/load metadata dict for a board ({} if unknown)."""
+        record = self.get(name)
+        if record is None:
+            return {}
+        return {
+            'kind': record['kind'],
+            'mdb': record['mdb'],
+            'smdb': record['smdb'],
+            'load': record['load']
+        }
+
+
+def build_totallist_index(ws):
+    """Build a TotallistIndex from the TOTALLIST worksheet in a single pass."""
+    records = []
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+        name = normalize_board_name(_cell(row, ITEMDROP_COL))
+        if name is None:
+            continue
+
+        kind = _cell(row, KIND_COL)
+        mdb = _cell(row, MDB_COL)
+        smdb = _cell(row, SMDB_COL)
+        load = _cell(row, LOAD_COL)
+
+        records.append({
+            'row': row_idx,
+            'name': name,
+            'numtag': _cell(row, NUMTAG_COL),
+            'kind': str(kind).strip() if kind else None,
+            'mdb': str(mdb).strip() if mdb else None,
+            'smdb': str(smdb).strip() if smdb else None,
+            'load': parse_load(load),
+            'load_kw': parse_load_kw(load),
+            'load_raw': load,
+            'items': _cell(row, ITEMS_COL),
+            'estimate': _cell(row, ESTIMATE_COL)
+        })
+    return TotallistIndex(records)
+
+
+def load_totallist_index(wb):
+    """Build the index from a workbook, or return None if it has no TOTALLIST sheet."""
+    if 'TOTALLIST' not in wb.sheetnames:
+        return None
+    return build_totallist_index(wb['TOTALLIST'])
@@ -1,124 +1,125 @@
-import openpyxl
+import argparse
+import zipfile
+from collections import deque
+
 from openpyxl.utils import get_column_letter
+from board_extraction import SUMMARY_WINDOW, find_summary, open_workbook
+from profiling import add_profile_arguments, profiled
+from totallist_index import build_totallist_index, ITEMS_COL, ESTIMATE_COL
+from xlsx_package import replace_parts, set_cell_numbers, sheet_parts
 
-def get_board_total(board_sheet_name, wb):
-    """Get the NET TOTAL value from a board sheet."""
-    try:
-        if board_sheet_name not in wb.sheetnames:
-            return None
-        
-        ws = wb[board_sheet_name]
-        
-        # Find NET TOTAL row (usually near the bottom)
-        for row_idx in range(ws.max_row - 20, ws.max_row + 1):
-            row = ws[row_idx]
-            # Check column C (ITEM column, index 2) for "NET TOTAL"
-            if row[2].value and 'NET TOTAL' in str(row[2].value).upper():
-                # Get value from column F (AMOUNT column, index 5)
-                net_total = row[5].value
-                if net_total is not None:
-                    try:
-                        return float(net_total)
-                    except (ValueError, TypeError):
-                        return None
-        return None
-    except Exception as e:
-        return None
-
-def get_no_of_units(board_sheet_name, wb):
-    """Get the NO OF UNITS value from a board sheet (this is the value for NO OF ITEMS)."""
+def summary_values(summary):
+    """A board's (NET TOTAL, NO OF UNITS) from its extracted summary (either may be None).
+
+    The summary comes from board_extraction.find_summary, so this script and
+    build.py --update-estimates read the footer rows the same way.
+    """
+    summary = summary or {}
+    return summary.get('net_total'), summary.get('no_of_units')
+
+def read_workbook(path):
+    """Stream the workbook once: the TOTALLIST index and the summary of every board sheet."""
+    wb = open_workbook(path)
     try:
-        if board_sheet_name not in wb.sheetnames:
-            return None
-        
-        ws = wb[board_sheet_name]
-        
-        # Find NO OF UNITS row (usually row 156)
-        for row_idx in range(ws.max_row - 20, ws.max_row + 1):
-            row = ws[row_idx]
-            # Check column C (ITEM column, index 2) for "NO OF UNITS"
-            if row[2].value and 'NO OF UNITS' in str(row[2].value).upper():
-                # Get value from column F (AMOUNT column, index 5)
-                no_of_units = row[5].value
-                if no_of_units is not None:
-                    try:
-                        return float(no_of_units)
-                    except (ValueError, TypeError):
-                        return None
-        return None
-    except Exception as e:
-        return None
-
-def update_estimates():
-    """Update the Estimate and NO OF ITEMS columns in TOTALLIST sheet with values from each board sheet."""
-    print("Loading workbook...")
-    wb = openpyxl.load_workbook('e2.xlsx', data_only=True)
-    
-    if 'TOTALLIST' not in wb.sheetnames:
-        print("Error: TOTALLIST sheet not found!")
-        return
-    
-    ws_totallist = wb['TOTALLIST']
-    
-    # Column E is Itemdrop which contains board names (index 4, column 5)
-    board_name_col = 5
-    
-    # Column G is NO OF ITEMS (index 6, column 7)
-    items_col = 7
-    
-    # Column H is Estimate (index 7, column 8)
-    estimate_col = 8
-    
-    print(f"Found {ws_totallist.max_row} rows in TOTALLIST sheet")
-    print(f"Processing rows from 2 to {ws_totallist.max_row}...")
-    
+        if 'TOTALLIST' not in wb.sheetnames:
+            return None, {}
+        index = build_totallist_index(wb['TOTALLIST'])
+        wanted = set(index.names())
+        summaries = {}
+        for name in wb.sheetnames:
+            if name in wanted:
+                tail = deque(wb[name].iter_rows(values_only=True), maxlen=SUMMARY_WINDOW)
+                summaries[name] = find_summary(tail)
+        return index, summaries
+    finally:
+        wb.close()
+
+def estimate_updates(index, board_values):
+    """TOTALLIST cell values to write, e.g. {'H12': 1234.5, 'G12': 2.0}.
+
+    board_values(name) returns a board's (NET TOTAL, NO OF UNITS), either
+    of which may be None.
+    """
+    estimate_col = get_column_letter(ESTIMATE_COL)
+    items_col = get_column_letter(ITEMS_COL)
+    values = {}
     updated_estimates = 0
     updated_items = 0
     not_found_count = 0
-    
-    # Process each row (starting from row 2, row 1 is header)
-    for row_idx in range(2, ws_totallist.max_row + 1):
-        board_name_cell = ws_totallist.cell(row_idx, board_name_col)
-        board_name = board_name_cell.value
-        
-        if not board_name or str(board_name).strip() == '':
-            continue
-        
-        board_name = str(board_name).strip()
-        estimate_cell = ws_totallist.cell(row_idx, estimate_col)
-        items_cell = ws_totallist.cell(row_idx, items_col)
-        
-        # Get the total from the board sheet
-        net_total = get_board_total(board_name, wb)
-        no_of_units = get_no_of_units(board_name, wb)
-        
+
+    # Process each board row (row 1 is header, blank names are skipped by the index)
+    for record in index:
+        row_idx = record['row']
+        board_name = record['name']
+        net_total, no_of_units = board_values(board_name)
+
         if net_total is not None:
-            estimate_cell.value = net_total
+            values[f'{estimate_col}{row_idx}'] = net_total
             updated_estimates += 1
-        
+
         if no_of_units is not None:
-            items_cell.value = no_of_units
+            values[f'{items_col}{row_idx}'] = no_of_units
             updated_items += 1
-        
+
         if net_total is None and no_of_units is None:
             not_found_count += 1
             if not_found_count <= 5:  # Show first 5 warnings
                 print(f"  Row {row_idx}: Could not find data for board '{board_name}'")
-        
-        if (updated_estimates + updated_items) % 20 == 0:
-            print(f"  Processed {row_idx - 1} rows...")
-    
+
     print(f"\nSummary:")
     print(f"  Successfully updated estimates: {updated_estimates} rows")
     print(f"  Successfully updated NO OF ITEMS: {updated_items} rows")
     print(f"  Not found/errors: {not_found_count} rows")
-    
-    # Save the workbook
+    return values
+
+def patch_totallist(path, values):
+    """Write values into the TOTALLIST worksheet inside the zip; returns the refs kept as formulas."""
+    with zipfile.ZipFile(path) as zf:
+        member = sheet_parts(zf)['TOTALLIST']
+        xml, skipped = set_cell_numbers(zf.read(member), values)
+    for ref in skipped:
+        print(f"  Kept formula in TOTALLIST!{ref}")
+    replace_parts(path, {member: xml})
+    return skipped
+
+def apply_updates(index, values, skipped=()):
+    """Copy the written values into the index records, as a reader would see the patched sheet."""
+    estimate_col = get_column_letter(ESTIMATE_COL)
+    items_col = get_column_letter(ITEMS_COL)
+    for record in index:
+        for column, field in ((estimate_col, 'estimate'), (items_col, 'items')):
+            ref = f"{column}{record['row']}"
+            if ref in values and ref not in skipped:
+                value = values[ref]
+                # Whole numbers are written without a decimal point and read back as int
+                record[field] = int(value) if isinstance(value, float) and value.is_integer() else value
+
+def update_estimates(path='e2.xlsx'):
+    """Update the Estimate and NO OF ITEMS columns in TOTALLIST sheet with values from each board sheet.
+
+    Only the TOTALLIST worksheet inside the .xlsx is patched; every other part
+    of the file (and every formula) is left exactly as it was.
+    """
+    print("Reading workbook...")
+    index, summaries = read_workbook(path)
+
+    if index is None:
+        print("Error: TOTALLIST sheet not found!")
+        return
+
+    print(f"Processing {len(index)} boards listed in TOTALLIST...")
+
+    values = estimate_updates(index, lambda board_name: summary_values(summaries.get(board_name)))
+
+    # Patch the TOTALLIST worksheet inside the zip
     print("\nSaving workbook...")
-    wb.save('e2.xlsx')
+    patch_totallist(path, values)
     print("Done! Estimates and NO OF ITEMS have been updated in the TOTALLIST sheet.")
 
 if __name__ == '__main__':
-    update_estimates()
-
-
+    parser = argparse.ArgumentParser(description='Update TOTALLIST Estimate and NO OF ITEMS from the board sheets')
+    parser.add_argument('path', nargs='?', default='e2.xlsx', help='workbook to update (default e2.xlsx)')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profiled(args, 'update_estimates'):
+        update_estimates(args.path)
@@ -0,0 +1,104 @@
+"""
+Thread-safe in-process cache for the parsed e2.xlsx workbook.
+
+The cache is keyed on the file's size and modification time. When either
+changes, the file contents are hashed: a touch that leaves the bytes
+untouched keeps the cached value, anything else triggers exactly one reload
+no matter how many requests arrive while it is running.
+"""
+
+import hashlib
+import os
+import threading
+from datetime import datetime
+
+import openpyxl
+
+import metrics
+
+
+def file_signature(path):
+    """Return a cheap (size, mtime_ns) signature for a file."""
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_workbook_values(path, content_hash=None):
+    """Default loader: the workbook with cached formula values."""
+    return openpyxl.load_workbook(path, data_only=True)
+
+
+class CacheEntry:
+    """One loaded version of the workbook."""
+
+    def __init__(self, value, version, modified):
+        self.value = value
+        self.version = version      # SHA-256 of the file contents
+        self.modified = modified    # file modification time when it was loaded
+
+
+class WorkbookCache:
+    """Holds one parsed copy of a workbook and reloads it only when it changes.
+
+    loader(path, content_hash) is given the SHA-256 the cache just took, which
+    becomes the entry's version, so a loader that keys anything on the file's
+    contents (see workbook_snapshot.py) uses the same hash instead of a second read.
+    """
+
+    def __init__(self, path, loader=load_workbook_values):
+        self.path = path
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._entry = None
+        self._signature = None
+
+    @property
+    def version(self):
+        """Content hash of the currently cached workbook (None before first load)."""
+        entry = self._entry
+        return entry.version if entry is not None else None
+
+    def get(self):
+        """Return the cached value, reloading it first if the file has changed."""
+        return self.get_entry().value
+
+    def get_entry(self):
+        """Return the current CacheEntry (value plus version), reloading if needed."""
+        signature = file_signature(self.path)
+        entry = self._entry
+        if entry is not None and signature == self._signature:
+            metrics.cache('workbook', True)
+            return entry
+
+        # Single flight: the first caller reloads, everyone else waits for it
+        # and then finds the signature already up to date.
+        with self._lock:
+            signature = file_signature(self.path)
+            if self._entry is not None and signature == self._signature:
+                metrics.cache('workbook', True)
+                return self._entry
+
+            content_hash = file_hash(self.path)
+            reload = self._entry is None or content_hash != self._entry.version
+            metrics.cache('workbook', not reload)
+            if reload:
+                value = self.loader(self.path, content_hash)
+                modified = datetime.fromtimestamp(signature[1] / 1e9)
+                self._entry = CacheEntry(value, content_hash, modified)
+            self._signature = signature
+            return self._entry
+
+    def invalidate(self):
+        """Drop the cached value so the next get() reloads the file."""
+        with self._lock:
+            self._entry = None
+            self._signature = None
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Compiled binary snapshot of e2.xlsx.
+
+Parsing the workbook with openpyxl takes seconds. This module "compiles" the
+extracted data (TOTALLIST index, every sheet's item rows and summary) into a
+compact column-oriented file, e2.snapshot, that the server memory-maps at
+startup instead. The snapshot records the SHA-256 of the workbook it was
+built from, the reader it was extracted with and board_extraction's
+EXTRACTION_VERSION, and is ignored (and rebuilt) as soon as e2.xlsx, the
+reader (E2_XLSX_READER) or the extraction code changes.
+
+File layout (native byte order, every section 8-byte aligned):
+
+    MAGIC | uint32 header length | JSON header | sections...
+
+The JSON header describes the source workbook and the offset, length and
+array typecode of every section. Strings (board names, headers, brands,
+items, ...) are stored once in a string table and referenced by id. Cell
+values are stored as two parallel columns: a type tag and a float64 payload
+that holds the number itself or the string id.
+
+Usage: python3 workbook_snapshot.py [e2.xlsx] [e2.snapshot]
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from board_extraction import DEFAULT_READER, EXTRACTION_VERSION, WorkbookData, load_workbook_data
+from metrics import phase
+from totallist_index import TotallistIndex
+from workbook_cache import file_hash
+
+MAGIC = b'E2SNAP\x00\x01'
+FORMAT_VERSION = 1
+
+# Cell value type tags
+TAG_NONE = 0
+TAG_INT = 1
+TAG_FLOAT = 2
+TAG_STR = 3
+TAG_BOOL = 4
+TAG_DATETIME = 5
+
+NO_STRING = -1
+MISSING = float('nan')
+
+# TOTALLIST record fields stored as value columns (tag + payload)
+TOTALLIST_VALUE_FIELDS = ['numtag', 'load_raw', 'items', 'estimate']
+# TOTALLIST record fields stored as optional string ids
+TOTALLIST_STRING_FIELDS = ['kind', 'mdb', 'smdb']
+
+
+def default_snapshot_path(source_path):
+    """Snapshot path used for a workbook (e2.xlsx -> e2.snapshot)."""
+    return os.path.splitext(source_path)[0] + '.snapshot'
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def add(self, value):
+        if value is None:
+            return NO_STRING
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+
+class _ValueColumn:
+    """Builds the tag/payload arrays for mixed-type cell values."""
+
+    def __init__(self, strings):
+        self.strings = strings
+        self.tags = array('b')
+        self.nums = array('d')
+
+    def append(self, value):
+        if value is None:
+            self.tags.append(TAG_NONE)
+            self.nums.append(0.0)
+        elif isinstance(value, bool):
+            self.tags.append(TAG_BOOL)
+            self.nums.append(float(value))
+        elif isinstance(value, int):
+            self.tags.append(TAG_INT)
+            self.nums.append(float(value))
+        elif isinstance(value, float):
+            self.tags.append(TAG_FLOAT)
+            self.nums.append(value)
+        elif isinstance(value, datetime):
+            self.tags.append(TAG_DATETIME)
+            self.nums.append(float(self.strings.add(value.isoformat())))
+        else:
+            self.tags.append(TAG_STR)
+            self.nums.append(float(self.strings.add(str(value))))
+
+
+def compile_snapshot(data, source_path, snapshot_path=None, source_hash=None, reader=None):
+    """Write the extracted WorkbookData to a snapshot file tagged with the source's hash.
+
+    Pass the hash taken before the workbook was parsed, so a snapshot never
+    claims a newer version of the file than the data it holds, and the reader
+    the data was extracted with.
+    """
+    snapshot_path = snapshot_path or default_snapshot_path(source_path)
+    if source_hash is None:
+        source_hash = file_hash(source_path)
+    strings = _StringTable()
+    sections = {}
+
+    # TOTALLIST, one array per column
+    records = data.index.records if data.index is not None else []
+    sections['tl_row'] = array('i', [r['row'] for r in records])
+    sections['tl_name'] = array('i', [strings.add(r['name']) for r in records])
+    for field in TOTALLIST_STRING_FIELDS:
+        sections[f'tl_{field}'] = array('i', [strings.add(r[field]) for r in records])
+    for field in ['load', 'load_kw']:
+        sections[f'tl_{field}'] = array('d', [MISSING if r[field] is None else r[field] for r in records])
+    for field in TOTALLIST_VALUE_FIELDS:
+        column = _ValueColumn(strings)
+        for r in records:
+            column.append(r[field])
+        sections[f'tl_{field}_tag'] = column.tags
+        sections[f'tl_{field}_num'] = column.nums
+
+    # Sheets: per-sheet item tables stored column by column
+    sheet_name = array('i')
+    sheet_col_start = array('I')
+    sheet_ncols = array('I')
+    sheet_cell_start = array('Q')
+    sheet_nrows = array('I')
+    sheet_net_total = array('d')
+    sheet_units = array('d')
+    col_headers = array('i')
+    cells = _ValueColumn(strings)
+    for name in data.sheet_names():
+        sheet = data.sheet(name)
+        items = sheet['items']
+        headers = list(items[0]) if items else []
+        sheet_name.append(strings.add(name))
+        sheet_col_start.append(len(col_headers))
+        sheet_ncols.append(len(headers))
+        sheet_cell_start.append(len(cells.tags))
+        sheet_nrows.append(len(items))
+        summary = sheet['summary']
+        sheet_net_total.append(summary.get('net_total', MISSING))
+        sheet_units.append(summary.get('no_of_units', MISSING))
+        for header in headers:
+            col_headers.append(strings.add(header))
+            for item in items:
+                cells.append(item[header])
+    sections.update({
+        'sheet_name': sheet_name,
+        'sheet_col_start': sheet_col_start,
+        'sheet_ncols': sheet_ncols,
+        'sheet_cell_start': sheet_cell_start,
+        'sheet_nrows': sheet_nrows,
+        'sheet_net_total': sheet_net_total,
+        'sheet_units': sheet_units,
+        'col_headers': col_headers,
+        'cell_tag': cells.tags,
+        'cell_num': cells.nums,
+    })
+
+    # String table: end offsets into one UTF-8 blob
+    blob = bytearray()
+    string_ends = array('Q')
+    for value in strings.strings:
+        blob += value.encode('utf-8')
+        string_ends.append(len(blob))
+    sections['string_ends'] = string_ends
+
+    st = os.stat(source_path)
+    header = {
+        'format': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'source': {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': source_hash
+        },
+        'reader': reader or DEFAULT_READER,
+        'extraction': EXTRACTION_VERSION,
+        'has_totallist': data.index is not None,
+        'sections': {}
+    }
+
+    # Lay the sections out after the header, 8-byte aligned
+    payloads = [(name, section.typecode, section.tobytes()) for name, section in sections.items()]
+    payloads.append(('string_data', 'B', bytes(blob)))
+    # The header holds the section offsets, which depend on the header's own
+    # size: reserve room for it and grow the reservation until it fits
+    prefix = len(MAGIC) + 4
+    reserved = _align(prefix + 1024)
+    while True:
+        offset = reserved
+        for name, typecode, payload in payloads:
+            header['sections'][name] = [offset, len(payload), typecode]
+            offset = _align(offset + len(payload))
+        header_bytes = json.dumps(header).encode('utf-8')
+        if prefix + len(header_bytes) <= reserved:
+            header_bytes += b' ' * (reserved - prefix - len(header_bytes))
+            break
+        reserved = _align(prefix + len(header_bytes) + 1024)
+
+    tmp_path = f'{snapshot_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('=I', len(header_bytes)))
+            f.write(header_bytes)
+            for name, _, payload in payloads:
+                f.seek(header['sections'][name][0])
+                f.write(payload)
+        os.replace(tmp_path, snapshot_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return snapshot_path
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class SnapshotData(WorkbookData):
+    """WorkbookData served from a memory-mapped snapshot.
+
+    The TOTALLIST index is rebuilt from its columns when the snapshot is
+    opened; sheet item tables are decoded from the mapped arrays only when a
+    sheet is requested.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        if bytes(buf[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f'{path} is not a workbook snapshot')
+        (header_len,) = struct.unpack_from('=I', buf, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(buf[start:start + header_len]))
+        if self.header.get('format') != FORMAT_VERSION or self.header.get('byteorder') != sys.byteorder:
+            raise ValueError(f'{path} was written by an incompatible snapshot format')
+
+        self._arrays = {}
+        for name, (offset, length, typecode) in self.header['sections'].items():
+            view = buf[offset:offset + length]
+            self._arrays[name] = view if typecode == 'B' else view.cast(typecode)
+        self._strings = [None] * len(self._arrays['string_ends'])
+
+        index = self._load_index() if self.header['has_totallist'] else None
+        names = self._arrays['sheet_name']
+        self._sheet_positions = {self._string(names[i]): i for i in range(len(names))}
+        super().__init__(index, {})
+
+    @property
+    def source(self):
+        """Size, mtime and SHA-256 of the workbook the snapshot was built from."""
+        return self.header['source']
+
+    def _string(self, string_id):
+        if string_id == NO_STRING:
+            return None
+        value = self._strings[string_id]
+        if value is None:
+            ends = self._arrays['string_ends']
+            start = ends[string_id - 1] if string_id else 0
+            value = bytes(self._arrays['string_data'][start:ends[string_id]]).decode('utf-8')
+            self._strings[string_id] = value
+        return value
+
+    def _value(self, tag, num):
+        if tag == TAG_NONE:
+            return None
+        if tag == TAG_INT:
+            return int(num)
+        if tag == TAG_FLOAT:
+            return num
+        if tag == TAG_BOOL:
+            return bool(num)
+        if tag == TAG_DATETIME:
+            return datetime.fromisoformat(self._string(int(num)))
+        return self._string(int(num))
+
+    def _load_index(self):
+        a = self._arrays
+        records = []
+        for i in range(len(a['tl_row'])):
+            record = {'row': a['tl_row'][i], 'name': self._string(a['tl_name'][i])}
+            for field in TOTALLIST_VALUE_FIELDS:
+                record[field] = self._value(a[f'tl_{field}_tag'][i], a[f'tl_{field}_num'][i])
+            for field in TOTALLIST_STRING_FIELDS:
+                record[field] = self._string(a[f'tl_{field}'][i])
+            for field in ['load', 'load_kw']:
+                value = a[f'tl_{field}'][i]
+                record[field] = None if math.isnan(value) else value
+            records.append(record)
+        return TotallistIndex(records)
+
+    def sheet_names(self):
+        return list(self._sheet_positions)
+
+    def has_sheet(self, name):
+        return name in self._sheet_positions
+
+    def sheet(self, name):
+        i = self._sheet_positions.get(name)
+        if i is None:
+            return None
+        a = self._arrays
+        nrows = a['sheet_nrows'][i]
+        col_start = a['sheet_col_start'][i]
+        cell_start = a['sheet_cell_start'][i]
+        headers = [self._string(a['col_headers'][col_start + j]) for j in range(a['sheet_ncols'][i])]
+
+        items = [{} for _ in range(nrows)]
+        tags = a['cell_tag']
+        nums = a['cell_num']
+        for j, header in enumerate(headers):
+            base = cell_start + j * nrows
+            for r in range(nrows):
+                items[r][header] = self._value(tags[base + r], nums[base + r])
+
+        summary = {}
+        if not math.isnan(a['sheet_net_total'][i]):
+            summary['net_total'] = a['sheet_net_total'][i]
+        if not math.isnan(a['sheet_units'][i]):
+            summary['no_of_units'] = a['sheet_units'][i]
+        return {'items': items, 'summary': summary}
+
+
+def open_snapshot(source_path, snapshot_path=None, source_hash=None, reader=None):
+    """Open the snapshot for a workbook, or return None if it is missing, unreadable or stale.
+
+    Stale means built from other bytes, with another reader or by an older
+    version of the extraction code.
+    """
+    snapshot_path = snapshot_path or default_snapshot_path(source_path)
+    try:
+        data = SnapshotData(snapshot_path)
+    except (OSError, ValueError, KeyError):
+        return None
+    if source_hash is None:
+        source_hash = file_hash(source_path)
+    if (data.source['sha256'] != source_hash
+            or data.header.get('reader') != (reader or DEFAULT_READER)
+            or data.header.get('extraction') != EXTRACTION_VERSION):
+        return None
+    return data
+
+
+@contextmanager
+def rebuild_lock(snapshot_path):
+    """Exclusive lock across processes while a snapshot is rebuilt.
+
+    Server worker processes that notice a new workbook at the same time wait
+    for the first one to compile the snapshot and then map it, instead of
+    each parsing e2.xlsx. A no-op where fcntl is not available.
+    """
+    if fcntl is None:
+        yield
+        return
+    try:
+        f = open(f'{snapshot_path}.lock', 'a')
+    except OSError:
+        yield
+        return
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_workbook_data_snapshot(path, source_hash=None, snapshot_path=None, reader=None):
+    """Loader for WorkbookCache: use the snapshot if it is current, else parse and recompile it.
+
+    source_hash is the hash WorkbookCache versions the entry with; hashing the
+    file again here could describe different bytes if it was written in between.
+    """
+    snapshot_path = snapshot_path or default_snapshot_path(path)
+    if source_hash is None:
+        source_hash = file_hash(path)
+    with phase('snapshot'):
+        data = open_snapshot(path, snapshot_path, source_hash, reader)
+    if data is not None:
+        return data
+
+    with rebuild_lock(snapshot_path):
+        # Another process may have compiled it while we waited for the lock
+        data = open_snapshot(path, snapshot_path, source_hash, reader)
+        if data is not None:
+            return data
+
+        data = load_workbook_data(path, reader)
+        try:
+            with phase('snapshot compile'):
+                compile_snapshot(data, path, snapshot_path, source_hash, reader)
+        except OSError as e:
+            print(f"Warning: could not write workbook snapshot: {e}")
+        return data
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else 'e2.xlsx'
+    target = sys.argv[2] if len(sys.argv) > 2 else default_snapshot_path(source)
+    print(f"Extracting {source}...")
+    written = compile_snapshot(load_workbook_data(source), source, target)
+    print(f"Snapshot written to {written} ({os.path.getsize(written):,} bytes)")
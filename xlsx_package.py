@@ -0,0 +1,210 @@
+"""
+Low-level access to the parts inside an .xlsx file.
+
+An .xlsx workbook is a zip archive: xl/workbook.xml lists the sheets, its
+relationships file maps each sheet to an xl/worksheets/sheetN.xml part, and
+xl/sharedStrings.xml holds strings that cells refer to by index. These
+helpers read that structure directly, without going through openpyxl, for
+jobs that only need to know which sheets changed, and patch single cells of
+a sheet without rewriting (and losing the formulas of) the whole workbook.
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+# Cells holding a shared string: <c ... t="s" ...><v>12</v></c>
+SHARED_STRING_CELL = re.compile(rb'<c\b[^>]*\bt="s"[^>]*>\s*<v>(\d+)</v>')
+
+# Row and cell elements of a worksheet, self-closing or not
+ROW_ELEMENT = re.compile(rb'<row\b([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+CELL_ELEMENT = re.compile(rb'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+ATTRIBUTE = re.compile(rb'([\w:]+)="([^"]*)"')
+CELL_REF = re.compile(r'([A-Z]+)(\d+)')
+
+
+def _resolve_target(target):
+    """Turn a relationship target into a zip member name."""
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join('xl', target))
+
+
+def sheet_parts(zf):
+    """Return {sheet name: zip member name} in workbook order."""
+    rels = ET.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    targets = {
+        rel.get('Id'): _resolve_target(rel.get('Target'))
+        for rel in rels.iter(f'{{{PKG_REL_NS}}}Relationship')
+    }
+
+    workbook = ET.fromstring(zf.read('xl/workbook.xml'))
+    parts = {}
+    for sheet in workbook.iter(f'{{{MAIN_NS}}}sheet'):
+        rel_id = sheet.get(f'{{{REL_NS}}}id')
+        if rel_id in targets:
+            parts[sheet.get('name')] = targets[rel_id]
+    return parts
+
+
+def shared_strings(zf):
+    """Return the shared string table as a list (empty if the workbook has none)."""
+    try:
+        data = zf.read('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    strings = []
+    for si in ET.fromstring(data).iter(f'{{{MAIN_NS}}}si'):
+        # Rich text is split over several <t> runs; phonetic hints (rPh) are not part of the value
+        text = ''.join(
+            t.text or ''
+            for run in [si] + list(si.iter(f'{{{MAIN_NS}}}r'))
+            for t in run.findall(f'{{{MAIN_NS}}}t')
+        )
+        strings.append(text)
+    return strings
+
+
+def hash_sheet_xml(xml, strings):
+    """Hash a sheet's XML together with the text of the shared strings it uses.
+
+    Shared string indexes can point at different text after Excel rewrites
+    the string table, so the resolved text is hashed instead of trusting the
+    index alone.
+    """
+    digest = hashlib.sha1(xml)
+    for match in SHARED_STRING_CELL.finditer(xml):
+        idx = int(match.group(1))
+        text = strings[idx] if idx < len(strings) else ''
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def sheet_hashes(path, names=None):
+    """Return {sheet name: content hash} for every sheet (or only the given names)."""
+    with zipfile.ZipFile(path) as zf:
+        parts = sheet_parts(zf)
+        strings = None
+        hashes = {}
+        for name, member in parts.items():
+            if names is not None and name not in names:
+                continue
+            xml = zf.read(member)
+            if strings is None:
+                strings = shared_strings(zf)
+            hashes[name] = hash_sheet_xml(xml, strings)
+        return hashes
+
+
+def column_index(letters):
+    """1-based column number of a column name (A -> 1, AA -> 27)."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index
+
+
+def _attributes(raw):
+    return {name.decode(): value.decode() for name, value in ATTRIBUTE.findall(raw)}
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _number_cell(ref, attrs, value):
+    """A numeric <c> element keeping the cell's style."""
+    kept = ''.join(f' {name}="{val}"' for name, val in attrs.items() if name not in ('r', 't'))
+    return f'<c r="{ref}"{kept}><v>{_format_number(value)}</v></c>'.encode()
+
+
+def _patch_row(row_number, attrs_raw, body, columns):
+    """Rewrite one <row>, setting the cells in columns {column letters: value}."""
+    cells = []
+    for match in CELL_ELEMENT.finditer(body or b''):
+        attrs = _attributes(match.group(1))
+        letters = CELL_REF.match(attrs.get('r', '')).group(1)
+        cells.append([column_index(letters), letters, attrs, match.group(0)])
+
+    skipped = []
+    for letters, value in columns.items():
+        ref = f'{letters}{row_number}'
+        existing = next((cell for cell in cells if cell[1] == letters), None)
+        if existing is None:
+            cells.append([column_index(letters), letters, {}, _number_cell(ref, {}, value)])
+        elif b'<f' in existing[3]:
+            # Never replace a formula with a constant
+            skipped.append(ref)
+        else:
+            existing[3] = _number_cell(ref, existing[2], value)
+    cells.sort(key=lambda cell: cell[0])
+    return b'<row' + attrs_raw + b'>' + b''.join(cell[3] for cell in cells) + b'</row>', skipped
+
+
+def set_cell_numbers(xml, values):
+    """Set numeric cell values in a worksheet's XML.
+
+    values maps cell references ('H12') to numbers. Every other byte of the
+    sheet is left as it is; cells holding a formula are not touched. Returns
+    (new xml, references of the formula cells that were skipped).
+    """
+    by_row = {}
+    for ref, value in values.items():
+        letters, row = CELL_REF.fullmatch(ref).groups()
+        by_row.setdefault(int(row), {})[letters] = value
+
+    skipped = []
+    pieces = []
+    last = 0
+    for match in ROW_ELEMENT.finditer(xml):
+        row_number = int(_attributes(match.group(1)).get('r', 0))
+        if row_number not in by_row:
+            continue
+        attrs_raw = match.group(1).rstrip(b' /')
+        row_xml, row_skipped = _patch_row(row_number, attrs_raw, match.group(2), by_row.pop(row_number))
+        skipped.extend(row_skipped)
+        pieces.extend([xml[last:match.start()], row_xml])
+        last = match.end()
+    pieces.append(xml[last:])
+    xml = b''.join(pieces)
+
+    if by_row and b'</sheetData>' not in xml:
+        raise ValueError('Worksheet has no rows to patch')
+    if by_row:
+        # Rows that don't exist yet: insert them in order
+        for row_number in sorted(by_row):
+            row_xml, _ = _patch_row(row_number, f' r="{row_number}"'.encode(), b'', by_row[row_number])
+            following = next((m for m in ROW_ELEMENT.finditer(xml)
+                              if int(_attributes(m.group(1)).get('r', 0)) > row_number), None)
+            at = following.start() if following else xml.rfind(b'</sheetData>')
+            xml = xml[:at] + row_xml + xml[at:]
+    return xml, skipped
+
+
+def replace_parts(path, parts):
+    """Rewrite an .xlsx with some zip members replaced ({member name: bytes}).
+
+    Every other member is copied unchanged, with its original name, order,
+    timestamp and compression. The file is replaced atomically.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with zipfile.ZipFile(path) as src, zipfile.ZipFile(tmp_path, 'w') as dst:
+            for info in src.infolist():
+                data = parts[info.filename] if info.filename in parts else src.read(info)
+                dst.writestr(info, data, compress_type=info.compress_type)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
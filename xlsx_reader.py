@@ -0,0 +1,316 @@
+"""
+Lightweight read-only .xlsx reader producing plain value tuples.
+
+The extraction code only needs cell values, but openpyxl builds cell, style
+and worksheet objects for every row it reads. This reader opens the zip
+directly, loads the shared string table and number formats once, and streams
+each xl/worksheets/sheetN.xml into tuples of values with ElementTree's
+iterparse, clearing every <row> once it is read, so a sheet's cells are
+never all in memory at once.
+
+It mimics the subset of openpyxl's read-only API that the extraction code
+uses (sheetnames, worksheets, wb[name], ws.title, ws.iter_rows(...,
+values_only=True), close()) and returns the same values: the same row
+padding, int/float/str/bool types, dates for date-formatted numbers, and
+cached results for formula cells.
+"""
+
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.cell import column_index_from_string, range_boundaries
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+from xlsx_package import MAIN_NS, sheet_parts
+
+ROW_TAG = f'{{{MAIN_NS}}}row'
+CELL_TAG = f'{{{MAIN_NS}}}c'
+VALUE_TAG = f'{{{MAIN_NS}}}v'
+FORMULA_TAG = f'{{{MAIN_NS}}}f'
+INLINE_STRING_TAG = f'{{{MAIN_NS}}}is'
+TEXT_TAG = f'{{{MAIN_NS}}}t'
+RUN_TAG = f'{{{MAIN_NS}}}r'
+DIMENSION_REF = re.compile(rb'<(?:\w+:)?dimension\b[^>]*\bref="([^"]+)"')
+HEAD_CHUNK = 4096
+
+
+def _cast_number(value):
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+def _text_content(element):
+    """Text of a string item (<si> or <is>): its <t> plus the <t> of its rich text runs."""
+    parts = [t.text or '' for t in element.findall(TEXT_TAG)]
+    for run in element.findall(RUN_TAG):
+        parts.extend(t.text or '' for t in run.findall(TEXT_TAG))
+    return ''.join(parts)
+
+
+def read_shared_strings(zf):
+    try:
+        source = zf.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    strings = []
+    with source:
+        for _, element in ET.iterparse(source):
+            if element.tag == f'{{{MAIN_NS}}}si':
+                strings.append(_text_content(element).replace('x005F_', ''))
+                element.clear()
+    return strings
+
+
+def read_date_styles(zf):
+    """Indexes of the cell styles (cellXfs) whose number format is a date."""
+    try:
+        styles = ET.fromstring(zf.read('xl/styles.xml'))
+    except KeyError:
+        return set()
+    custom = {
+        int(fmt.get('numFmtId')): fmt.get('formatCode')
+        for fmt in styles.iter(f'{{{MAIN_NS}}}numFmt')
+    }
+    date_styles = set()
+    cell_xfs = styles.find(f'{{{MAIN_NS}}}cellXfs')
+    for idx, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+        fmt_id = int(xf.get('numFmtId', 0))
+        fmt = custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+        if fmt is not None and is_date_format(fmt):
+            date_styles.add(idx)
+    return date_styles
+
+
+def read_epoch(zf):
+    workbook = ET.fromstring(zf.read('xl/workbook.xml'))
+    pr = workbook.find(f'{{{MAIN_NS}}}workbookPr')
+    if pr is not None and pr.get('date1904') in ('1', 'true'):
+        return CALENDAR_MAC_1904
+    return CALENDAR_WINDOWS_1900
+
+
+class XmlWorksheet:
+    """One worksheet, streamed from its XML part on every iter_rows() call."""
+
+    def __init__(self, workbook, title, member):
+        self.parent = workbook
+        self.title = title
+        self._member = member
+        self._bounds = None
+
+    def _read_bounds(self):
+        """Note the sheet's <dimension>, read from the XML before <sheetData>."""
+        head = b''
+        with self.parent._archive.open(self._member) as source:
+            while b'<sheetData' not in head:
+                chunk = source.read(HEAD_CHUNK)
+                if not chunk:
+                    break
+                head += chunk
+        match = DIMENSION_REF.search(head, 0, max(head.find(b'<sheetData'), 0))
+        self._bounds = range_boundaries(match.group(1).decode()) if match else (1, 1, None, None)
+
+    @property
+    def max_row(self):
+        if self._bounds is None:
+            self._read_bounds()
+        return self._bounds[3]
+
+    @property
+    def max_column(self):
+        if self._bounds is None:
+            self._read_bounds()
+        return self._bounds[2]
+
+    def _parse_rows(self, formulas=None):
+        """Yield (row number, [(column, value), ...]) for every <row> in the sheet.
+
+        With a formulas dict, the <f> element of every formula cell is also
+        stored in it under (row, column) (see formula_engine.py).
+        """
+        strings = self.parent.shared_strings
+        date_styles = self.parent.date_styles
+        epoch = self.parent.epoch
+        columns = self.parent._columns
+        with self.parent._archive.open(self._member) as source:
+            row_number = 0
+            for _, row in ET.iterparse(source):
+                if row.tag != ROW_TAG:
+                    continue
+                r = row.get('r')
+                row_number = int(float(r)) if r is not None else row_number + 1
+                cells = []
+                column = 0
+                for cell in row:
+                    if cell.tag != CELL_TAG:
+                        continue
+                    ref = cell.get('r')
+                    if ref:
+                        letters = ref.rstrip('0123456789')
+                        column = columns.get(letters)
+                        if column is None:
+                            column = columns[letters] = column_index_from_string(letters)
+                    else:
+                        column += 1
+                    if formulas is not None:
+                        formula = cell.find(FORMULA_TAG)
+                        if formula is not None:
+                            formulas[(row_number, column)] = formula
+                    data_type = cell.get('t', 'n')
+                    if data_type == 'inlineStr':
+                        inline = cell.find(INLINE_STRING_TAG)
+                        value = _text_content(inline) if inline is not None else None
+                    else:
+                        value = cell.findtext(VALUE_TAG) or None
+                        if value is not None:
+                            if data_type == 'n':
+                                value = _cast_number(value)
+                                style = cell.get('s')
+                                if style and int(style) in date_styles:
+                                    try:
+                                        value = from_excel(value, epoch)
+                                    except (OverflowError, ValueError):
+                                        value = '#VALUE!'
+                            elif data_type == 's':
+                                value = strings[int(value)]
+                            elif data_type == 'b':
+                                value = bool(int(value))
+                            elif data_type == 'd':
+                                value = from_ISO8601(value)
+                    cells.append((column, value))
+                # Free the row's cells: only the row being read is kept in memory
+                row.clear()
+                yield row_number, cells
+
+    def iter_rows(self, min_row=None, max_row=None, min_col=None, max_col=None, values_only=True):
+        """Rows as tuples of values, padded the way openpyxl's read-only worksheets pad them."""
+        if not values_only:
+            raise ValueError('XmlWorksheet only supports values_only=True')
+        min_col = min_col or 1
+        min_row = min_row or 1
+        max_col = max_col or self.max_column
+        max_row = max_row or self.max_row
+        empty_row = (None,) * (max_col + 1 - min_col) if max_col is not None else ()
+
+        counter = min_row
+        row_number = 1
+        for row_number, cells in self._parse_rows():
+            if max_row is not None and row_number > max_row:
+                break
+            # Rows missing from the XML come back empty
+            for _ in range(counter, row_number):
+                counter += 1
+                yield empty_row
+            if counter <= row_number:
+                counter += 1
+                yield self._row_values(cells, min_col, max_col)
+
+        if max_row is not None and max_row < row_number:
+            for _ in range(counter, max_row + 1):
+                yield empty_row
+
+    @staticmethod
+    def _row_values(cells, min_col, max_col):
+        if not cells and not max_col:
+            return ()
+        max_col = max_col or cells[-1][0]
+        values = [None] * (max_col + 1 - min_col)
+        for column, value in cells:
+            if min_col <= column <= max_col:
+                values[column - min_col] = value
+        return tuple(values)
+
+    @property
+    def values(self):
+        return self.iter_rows(values_only=True)
+
+    def cells(self, formulas=None):
+        """(row number, [(column, value), ...]) of every row, collecting <f> elements into formulas."""
+        return self._parse_rows(formulas)
+
+
+class XmlWorkbook:
+    """Read-only workbook: sheet names, shared strings and styles are loaded once."""
+
+    worksheet_class = XmlWorksheet
+
+    def __init__(self, path):
+        self._archive = zipfile.ZipFile(path)
+        try:
+            parts = sheet_parts(self._archive)
+            self.shared_strings = read_shared_strings(self._archive)
+            self.date_styles = read_date_styles(self._archive)
+            self.epoch = read_epoch(self._archive)
+            self._columns = {}
+        except BaseException:
+            self._archive.close()
+            raise
+        # Chartsheets have no cells; openpyxl does not list them as worksheets either
+        self._sheets = {
+            name: self.worksheet_class(self, name, member)
+            for name, member in parts.items() if '/worksheets/' in member
+        }
+
+    @property
+    def sheetnames(self):
+        return list(self._sheets)
+
+    @property
+    def worksheets(self):
+        return list(self._sheets.values())
+
+    def __getitem__(self, name):
+        try:
+            return self._sheets[name]
+        except KeyError:
+            raise KeyError(f'Worksheet {name} does not exist.')
+
+    def __contains__(self, name):
+        return name in self._sheets
+
+    def close(self):
+        self._archive.close()
+
+
+def load_workbook(path):
+    """Open an .xlsx for streaming cell values (drop-in for openpyxl's read_only, data_only mode)."""
+    return XmlWorkbook(path)
+
+
+def compare_with_openpyxl(path):
+    """Read every sheet with both readers; return the names of sheets that differ."""
+    import openpyxl
+
+    timings = {}
+    started = time.perf_counter()
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    expected = {ws.title: list(ws.iter_rows(values_only=True)) for ws in wb.worksheets}
+    wb.close()
+    timings['openpyxl'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    wb = load_workbook(path)
+    actual = {ws.title: list(ws.iter_rows(values_only=True)) for ws in wb.worksheets}
+    wb.close()
+    timings['xml'] = time.perf_counter() - started
+
+    differing = [name for name in expected if expected[name] != actual.get(name)]
+    differing += [name for name in actual if name not in expected]
+    return differing, timings
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else 'e2.xlsx'
+    print(f"Reading {source} with openpyxl and with xlsx_reader...")
+    differing, timings = compare_with_openpyxl(source)
+    print(f"  openpyxl:    {timings['openpyxl']:.2f}s")
+    print(f"  xlsx_reader: {timings['xml']:.2f}s")
+    if differing:
+        print(f"MISMATCH in {len(differing)} sheets: {', '.join(differing[:10])}")
+        sys.exit(1)
+    print("All sheets identical")